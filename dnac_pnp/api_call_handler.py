@@ -7,19 +7,50 @@
 import json
 import logging
 import sys
+import time
+import warnings
 
 # Import external python libraries
 import click
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import DependencyWarning, InsecureRequestWarning
 
 # Import custom (local) python packages
+from .api_endpoint_handler import resolve_api_type
 from .header_handler import get_headers
-from .dnac_params import accepted_status_codes
+from .dnac_metrics import api_metrics
+from .dnac_params import accepted_status_codes, client_pool_size
+from .dnac_session import current_session
+from .dnac_tracing import tracer
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
+# urllib3's DependencyWarnings, InsecureRequestWarning should be silenced.
+warnings.simplefilter("ignore", DependencyWarning)
+warnings.simplefilter("ignore", InsecureRequestWarning)
+
+
+# Create API client
+def create_client(pool_size=None):
+    """
+    This function creates an API client that keeps its connections open
+
+    Every API call reuses one of the open connections, DNS resolution and the
+    TCP/TLS handshake happen once per connection instead of once per call.
+
+    :param pool_size: (int) Connections kept open, defaults to client_pool_size
+    :return: (requests.Session) API client
+    """
+
+    client = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size or client_pool_size)
+    client.mount("https://", adapter)
+    client.mount("http://", adapter)
+    return client
+
 
 # Content type check
 def _content_type_check(response=None):
@@ -27,13 +58,13 @@ def _content_type_check(response=None):
 
     if "application/json" in response.headers["Content-Type"]:
         response_body = response.json()
-        response_body_logging = json.dumps(response.json(), indent=4, sort_keys=True)
-        logging.debug(f"{type(response_body_logging)}")
-        logging.debug(f"JSON response content: {response_body_logging}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            response_body_logging = json.dumps(response_body, indent=4, sort_keys=True)
+            logging.debug("JSON response content: %s", response_body_logging)
     else:
         response_body = response.text
-        logging.debug(f"Text response content: {response_body}")
-    logging.debug(f"{type(response_body)}")
+        logging.debug("Text response content: %s", response_body)
+    logging.debug("%s", type(response_body))
     return response_body
 
 
@@ -51,19 +82,19 @@ def _check_payload(payload=None, check=None):
             json_input = json.loads([payload])
             return json_input
         except TypeError:
-            logging.debug(f"[!] Warning: Input data stream is not valid JSON!")
-            logging.debug(f"Input data is not valid JSON format")
-            logging.debug(f"[$] Trying to convert the input stream into JSON.....")
+            logging.debug("[!] Warning: Input data stream is not valid JSON!")
+            logging.debug("Input data is not valid JSON format")
+            logging.debug("[$] Trying to convert the input stream into JSON.....")
             try:
-                json_input = json.dumps([payload], indent=4, sort_keys=True)
-                logging.debug(f"JSON formatted payload: {json_input}")
+                json_input = json.dumps([payload])
+                logging.debug("JSON formatted payload: %s", json_input)
                 return json_input
             except Exception as err:
-                logging.debug(f"Error: {err}")
+                logging.debug("Error: %s", err)
                 click.secho(f"Error! while creating json object", fg="red")
                 sys.exit(1)
     else:
-        json_input = json.dumps(payload, indent=4, sort_keys=True)
+        json_input = json.dumps(payload)
         return json_input
 
 
@@ -92,29 +123,53 @@ def call_api_endpoint(
 
     if data:
         if check_payload:
-            logging.debug(f"[*] Checking payload.....")
+            logging.debug("[*] Checking payload.....")
             json_input = _check_payload(payload=data, check=True)
         else:
             json_input = _check_payload(payload=data, check=False)
     else:
         json_input = None
-    logging.debug(f"JSON INPUT (call_api_endpoint): {json_input}")
-    logging.debug(f"[$] Making API call.....")
-    try:
-        response = requests.request(
-            method,
-            api_url,
-            data=json_input,
-            headers=api_headers,
-            auth=auth,
-            params=parameters,
-            verify=False,
-        )
-    except Exception as err:
-        click.secho(f"[x] ERROR: {err}", fg="red")
-        sys.exit(1)
-    else:
-        return response
+    logging.debug("JSON INPUT (call_api_endpoint): %s", json_input)
+    logging.debug("[$] Making API call.....")
+    bytes_sent = len(json_input) if json_input else 0
+    api_type = resolve_api_type(method=method, api_url=api_url)
+    client = getattr(current_session(), "client", None) or requests
+    with tracer.span(
+        f"HTTP {method}", **{"http.method": method, "dnac.api_type": api_type}
+    ) as span:
+        api_metrics.request_started()
+        call_started = time.perf_counter()
+        try:
+            response = client.request(
+                method,
+                api_url,
+                data=json_input,
+                headers=api_headers,
+                auth=auth,
+                params=parameters,
+                verify=False,
+            )
+        except Exception as err:
+            api_metrics.request_finished()
+            api_metrics.record(
+                api_type=api_type,
+                status_code="error",
+                latency=time.perf_counter() - call_started,
+                bytes_sent=bytes_sent,
+            )
+            click.secho(f"[x] ERROR: {err}", fg="red")
+            sys.exit(1)
+        else:
+            api_metrics.request_finished()
+            api_metrics.record(
+                api_type=api_type,
+                status_code=response.status_code,
+                latency=time.perf_counter() - call_started,
+                bytes_sent=bytes_sent,
+                bytes_received=len(response.content),
+            )
+            span.set_attribute("http.status_code", response.status_code)
+            return response
 
 
 # API call control for device id, site id
@@ -148,13 +203,13 @@ def get_response(
             parameters=parameters,
         )
     if response.status_code in accepted_status_codes:
-        logging.debug(f"Response status code found in accepted codes!")
+        logging.debug("Response status code found in accepted codes!")
         response_status = True
-        logging.debug(f"[#] [{response.status_code}] API call accepted by the server!")
+        logging.debug("[#] [%s] API call accepted by the server!", response.status_code)
         response_body = _content_type_check(response=response)
     else:
-        logging.debug(f"Response status code not found in accepted codes!")
+        logging.debug("Response status code not found in accepted codes!")
         response_status = False
-        logging.debug(f"Response Status: {response_status}")
+        logging.debug("Response Status: %s", response_status)
         response_body = _content_type_check(response=response)
     return response_status, response_body
@@ -8,50 +8,91 @@ import json
 import logging
 import os
 import sys
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 # Import external python libraries
 import click
 
 # Import custom (local) python packages
-from . import dnac_handler as dnac
+from .dnac_session import current_session
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
 
-# Define API URL generator
-def generate_api_url(host=None, api_type=None):
+# Load API collection
+@lru_cache(maxsize=None)
+def _load_api_collection():
     """
-    This function creates appropriate API URL based on vendor and api call type
+    This private function reads the API collection once per process
 
-    :param host: (str) IP or FQDN of DNAC
-    :param api_type: (str) API call type (name) e.g. generate-token, import-device
-    :return: (str) API endpoint
+    :return: (dict) API collection from endpoints.json
     """
 
-    if host is None:
-        host = dnac.host
     api_collection = os.path.join(
         os.path.dirname(os.path.realpath(__file__)), "endpoints.json"
     )
-    logging.debug(f"Endpoint file: {api_collection}")
+    logging.debug("Endpoint file: %s", api_collection)
     if os.path.isfile(api_collection):
         if os.access(api_collection, os.F_OK) and os.access(api_collection, os.R_OK):
-            logging.debug(f"[$] Reading API collection for [{api_type}].....")
+            logging.debug("[$] Reading API collection.....")
             with open(api_collection, "r") as collection:
-                api_collection = json.load(collection)
-            api_components = api_collection[api_type]
+                return json.load(collection)
         else:
             click.secho(f"[X] Read permission error", fg="red")
             sys.exit(1)
     else:
         click.secho(f"[x] Can't find API collection!", fg="red")
         sys.exit(1)
+
+
+# Define API URL generator
+def generate_api_url(host=None, api_type=None):
+    """
+    This function creates appropriate API URL based on vendor and api call type
+
+    :param host: (str) IP or FQDN of DNAC, defaults to the host of the active session
+    :param api_type: (str) API call type (name) e.g. generate-token, import-device
+    :return: (str) API endpoint
+    """
+
+    if host is None:
+        session = current_session()
+        if session is None:
+            click.secho(f"[x] No active DNA center session!", fg="red")
+            sys.exit(1)
+        host = session.host
+    api_components = _load_api_collection()[api_type]
     protocol = api_components["protocol"]
     api = api_components["api"]
     method = api_components["method"]
-    parameters = api_components["parameters"]
+    parameters = dict(api_components["parameters"])
     api_url = f"{protocol}://{host}{api}"
-    logging.debug(f"[#] API endpoint URL created!")
+    logging.debug("[#] API endpoint URL created!")
     return method, api_url, parameters
+
+
+# Find API type of an API URL
+@lru_cache(maxsize=1024)
+def resolve_api_type(method=None, api_url=None):
+    """
+    This function finds the API type (name) of an API call by method and URL
+
+    :param method: (str) API call method e.g. GET, POST etc
+    :param api_url: (str) API endpoint URL
+    :return: (str) API type, the URL path if it is not part of the API collection
+    """
+
+    api_path = urlsplit(api_url).path
+    api_type = api_path
+    match_length = -1
+    for name, api_components in _load_api_collection().items():
+        api = api_components["api"]
+        if api_components["method"] != method or len(api) <= match_length:
+            continue
+        if api_path == api or (api.endswith("/") and api_path.startswith(api)):
+            api_type = name
+            match_length = len(api)
+    return api_type
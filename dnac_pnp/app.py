@@ -11,20 +11,16 @@ import sys
 import click
 
 # Import custom (local) python libraries
+from .dnac_params import job_processes, serve_workers
 from .utils import (
     debug_manager,
     initial_message,
     show_info,
     validate_file_extension,
     validate_input,
+    validate_pnp_filter,
     validate_serial,
 )
-from .dnac_handler import (
-    import_manager,
-    delete_manager,
-    info_showcase_manager,
-    site_manger,
-)
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
@@ -71,11 +67,103 @@ pass_context = click.make_pass_decorator(Context, ensure=True)
     help="Turns on DEBUG mode.",
     type=str,
 )
+@click.option(
+    "--metrics-file",
+    "metrics_file",
+    help="Writes API call metrics as JSON to this file.",
+    type=click.Path(exists=False, dir_okay=False),
+)
+@click.option(
+    "--metrics-port",
+    "metrics_port",
+    help="Exposes live metrics in Prometheus format on this local port.",
+    type=click.IntRange(1, 65535),
+)
+@click.option(
+    "--metrics-textfile",
+    "metrics_textfile",
+    help="Writes live metrics in Prometheus format to this file periodically.",
+    type=click.Path(exists=False, dir_okay=False),
+)
+@click.option(
+    "--trace-file",
+    "trace_file",
+    help="Writes tracing spans as JSON lines to this file.",
+    type=click.Path(exists=False, dir_okay=False),
+)
+@click.option(
+    "--trace-endpoint",
+    "trace_endpoint",
+    help="Sends tracing spans to this OTLP/HTTP collector e.g. http://localhost:4318",
+    type=str,
+)
+@click.option(
+    "--profile",
+    "profile_file",
+    help="Profiles the sub-command and writes the profile to this file.",
+    type=click.Path(exists=False, dir_okay=False),
+)
+@click.option(
+    "--profile-format",
+    "profile_format",
+    help="Profile output, pstats (cProfile) or collapsed (sampled flamegraph stacks).",
+    type=click.Choice(["pstats", "collapsed"]),
+    default="pstats",
+    show_default=True,
+)
 @click.version_option()
 @pass_context
-def mission_control(context, debug):
+def mission_control(
+    context,
+    debug,
+    metrics_file,
+    metrics_port,
+    metrics_textfile,
+    trace_file,
+    trace_endpoint,
+    profile_file,
+    profile_format,
+):
     """CISCO DNA Center PnP automation control panel"""
 
+    if profile_file:
+        from .dnac_metrics import api_metrics
+        from .profiler import RunProfiler
+
+        profiler = RunProfiler(
+            file_path=profile_file,
+            output_format=profile_format,
+            network_time=api_metrics.network_time,
+        ).start()
+        click.get_current_context().call_on_close(profiler.stop)
+
+    if metrics_file:
+        from .dnac_metrics import api_metrics
+
+        api_metrics.export_path = metrics_file
+    if metrics_port:
+        from .metrics_exporter import MetricsHttpExporter
+
+        try:
+            exporter = MetricsHttpExporter(port=metrics_port).start()
+        except OSError as err:
+            click.secho(f"[x] Can't start metrics exporter! ERROR: {err}", fg="red")
+            sys.exit(1)
+        click.get_current_context().call_on_close(exporter.stop)
+    if metrics_textfile:
+        from .metrics_exporter import MetricsTextfileExporter
+
+        exporter = MetricsTextfileExporter(file_path=metrics_textfile).start()
+        click.get_current_context().call_on_close(exporter.stop)
+    if trace_file or trace_endpoint:
+        from .dnac_tracing import tracer, FileSpanExporter, OtlpHttpSpanExporter
+
+        if trace_endpoint:
+            span_exporter = OtlpHttpSpanExporter(endpoint=trace_endpoint)
+        else:
+            span_exporter = FileSpanExporter(file_path=trace_file)
+        tracer.configure(exporter=span_exporter)
+        click.get_current_context().call_on_close(tracer.shutdown)
     context.debug = debug
     context.initial_msg = True
     context.dry_run = True
@@ -92,6 +180,18 @@ def mission_control(context, debug):
     default=False,
     show_default=True,
 )
+@click.option(
+    "--site-prefix",
+    "site_prefix",
+    help="Shows only the sites below this site e.g. Global/DE/MUC",
+    type=str,
+)
+@click.option(
+    "--site-type",
+    "site_type",
+    help="Shows only the sites of this type.",
+    type=click.Choice(["area", "building", "floor"]),
+)
 @click.option(
     "--all-pnp-devices",
     "all_pnp_devices",
@@ -128,6 +228,36 @@ def mission_control(context, debug):
     help="Exports PnP device information to CSV",
     type=click.Path(exists=False, dir_okay=False),
 )
+@click.option(
+    "--pnp-filter",
+    "pnp_filter",
+    help="Shows PnP devices matching filters e.g. state=Unclaimed|Error,site=Global/DE",
+    type=str,
+    callback=validate_pnp_filter,
+)
+@click.option(
+    "--limit",
+    "limit",
+    help="Shows at most this many rows of a list.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--offset",
+    "offset",
+    help="Skips this many rows of a list.",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--pager",
+    "pager",
+    help="Shows a list in the system pager.",
+    is_flag=True,
+    type=bool,
+    default=False,
+    show_default=True,
+)
 @click.option(
     "--debug",
     "sub_debug",
@@ -141,14 +271,33 @@ def mission_control(context, debug):
 def show(context, sub_debug, **kwargs):
     """Shows DNA Center component information"""
 
+    from .dnac_handler import info_showcase_manager
+
     if context.initial_msg:
         initial_message()
     if context.debug or sub_debug:
         debug_manager()
-    if kwargs["all_locations"]:
-        info_showcase_manager(command="all_locations", site="all")
-    elif kwargs["all_pnp_devices"]:
-        info_showcase_manager(command="all_pnp_devices", device=None)
+    list_options = {
+        "limit": kwargs["limit"],
+        "offset": kwargs["offset"],
+        "pager": kwargs["pager"],
+    }
+    filter_only = kwargs["pnp_filter"] and not kwargs["export_pnp_to_csv"]
+    if kwargs["all_locations"] or kwargs["site_prefix"] or kwargs["site_type"]:
+        info_showcase_manager(
+            command="all_locations",
+            site="all",
+            site_prefix=kwargs["site_prefix"],
+            site_type=kwargs["site_type"],
+            **list_options,
+        )
+    elif kwargs["all_pnp_devices"] or filter_only:
+        info_showcase_manager(
+            command="all_pnp_devices",
+            device=None,
+            pnp_filters=kwargs["pnp_filter"],
+            **list_options,
+        )
     elif kwargs["single_pnp_device"]:
         info_showcase_manager(
             command="single_pnp_device", device=kwargs["single_pnp_device"]
@@ -161,7 +310,9 @@ def show(context, sub_debug, **kwargs):
         )
     elif kwargs["export_pnp_to_csv"]:
         info_showcase_manager(
-            command="export_pnp_to_csv", file_path=kwargs["export_pnp_to_csv"]
+            command="export_pnp_to_csv",
+            file_path=kwargs["export_pnp_to_csv"],
+            pnp_filters=kwargs["pnp_filter"],
         )
 
 
@@ -215,6 +366,9 @@ def show(context, sub_debug, **kwargs):
 def acclaim_one(context, serial_number, product_id, site_name, host_name, sub_debug):
     """Entry-point for single device add and claim"""
 
+    from .dnac_handler import import_manager
+    from .dnac_records import CatalogRow
+
     if context.initial_msg:
         initial_message()
     if context.debug or sub_debug:
@@ -226,16 +380,14 @@ def acclaim_one(context, serial_number, product_id, site_name, host_name, sub_de
             fg="yellow",
         )
         host_name = serial_number
-    air_config = {
-        "deviceInfo": {
+    air_config = CatalogRow.from_dict(
+        {
             "name": host_name,
             "serialNumber": serial_number,
             "pid": product_id,
             "siteName": site_name,
-            "configId": None,
-            "configParameters": None,
         }
-    }
+    )
     logging.debug(f"Air Config: {air_config}")
     import_manager(inputs=air_config, import_type="single")
 
@@ -250,6 +402,15 @@ def acclaim_one(context, serial_number, product_id, site_name, host_name, sub_de
     type=click.Path(exists=True, dir_okay=False),
     callback=validate_file_extension,
 )
+@click.option(
+    "--validate-only",
+    "validate_only",
+    help="Validates the catalog against DNA center without importing.",
+    is_flag=True,
+    type=bool,
+    default=False,
+    show_default=True,
+)
 @click.option(
     "--debug",
     "sub_debug",
@@ -259,10 +420,20 @@ def acclaim_one(context, serial_number, product_id, site_name, host_name, sub_de
     help="Turns on DEBUG mode.",
     type=str,
 )
+@click.option(
+    "--processes",
+    "processes",
+    help="Imports the catalog with this many processes, sharded by serial.",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
 @pass_context
-def acclaim_devices(context, catalog_file, sub_debug):
+def acclaim_devices(context, catalog_file, validate_only, processes, sub_debug):
     """Add and claim single or multiple devices"""
 
+    from .dnac_handler import import_manager
+
     if context.initial_msg:
         initial_message()
     if context.debug or sub_debug:
@@ -273,9 +444,69 @@ def acclaim_devices(context, catalog_file, sub_debug):
             f"[!] warning: Device import catalog detected at input!", fg="yellow"
         )
         click.secho(f"[*] Device Import file location: [{catalog_file}]", fg="cyan")
-        import_manager(import_type="bulk", device_catalog=catalog_file)
+        import_manager(
+            import_type="bulk",
+            device_catalog=catalog_file,
+            validate_only=validate_only,
+            processes=processes,
+        )
     else:
-        import_manager(import_type="bulk")
+        import_manager(
+            import_type="bulk", validate_only=validate_only, processes=processes
+        )
+
+
+@mission_control.command(short_help="Sync PnP devices with the device catalog.")
+@click.option(
+    "-f",
+    "--catalog-file",
+    "catalog_file",
+    help="Device catalog full file path",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    callback=validate_file_extension,
+)
+@click.option(
+    "--plan",
+    "plan_only",
+    help="Shows the planned changes without applying them.",
+    is_flag=True,
+    type=bool,
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "--prune",
+    "prune",
+    help="Deletes PnP devices that are not in the catalog.",
+    is_flag=True,
+    type=bool,
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "--debug",
+    "sub_debug",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Turns on DEBUG mode.",
+    type=str,
+)
+@pass_context
+def sync(context, catalog_file, plan_only, prune, sub_debug):
+    """Sync PnP devices with the device catalog"""
+
+    from .dnac_handler import sync_manager
+
+    if context.initial_msg:
+        initial_message()
+    if context.debug or sub_debug:
+        debug_manager()
+    if catalog_file:
+        logging.debug(f"Catalog file: {catalog_file}")
+        click.secho(f"[*] Device catalog location: [{catalog_file}]", fg="cyan")
+    sync_manager(device_catalog=catalog_file, plan_only=plan_only, prune=prune)
 
 
 @mission_control.command(short_help="Add one or more sites.")
@@ -297,7 +528,9 @@ def acclaim_devices(context, catalog_file, sub_debug):
 )
 @pass_context
 def add_sites(context, location_file, sub_debug):
-    """Adds single or multiple sites """
+    """Adds single or multiple sites"""
+
+    from .dnac_handler import site_manger
 
     if context.initial_msg:
         initial_message()
@@ -306,6 +539,184 @@ def add_sites(context, location_file, sub_debug):
     site_manger(site_config_file_path=location_file)
 
 
+@mission_control.command(short_help="Runs import/delete/show jobs over a local API.")
+@click.option(
+    "--bind",
+    "bind",
+    help="Address of the HTTP server.",
+    type=str,
+    default="127.0.0.1",
+    show_default=True,
+)
+@click.option(
+    "--port",
+    "port",
+    help="Port of the HTTP server.",
+    type=int,
+    default=8765,
+    show_default=True,
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    help="Unix socket path, used instead of address and port.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--workers",
+    "workers",
+    help="Jobs running at the same time.",
+    type=click.IntRange(min=1),
+    default=serve_workers,
+    show_default=True,
+)
+@click.option(
+    "--debug",
+    "sub_debug",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Turns on DEBUG mode.",
+    type=str,
+)
+@pass_context
+def serve(context, bind, port, socket_path, workers, sub_debug):
+    """Keeps a warm DNA center session and runs jobs over a local API"""
+
+    from .dnac_handler import serve_manager
+
+    if context.initial_msg:
+        initial_message()
+    if context.debug or sub_debug:
+        debug_manager()
+    serve_manager(bind=bind, port=port, socket_path=socket_path, workers=workers)
+
+
+@mission_control.group(cls=AliasedGroup)
+def jobs():
+    """Durable job store for large device onboardings"""
+
+
+@jobs.command(short_help="Stores the rows of a device catalog as jobs.")
+@click.option(
+    "-f",
+    "--catalog-file",
+    "catalog_file",
+    help="Device catalog full file path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False),
+    callback=validate_file_extension,
+)
+@click.option(
+    "--store",
+    "store_file",
+    help="Job store file path, defaults to jobs/jobs.sqlite in the base directory.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--debug",
+    "sub_debug",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Turns on DEBUG mode.",
+    type=str,
+)
+@pass_context
+def submit(context, catalog_file, store_file, sub_debug):
+    """Validates a device catalog and stores its rows as jobs"""
+
+    from .dnac_handler import job_manager
+
+    if context.initial_msg:
+        initial_message()
+    if context.debug or sub_debug:
+        debug_manager()
+    click.secho(f"[*] Device catalog location: [{catalog_file}]", fg="cyan")
+    job_manager(action="submit", store_file=store_file, catalog_file=catalog_file)
+
+
+@jobs.command(short_help="Runs worker processes until all jobs are finished.")
+@click.option(
+    "--processes",
+    "processes",
+    help="Worker processes.",
+    type=click.IntRange(min=1),
+    default=job_processes,
+    show_default=True,
+)
+@click.option(
+    "--store",
+    "store_file",
+    help="Job store file path, defaults to jobs/jobs.sqlite in the base directory.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--debug",
+    "sub_debug",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Turns on DEBUG mode.",
+    type=str,
+)
+@pass_context
+def run(context, processes, store_file, sub_debug):
+    """Runs worker processes until all jobs are finished"""
+
+    from .dnac_handler import job_manager
+
+    if context.initial_msg:
+        initial_message()
+    if context.debug or sub_debug:
+        debug_manager()
+    job_manager(action="run", store_file=store_file, processes=processes)
+
+
+@jobs.command(short_help="Shows the progress of all jobs.")
+@click.option(
+    "--errors",
+    "errors",
+    help="Also lists the rows with their last error.",
+    is_flag=True,
+    type=bool,
+    default=False,
+    show_default=True,
+)
+@click.option(
+    "--limit",
+    "limit",
+    help="Maximum number of rows with errors to list.",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--store",
+    "store_file",
+    help="Job store file path, defaults to jobs/jobs.sqlite in the base directory.",
+    type=click.Path(dir_okay=False),
+)
+@click.option(
+    "--debug",
+    "sub_debug",
+    is_flag=True,
+    default=False,
+    show_default=True,
+    help="Turns on DEBUG mode.",
+    type=str,
+)
+@pass_context
+def status(context, errors, limit, store_file, sub_debug):
+    """Shows the progress of all jobs"""
+
+    from .dnac_handler import job_manager
+
+    if context.initial_msg:
+        initial_message()
+    if context.debug or sub_debug:
+        debug_manager()
+    job_manager(action="status", store_file=store_file, errors=errors, limit=limit)
+
+
 @mission_control.command(short_help="Shows package information.")
 @click.option(
     "--all",
@@ -379,6 +790,8 @@ def pkg_info(context, all_info, author):
 def delete_devices(context, serial_numbers, delete_entries, dry_run, delete_debug):
     """Delete one or multiple devices"""
 
+    from .dnac_handler import delete_manager
+
     if context.initial_msg:
         initial_message()
     if context.debug or delete_debug:
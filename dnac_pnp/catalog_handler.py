@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Device catalog pre-flight validation"""
+
+# Import builtin python libraries
+from collections import Counter, defaultdict
+import logging
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from .dnac_info_butler import (
+    get_image_index,
+    get_site_index,
+    get_template_id_map,
+    get_template_schema,
+    resolve_serials,
+    unresolved_device,
+)
+from .dnac_params import image_column, non_claimable_states
+from .template_binder import TemplateBinder
+from .utils import divider, read_csv_header, stream_csv
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Collect catalog facts
+def _scan_catalog(import_file=None):
+    """
+    This private function reads the catalog once and groups serials by site/template
+
+    The columns are taken from the header line, every readable row has exactly
+    these columns as rows with another number of values are malformed.
+
+    :param import_file: (str) Full path of the device catalog
+    :return: (dict, dict, dict, Counter, set, list) sites, templates, images, serial
+             count, columns, line number and reason of malformed rows
+    """
+
+    malformed = []
+    sites = defaultdict(set)
+    templates = defaultdict(set)
+    images = defaultdict(set)
+    serial_count = Counter()
+    columns = set(read_csv_header(file_to_parse=import_file))
+    for row in stream_csv(file_to_parse=import_file, malformed=malformed):
+        serial_number = row.serial_number
+        serial_count[serial_number] += 1
+        sites[row.site_name].add(serial_number)
+        templates[row.template_name].add(serial_number)
+        image_name = row.get(image_column)
+        if image_name:
+            images[image_name].add(serial_number)
+    return sites, templates, images, serial_count, columns, malformed
+
+
+# Mark serials as rejected
+def _reject(rejected=None, serials=None, reason=None):
+    """
+    This private function records the rejection reason for a set of serials
+
+    :param rejected: (dict) Serial number and list of reasons
+    :param serials: (iterable) Serial numbers to reject
+    :param reason: (str) Rejection reason
+    :return: None
+    """
+
+    for serial_number in serials:
+        rejected[serial_number].append(reason)
+
+
+# Validate the full catalog before any import work
+def validate_catalog(
+    api_headers=None, import_file=None, check_states=True, references=None
+):
+    """
+    This function validates the whole device catalog against DNA center
+
+    Sites are checked against one site snapshot, every distinct template is
+    resolved once and its parameters compared with the catalog columns, images
+    are checked against one image snapshot, duplicate serials and malformed rows
+    are detected and serials that are already in a non-claimable PnP state are
+    flagged. The catalog is read once for the validation, the import streams it
+    again.
+
+    :param api_headers: (dict) DNA center API headers
+    :param import_file: (str) Full path of the device catalog
+    :param check_states: (boolean) Flag serials in non-claimable PnP states
+    :param references: (dict) If provided, filled with the SiteIndex as "sites"
+                       (None if the site list is not available), the resolved
+                       Template records, each with its compiled TemplateBinder,
+                       as "templates" and the image name and ID mapping as
+                       "images" (None if no row has an image or the image list is
+                       not available) and every catalog serial with its resolved
+                       PnP device as "devices" (None if states are not checked),
+                       and the line number and reason of every malformed row as
+                       "malformed"
+    :return: (dict, int) Rejected serials with reasons, malformed rows as
+             "line <number>", total number of rows
+    """
+
+    click.secho(f"[$] Validating device catalog.....", fg="blue")
+    sites, templates, images, serial_count, columns, malformed = _scan_catalog(
+        import_file=import_file
+    )
+    rejected = defaultdict(list)
+
+    # Rows that can not be read, listed by line number as their serial is unknown
+    for line_number, reason in malformed:
+        _reject(rejected, [f"line {line_number}"], f"Malformed row, {reason}")
+
+    # Duplicate serials
+    for serial_number, count in serial_count.items():
+        if count > 1:
+            _reject(
+                rejected, [serial_number], f"Serial appears [{count}] times in catalog"
+            )
+
+    # Sites against one snapshot
+    site_snapshot = get_site_index(api_headers=api_headers)
+    if site_snapshot is False:
+        click.secho(
+            f"[!] Warning: Site list not available, site check skipped!",
+            fg="yellow",
+        )
+    else:
+        for site_name in set(sites) - set(site_snapshot):
+            _reject(rejected, sites[site_name], f"Site [{site_name}] is not valid")
+
+    # Images against one snapshot, only if the catalog upgrades any device
+    image_snapshot = None
+    if images:
+        image_snapshot = get_image_index(api_headers=api_headers)
+        if image_snapshot is False:
+            click.secho(
+                f"[!] Warning: Image list not available, image check skipped!",
+                fg="yellow",
+            )
+        else:
+            for image_name in set(images) - set(image_snapshot):
+                _reject(
+                    rejected, images[image_name], f"Image [{image_name}] is not present"
+                )
+
+    # Templates against their parameter lists
+    template_map = get_template_id_map(
+        api_headers=api_headers, template_names=templates.keys()
+    )
+    for template_name, template in template_map.items():
+        if not template:
+            _reject(
+                rejected,
+                templates[template_name],
+                f"Template [{template_name}] is not present",
+            )
+            continue
+        _, template_schema = get_template_schema(
+            api_headers=api_headers, config_id=template.id
+        )
+        if not template_schema:
+            _reject(
+                rejected,
+                templates[template_name],
+                f"Template [{template_name}] parameters not found",
+            )
+            continue
+        template.binder = TemplateBinder(config_id=template.id, schema=template_schema)
+        template.parameters = template.binder.parameters
+        missing_parameters = set(template.parameters) - columns
+        if missing_parameters:
+            _reject(
+                rejected,
+                templates[template_name],
+                f"Template [{template_name}] parameters missing in catalog: "
+                f"{sorted(missing_parameters)}",
+            )
+
+    # Serials already in non-claimable states, only the catalog serials are looked up
+    device_map = None
+    if check_states:
+        device_map = resolve_serials(
+            api_headers=api_headers, serial_numbers=list(serial_count)
+        )
+        for serial_number, (_, device_state, _) in device_map.items():
+            if device_state in non_claimable_states:
+                _reject(rejected, [serial_number], f"Device state is [{device_state}]")
+
+    if references is not None:
+        references["sites"] = site_snapshot or None
+        references["images"] = image_snapshot or None
+        references["malformed"] = malformed
+        references["devices"] = device_map and {
+            serial_number: device_map.get(serial_number, unresolved_device)
+            for serial_number in serial_count
+        }
+        references["templates"] = {
+            template_name: template
+            for template_name, template in template_map.items()
+            if template and template.parameters
+        }
+
+    total_rows = sum(serial_count.values()) + len(malformed)
+    logging.debug("Rejected serials: %s", dict(rejected))
+    return dict(rejected), total_rows
+
+
+# Show validation report
+def show_validation_report(rejected=None, total_rows=0):
+    """
+    This function prints the catalog validation report
+
+    :param rejected: (dict) Rejected serials with reasons
+    :param total_rows: (int) Total number of catalog rows
+    :return: (stdout) On screen output
+    """
+
+    divider("Catalog Validation Report")
+    for serial_number in sorted(rejected):
+        click.secho(f"[x] [{serial_number}] ", fg="red", nl=False)
+        click.secho(f"{'; '.join(rejected[serial_number])}", fg="yellow")
+    click.secho(f"[*] Total rows: {total_rows}", fg="cyan")
+    click.secho(f"[*] Rejected serials: {len(rejected)}", fg="cyan")
+    if rejected:
+        click.secho(f"[!] Rejected serials are skipped during import", fg="yellow")
+    else:
+        click.secho(f"[#] All rows passed validation!", fg="green")
@@ -4,7 +4,10 @@
 """Main module for dnac-pnp"""
 
 # Import builtin python libraries
+from concurrent.futures import FIRST_COMPLETED, wait
+import logging
 import sys
+import time
 
 # Import external python libraries
 import click
@@ -12,6 +15,15 @@ import click
 # Import custom (local) python packages
 from .api_call_handler import call_api_endpoint, get_response
 from .api_endpoint_handler import generate_api_url
+from .dnac_metrics import api_metrics
+from .dnac_params import (
+    claim_max_attempts,
+    claim_retry_delay,
+    claim_workers,
+    transient_status_codes,
+)
+from .dnac_session import SessionExecutor, current_session
+from .dnac_tracing import tracer
 from .header_handler import get_headers
 
 # Source code meta data
@@ -25,51 +37,200 @@ def _generate_claim_payload(device_id=None, raw_payload=None, image_id=None):
     This private function generates device claim payload
 
     :param device_id: (str) Device ID obtained form DNAC against serial number
-    :param raw_payload: (dict) Input payload raw data
-    :param image_id: (str) Image ID obtained form DNAC against image full name
-    :return: (json) Payload for requests object
+    :param raw_payload: (CatalogRow) Catalog row with resolved site and config
+    :param image_id: (str) Image ID obtained form DNAC against image full name,
+                     the image upgrade is skipped if not provided
+    :return: (dict) Payload for requests object
     """
 
-    site_id = raw_payload["deviceInfo"]["siteId"]
-    config_id = raw_payload["deviceInfo"]["configId"]
-    config_parameters = raw_payload["deviceInfo"]["configParameters"]
+    if image_id:
+        image_info = {"imageId": image_id, "skip": "false"}
+    else:
+        image_info = {"imageId": "", "skip": "true"}
     dict_payload = {
-        "siteId": site_id,
+        "siteId": raw_payload.site_id,
         "deviceId": device_id,
         "type": "Default",
-        "imageInfo": {"imageId": "", "skip": "true"},
-        "configInfo": {"configId": config_id, "configParameters": config_parameters},
+        "imageInfo": image_info,
+        "configInfo": {
+            "configId": raw_payload.config_id,
+            "configParameters": raw_payload.config_parameters,
+        },
     }
     return dict_payload
 
 
+# Claim retry delay
+def _retry_delay(response=None, attempt=1):
+    """
+    This private function returns the seconds to wait before a claim is retried
+
+    :param response: (object) Response object of the failed claim
+    :param attempt: (int) Number of the failed attempt
+    :return: (float) Retry-After of DNA center if provided, backoff otherwise
+    """
+
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return claim_retry_delay * 2 ** (attempt - 1)
+
+
 # Claim device
+@tracer.wrap("claim")
 def claim(auth_token=None, headers=None, device_id=None, data=None):
     """
     This function claims device according to device ID
 
+    Claims that fail with a transient status code are retried up to
+    claim_max_attempts times.
+
     :param auth_token: (str) DNA center authentication token
     :param headers: (dict) API headers
     :param device_id: (str) Device ID obtained form DNAC against serial number
-    :param data: (dict) payload data for api request
+    :param data: (CatalogRow) Catalog row with resolved site and config
     :return: (object) Response object
     """
 
     method, api_url, parameters = generate_api_url(api_type="claim-device")
     if headers is None:
         headers = get_headers(auth_token=auth_token)
-    payload = _generate_claim_payload(device_id=device_id, raw_payload=data)
-    api_response = call_api_endpoint(
-        method=method,
-        api_url=api_url,
-        data=payload,
-        api_headers=headers,
-        parameters=parameters,
-        check_payload=False,
+    payload = _generate_claim_payload(
+        device_id=device_id, raw_payload=data, image_id=data.image_id
     )
+    for attempt in range(1, claim_max_attempts + 1):
+        api_response = call_api_endpoint(
+            method=method,
+            api_url=api_url,
+            data=payload,
+            api_headers=headers,
+            parameters=parameters,
+            check_payload=False,
+        )
+        if (
+            api_response.status_code not in transient_status_codes
+            or attempt == claim_max_attempts
+        ):
+            break
+        logging.debug(
+            "[!] Claim of [%s] failed with [%s], retrying.....",
+            device_id,
+            api_response.status_code,
+        )
+        api_metrics.record_retry(api_type="claim-device")
+        time.sleep(_retry_delay(response=api_response, attempt=attempt))
     response_status, response_body = get_response(response=api_response)
     if response_status:
         return True
     else:
         click.secho(f"[x] Device claim failed!", fg="red")
         return False
+
+
+# Claim scheduler
+class ClaimScheduler(object):
+    """
+    Claims devices in parallel while the catalog is still being imported
+
+    At most ``workers`` claims run at the same time and as many again wait in
+    the queue, the import waits for a free slot. Outcomes are collected as the
+    claims finish, failed claims are recorded as skipped serials of the session.
+    """
+
+    __slots__ = ("api_headers", "workers", "failed", "_executor", "_pending")
+
+    def __init__(self, api_headers=None, workers=None):
+        """
+        Constructor method for claim scheduler
+
+        :param api_headers: (dict) API headers
+        :param workers: (int) Parallel device claims, defaults to claim_workers
+        """
+
+        self.api_headers = api_headers
+        self.workers = workers or claim_workers
+        self.failed = []
+        self._executor = None
+        self._pending = {}
+
+    def __enter__(self):
+        self._executor = SessionExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.drain()
+            else:
+                for future in self._pending:
+                    future.cancel()
+        finally:
+            self._executor.shutdown(wait=True)
+        return False
+
+    def submit(self, data=None):
+        """
+        Queues the claim of one device, waits while the queue is full
+
+        :param data: (CatalogRow) Catalog row with resolved site, config and device
+        :return: None
+        """
+
+        if len(self._pending) >= 2 * self.workers:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._collect(futures=done)
+        future = self._executor.submit(
+            claim, None, self.api_headers, data.device_id, data
+        )
+        self._pending[future] = data.serial_number
+        api_metrics.set_queue_depth(stage="claim", depth=len(self._pending))
+
+    def drain(self):
+        """Waits for all queued claims and collects their outcomes"""
+
+        if self._pending:
+            logging.debug("Waiting for [%s] claims", len(self._pending))
+            done, _ = wait(self._pending)
+            self._collect(futures=done)
+
+    def _collect(self, futures=None):
+        for future in futures:
+            serial_number = self._pending.pop(future)
+            try:
+                claim_status = future.result()
+            except SystemExit:
+                claim_status = False
+            except Exception as err:
+                logging.debug("Claim of [%s] failed: %s", serial_number, err)
+                claim_status = False
+            if not claim_status:
+                click.secho(f"[x] Claim of [{serial_number}] failed", fg="red")
+                self.failed.append(serial_number)
+                current_session().skip(serial_number)
+        api_metrics.set_queue_depth(stage="claim", depth=len(self._pending))
+
+
+# Unclaim device
+@tracer.wrap("unclaim")
+def unclaim(headers=None, device_id=None):
+    """
+    This function unclaims a device, so it can be claimed again
+
+    :param headers: (dict) API headers
+    :param device_id: (str) PnP device ID
+    :return: (boolean) True if DNA center accepted the request
+    """
+
+    method, api_url, parameters = generate_api_url(api_type="unclaim-device")
+    api_response = call_api_endpoint(
+        method=method,
+        api_url=api_url,
+        data={"deviceIdList": [device_id]},
+        api_headers=headers,
+        parameters=parameters,
+        check_payload=False,
+    )
+    response_status, _ = get_response(response=api_response)
+    if not response_status:
+        click.secho(f"[x] Device unclaim failed!", fg="red")
+    return response_status
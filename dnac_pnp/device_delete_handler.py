@@ -8,7 +8,6 @@ import logging
 
 # Import external python libraries
 import click
-from tqdm import tqdm
 import urllib3
 
 # Import custom (local) python packages
@@ -16,10 +15,15 @@ from .api_call_handler import call_api_endpoint
 from .api_endpoint_handler import generate_api_url
 from .api_call_handler import get_response
 from .dnac_token_generator import generate_token
-from .dnac_info_butler import get_device_id
-from .dnac_params import max_col_length
+from .dnac_info_butler import (
+    resolve_inventory_serials,
+    resolve_serials,
+    unresolved_device,
+)
+from .dnac_params import inventory_device_states
+from .dnac_session import current_session
 from .header_handler import get_headers
-from .utils import divider, goodbye
+from .utils import divider, goodbye, track_progress
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
@@ -31,39 +35,44 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 
 # Remove device
-def delete_device(api_headers=None, device_serial=None):
+def delete_device(
+    api_headers=None, device_serial=None, device_map=None, inventory_map=None
+):
     """
     This function deletes device from DNA center
 
     :param api_headers: (dict) API headers
     :param device_serial: (str) Device serial number
+    :param device_map: (dict) Serials already resolved by resolve_serials
+    :param inventory_map: (dict) Serials already resolved by resolve_inventory_serials
     :return: (obj) Response object
     """
 
     pnp_device_states = ["Unclaimed", "Planned", "Error"]
-    inventory_device_states = ["Onboarding", "Provisioned"]
-    device_id, device_state, _ = get_device_id(
-        dnac_api_headers=api_headers, serial_number=device_serial, dnac_tab="pnp"
-    )
-    logging.debug(f"Delete device ID: {device_id} in state: {device_state}")
+    if device_map is None:
+        device_map = resolve_serials(
+            api_headers=api_headers, serial_numbers=[device_serial]
+        )
+    device_id, device_state, _ = device_map.get(device_serial, unresolved_device)
+    logging.debug("Delete device ID: %s in state: %s", device_id, device_state)
     if device_id:
-        logging.debug(f"[#] Device ID received!")
-        logging.debug(f"[#] Device current state: [{device_state}]")
+        logging.debug("[#] Device ID received!")
+        logging.debug("[#] Device current state: [%s]", device_state)
         if device_state in pnp_device_states:
             dnac_api_type = "remove-device-pnp"
         elif device_state in inventory_device_states:
-            inv_device_id, device_state, _ = get_device_id(
-                dnac_api_headers=api_headers,
-                serial_number=device_serial,
-                dnac_tab="inventory",
-            )
+            if inventory_map is None:
+                inventory_map = resolve_inventory_serials(
+                    api_headers=api_headers, serial_numbers=[device_serial]
+                )
+            inv_device_id, _ = inventory_map.get(device_serial, (False, None))
             if inv_device_id:
                 device_id = inv_device_id
             dnac_api_type = "remove-device-inventory"
         else:
             dnac_api_type = "remove-device-pnp"
         method, api_url, parameters = generate_api_url(api_type=dnac_api_type)
-        logging.debug(f"Method: {method}, API:{api_url}, Parameters:{parameters}")
+        logging.debug("Method: %s, API:%s, Parameters:%s", method, api_url, parameters)
         delete_api_url = f"{api_url}{device_id}"
         api_response = call_api_endpoint(
             method=method,
@@ -73,7 +82,9 @@ def delete_device(api_headers=None, device_serial=None):
         )
         return api_response
     else:
-        logging.debug(f"[!]Device ID not found. SKIPPING serial [{device_serial}].....")
+        logging.debug(
+            "[!]Device ID not found. SKIPPING serial [%s].....", device_serial
+        )
         return False
 
 
@@ -92,20 +103,37 @@ def remove_devices(configs=None, serials=None):
         headers = get_headers(auth_token=token)
         divider("Deleting devices")
         click.secho(f"[*] Starting device deletion engine.....", fg="cyan")
-        skipped_serial = []
+        session = current_session()
+        device_map = resolve_serials(api_headers=headers, serial_numbers=serials)
+        inventory_map = resolve_inventory_serials(
+            api_headers=headers,
+            serial_numbers=[
+                serial
+                for serial, (_, device_state, _) in device_map.items()
+                if device_state in inventory_device_states
+            ],
+        )
         for index, serial in enumerate(
-            tqdm(
-                serials, ascii=True, ncols=max_col_length, desc="[*] Deletion progress", unit="devices"
+            track_progress(
+                serials,
+                operation="delete",
+                desc="[*] Deletion progress",
+                unit="devices",
             )
         ):
-            api_response = delete_device(api_headers=headers, device_serial=serial)
-            logging.debug(f"API Response: {api_response}")
+            api_response = delete_device(
+                api_headers=headers,
+                device_serial=serial,
+                device_map=device_map,
+                inventory_map=inventory_map,
+            )
+            logging.debug("API Response: %s", api_response)
             if api_response:
                 response_status, _ = get_response(response=api_response)
                 if not response_status:
                     click.secho(f"[x] Device [{serial}] not removed!", fg="red")
-                    logging.debug(f"[{serial}] not removed!")
+                    logging.debug("[%s] not removed!", serial)
                     continue
             else:
-                skipped_serial.append(serial)
-        goodbye(before=True, data=skipped_serial)
+                session.skip(serial)
+        goodbye(before=True, data=session.skipped)
@@ -4,139 +4,177 @@
 """Main module for dnac-pnp"""
 
 # Import builtin python libraries
-import json
+from itertools import chain, islice
 import logging
 import sys
 
 # Import external python libraries
 import click
-from tqdm import tqdm
 
 # Import custom (local) python packages
 from .api_call_handler import call_api_endpoint, get_response
 from .api_endpoint_handler import generate_api_url
+from .catalog_handler import show_validation_report, validate_catalog
 from .dnac_token_generator import generate_token
-from .dnac_params import max_col_length
-from .device_claim_handler import claim
+from .dnac_params import (
+    image_column,
+    non_claimable_states,
+    pnp_query_workers,
+    serial_chunk_size,
+)
+from .dnac_session import current_session
+from .device_claim_handler import ClaimScheduler, claim
 from .dnac_info_butler import (
-    get_device_id,
+    get_image_id,
     get_site_id,
     get_template_id,
-    get_template_parameters,
+    get_template_schema,
+    resolve_serials,
+    unresolved_device,
 )
+from .dnac_tracing import tracer
 from .header_handler import get_headers
-from .utils import divider, goodbye, parse_csv
+from .template_binder import TemplateBinder
+from .utils import divider, goodbye, stream_csv, track_progress
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
-# Keep track of skipped serials
-skip_tracer = []
+
+# Compile template binder
+def compile_binder(dnac_api_headers=None, template_name=None):
+    """
+    This function looks up a day0 template and compiles its binder
+
+    :param dnac_api_headers: (dict) DNA center api headers
+    :param template_name: (str) Template name as [project_name/template_name]
+    :return: (TemplateBinder) Template binder, False if the template is not usable
+    """
+
+    config_id = get_template_id(api_headers=dnac_api_headers, template=template_name)
+    if not config_id:
+        logging.debug("[x] Template Name [%s] is not present", template_name)
+        return False
+    logging.debug("Configuration ID: [%s]", config_id)
+    _, template_schema = get_template_schema(
+        api_headers=dnac_api_headers, config_id=config_id
+    )
+    if not template_schema:
+        logging.debug("[x] Template parameters not found!")
+        return False
+    return TemplateBinder(config_id=config_id, schema=template_schema)
 
 
 # Template parameter check
-def _check_template_parameters(dnac_api_headers=None, data=None):
+@tracer.wrap("template-lookup")
+def _check_template_parameters(dnac_api_headers=None, data=None, binders=None):
     """
     This private function checks day0 template parameters
 
     :param dnac_api_headers: (dict) DNA center api headers
-    :param data: (dict) Input data, This is same as payload data / air-config
-    :return: (boolean, dict) True if input is consistent, False, otherwise and data
+    :param data: (CatalogRow) Input data, This is same as payload data / air-config
+    :param binders: (dict) Template name and compiled binder, filled on first use
+    :return: (boolean, CatalogRow) True if input is consistent, False, otherwise and data
     """
 
-    # Template variable validation
-    # Template ID == Config ID
-    template_name = data["deviceInfo"]["template_name"]
-    input_parameters = data["deviceInfo"].keys()
-    config_id = get_template_id(api_headers=dnac_api_headers, config_data=data)
-    if config_id:
-        logging.debug(f"[#] Configuration ID received!")
-        data["deviceInfo"]["configId"] = config_id
-        logging.debug(f"Configuration ID: [{config_id}]")
-        _, template_parameters = get_template_parameters(
-            api_headers=dnac_api_headers, config_id=config_id
+    template_name = data.template_name
+    if binders is None:
+        binders = {}
+    binder = binders.get(template_name)
+    if binder is None:
+        binder = binders[template_name] = compile_binder(
+            dnac_api_headers=dnac_api_headers, template_name=template_name
         )
-        if template_parameters:
-            logging.debug(f"[#] Template parameters received!")
-            logging.debug(
-                f"[$] Validating input parameters against "
-                f"DNA center template parameters....."
-            )
-            logging.debug(f"[$] Parsing parameters.....")
-            config_parameters = []
-            for item in template_parameters:
-                try:
-                    conf_dict = {"key": item, "value": data["deviceInfo"][item]}
-                    config_parameters.append(conf_dict)
-                except KeyError as err:
-                    click.secho(f"[x] Key error!", fg="red")
-                    click.secho(f"[x] ERROR: Check parameter [{err}]", fg="red")
-            data["deviceInfo"]["configParameters"] = config_parameters
-            logging.debug(f"Data with config parameters: {data}")
-            logging.debug(f"Parameter from DNA center: {template_parameters}")
-            logging.debug(f"Input parameters: {input_parameters}")
-            logging.debug(f"Input data: {json.dumps(data, indent=4)}")
-            template_parameter_status = all(
-                item in input_parameters for item in template_parameters
-            )
-        else:
-            logging.debug(f"[x] Template parameters not found!")
-            template_parameter_status = False
-    else:
-        logging.debug(f"[x] Template Name [{template_name}] is not present")
-        template_parameter_status = False
-
-    return template_parameter_status, data
+    if not binder:
+        return False, data
+    errors = binder.bind(row=data)
+    for error in errors:
+        logging.debug("[x] [%s] %s", data.serial_number, error)
+    return not errors, data
 
 
 # Site name check
-def _check_device(headers=None, data=None):
+@tracer.wrap("device-lookup")
+def _check_device(headers=None, data=None, device_map=None):
     """
     This private function checks the site name validity
 
     :param headers: (dict) DNAC api headers
-    :param data: (dict) This is same as payload data / air-config
-    :return: (boolean, dict) Site status and data
+    :param data: (CatalogRow) This is same as payload data / air-config
+    :param device_map: (dict) Serials already resolved by resolve_serials
+    :return: (boolean, str, CatalogRow) Device status, device state and data
     """
 
-    device_serial_number = data["deviceInfo"]["serialNumber"]
-    device_id, device_state, _ = get_device_id(
-        dnac_api_headers=headers, serial_number=device_serial_number, dnac_tab="pnp"
-    )
+    device_serial_number = data.serial_number
+    if device_map is None:
+        device_map = resolve_serials(
+            api_headers=headers, serial_numbers=[device_serial_number]
+        )
+    device_id, device_state, _ = device_map.get(device_serial_number, unresolved_device)
     if device_id:
-        logging.debug(f"Device ID: {device_id}")
+        logging.debug("Device ID: %s", device_id)
         device_status = True
-        data["deviceInfo"]["deviceId"] = device_id
+        data.device_id = device_id
     else:
-        logging.debug(f"Device not available in DNAC!")
+        logging.debug("Device not available in DNAC!")
         device_status = False
     return device_status, device_state, data
 
 
 # Site name check
-def _check_site_name(headers=None, data=None):
+@tracer.wrap("site-lookup")
+def _check_site_name(headers=None, data=None, sites=None):
     """
     This private function checks the site name validity
 
     :param headers: (dict) DNAC api headers
-    :param data: (dict) This is same as payload data / air-config
-    :return: (boolean, dict) Site status and data
+    :param data: (CatalogRow) This is same as payload data / air-config
+    :param sites: (SiteIndex) Site index, the site is looked up by API if not provided
+    :return: (boolean, CatalogRow) Site status and data
     """
 
-    dnac_site_name = data["deviceInfo"]["siteName"]
-    site_id = get_site_id(dnac_api_headers=headers, site_name=dnac_site_name)
+    dnac_site_name = data.site_name
+    if sites is not None:
+        site_id = sites.site_id(site_name=dnac_site_name)
+    else:
+        site_id = get_site_id(dnac_api_headers=headers, site_name=dnac_site_name)
     if site_id:
-        logging.debug(f"Site ID: {site_id}")
+        logging.debug("Site ID: %s", site_id)
         site_status = True
-        data["deviceInfo"]["siteId"] = site_id
+        data.site_id = site_id
     else:
-        logging.debug(f"Site not found!")
+        logging.debug("Site not found!")
         site_status = False
     return site_status, data
 
 
+# Image name check
+def _check_image(headers=None, data=None, images=None):
+    """
+    This private function sets the ID of the image a device is upgraded to
+
+    :param headers: (dict) DNAC api headers
+    :param data: (CatalogRow) This is same as payload data / air-config
+    :param images: (dict) Image name and ID, the image is looked up by API if not
+                   provided
+    :return: (boolean) False if the row has an image that is not present
+    """
+
+    image_name = data.get(image_column)
+    if not image_name:
+        return True
+    if images is not None:
+        image_id = images.get(image_name)
+    else:
+        image_id = get_image_id(dnac_api_headers=headers, image_name=image_name)
+    logging.debug("Image ID: %s", image_id)
+    data.image_id = image_id or None
+    return bool(image_id)
+
+
 # Add a device
+@tracer.wrap("import")
 def add_device(dnac_api_headers=None, payload_data=None):
     """
     This function adds a device
@@ -147,7 +185,7 @@ def add_device(dnac_api_headers=None, payload_data=None):
     """
     # ========================== Add device to PnP list ================================
     method, api_url, parameters = generate_api_url(api_type="import-device")
-    logging.debug(f"Method: {method}, API:{api_url}, Parameters:{parameters}")
+    logging.debug("Method: %s, API:%s, Parameters:%s", method, api_url, parameters)
     api_response = call_api_endpoint(
         method=method,
         api_url=api_url,
@@ -164,19 +202,20 @@ def claim_device(dnac_api_headers=None, payload_data=None):
     This function claims a device
 
     :param dnac_api_headers: (dict) API headers
-    :param payload_data: (dict) Payload data for adding a device
+    :param payload_data: (CatalogRow) Catalog row of the device to claim
     :return: (obj) Requests response object
     """
-    device_serial_number = payload_data["deviceInfo"]["serialNumber"]
+    device_serial_number = payload_data.serial_number
     logging.debug(
-        f"[*] Starting CLAIM process for serial [{device_serial_number}]....."
+        "[*] Starting CLAIM process for serial [%s].....", device_serial_number
     )
-    device_id, _, _ = get_device_id(
-        serial_number=device_serial_number,
-        dnac_api_headers=dnac_api_headers,
-        dnac_tab="pnp",
-    )
-    logging.debug(f"DeviceID: {device_id}")
+    device_id = payload_data.device_id
+    if not device_id:
+        device_map = resolve_serials(
+            api_headers=dnac_api_headers, serial_numbers=[device_serial_number]
+        )
+        device_id, _, _ = device_map.get(device_serial_number, unresolved_device)
+    logging.debug("DeviceID: %s", device_id)
     if device_id:
         claim_status = claim(
             headers=dnac_api_headers, device_id=device_id, data=payload_data
@@ -188,40 +227,49 @@ def claim_device(dnac_api_headers=None, payload_data=None):
 
 
 # Acclaim device
-def acclaim_device(api_headers=None, data=None):
+@tracer.wrap("acclaim")
+def acclaim_device(api_headers=None, data=None, device_map=None, claims=None):
     """
     This function add and claim devices based on device state
 
     :param api_headers: (dict) API headers
-    :param data: (dict) Payload data for api calls
-    :return: (stdout) On screen output
+    :param data: (CatalogRow) Payload data for api calls
+    :param device_map: (dict) Serials already resolved by resolve_serials
+    :param claims: (ClaimScheduler) Claims the device in the background if provided
+    :return: (str) Reason if the device was not claimed, None otherwise
     """
 
     # ========================== Check device state ====================================
-    non_claimable_states = ["Planned", "Onboarding", "Provisioned"]
     ready_to_add = False
     ready_to_claim = False
-    serial_number = data["deviceInfo"]["serialNumber"]
-    device_attached, device_state, data = _check_device(headers=api_headers, data=data)
+    serial_number = data.serial_number
+    device_attached, device_state, data = _check_device(
+        headers=api_headers, data=data, device_map=device_map
+    )
     logging.debug(
-        f"Device attached?: {device_attached}, State: {device_state}, Data={data}"
+        "Device attached?: %s, State: %s, Data=%s", device_attached, device_state, data
     )
     if device_attached:
         if device_state == "Unclaimed":
             ready_to_claim = True
         elif device_state in non_claimable_states:
-            logging.debug(f"[!] Warning: Skipping [{serial_number}].....")
+            logging.debug("[!] Warning: Skipping [%s].....", serial_number)
             logging.debug(
-                f"[!] Reason: Device [{serial_number}] State: [{device_state}]"
+                "[!] Reason: Device [%s] State: [%s]", serial_number, device_state
             )
-            skip_tracer.append(serial_number)
+            current_session().skip(serial_number)
+            return f"Device state [{device_state}] is not claimable"
     else:
         ready_to_add = True
     # ========================== Add device ============================================
     if ready_to_add:
-        api_response = add_device(dnac_api_headers=api_headers, payload_data=data)
+        api_response = add_device(
+            dnac_api_headers=api_headers, payload_data=data.to_payload()
+        )
         response_status, response_body = get_response(response=api_response)
         if response_status and response_body["successList"]:
+            # The imported device carries its ID, no need to look it up again
+            data.device_id = response_body["successList"][0].get("id")
             ready_to_claim = True
         else:
             click.secho(
@@ -237,9 +285,13 @@ def acclaim_device(api_headers=None, data=None):
             sys.exit(1)
     # ======================== Claim device ============================================
     if ready_to_claim:
+        if claims is not None and data.device_id:
+            claims.submit(data=data)
+            return None
         claim_status = claim_device(dnac_api_headers=api_headers, payload_data=data)
         if not claim_status:
             click.secho(f"[x] Claim status: {claim_status}", fg="red")
+            return f"Claim of [{serial_number}] failed"
 
 
 # Single device import
@@ -248,69 +300,193 @@ def import_single_device(configs=None, data=None):
     This module imports single device into dnac
 
     :param configs: (dict) DNAC configurations
-    :param data: (dict) API body data
+    :param data: (CatalogRow) Device information
     :returns: (stdout) output to the screen
     """
 
     token = generate_token(configs=configs)
     headers = get_headers(auth_token=token)
-    site_name = data["deviceInfo"]["siteName"]
-    serial_number = data["deviceInfo"]["serialNumber"]
+    site_name = data.site_name
+    serial_number = data.serial_number
     divider(f"Site [{site_name}] validation for [{serial_number}]")
-    site_status, data = _check_site_name(headers=headers, data=data)
-    if site_status:
+    with tracer.span("catalog-row", **{"dnac.serial_number": serial_number}):
+        site_status, data = _check_site_name(headers=headers, data=data)
+        if not site_status:
+            click.secho(f"[x] Site name [{site_name}] is not valid!", fg="red")
+            click.secho(f"[$] Exiting.....", fg="blue")
+            sys.exit(1)
+        if not _check_image(headers=headers, data=data):
+            click.secho(
+                f"[x] Image [{data.get(image_column)}] is not present!", fg="red"
+            )
+            click.secho(f"[$] Exiting.....", fg="blue")
+            sys.exit(1)
         acclaim_device(api_headers=headers, data=data)
-    else:
-        click.secho(f"[x] Site name [{site_name}] is not valid!", fg="red")
-        click.secho(f"[$] Exiting.....", fg="blue")
-        sys.exit(1)
     goodbye()
 
 
+# Resolve devices ahead of the import
+def _prefetch_devices(headers=None, rows=None, skip=None, device_map=None):
+    """
+    This private function resolves the PnP devices of the rows batch by batch
+
+    Every batch is resolved with a few parallel multi-value queries right before
+    its rows are imported, so the catalog is still streamed. Serials that are
+    already in the device map are not looked up again.
+
+    :param headers: (dict) DNAC api headers
+    :param rows: (iterable) Catalog rows
+    :param skip: (dict) Serials that are not imported
+    :param device_map: (dict) Resolved serials, updated with every batch
+    :return: (generator) Catalog rows
+    """
+
+    batch_size = serial_chunk_size * pnp_query_workers
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        serials = [
+            row.serial_number
+            for row in batch
+            if row.serial_number not in skip and row.serial_number not in device_map
+        ]
+        if serials:
+            with tracer.span("device-prefetch", **{"dnac.serials": len(serials)}):
+                device_map.update(
+                    resolve_serials(api_headers=headers, serial_numbers=serials)
+                )
+        yield from batch
+
+
+# Import one catalog row
+def import_row(
+    headers=None,
+    row=None,
+    device_map=None,
+    binders=None,
+    sites=None,
+    images=None,
+    claims=None,
+):
+    """
+    This function validates and imports one catalog row
+
+    :param headers: (dict) DNAC api headers
+    :param row: (CatalogRow) Catalog row
+    :param device_map: (dict) Serials already resolved by resolve_serials
+    :param binders: (dict) Template name and compiled binder
+    :param sites: (SiteIndex) Site index, sites are looked up by API if not provided
+    :param images: (dict) Image name and ID, images are looked up by API if not
+                   provided
+    :param claims: (ClaimScheduler) Claims the device in the background if provided
+    :return: (str) Reason if the row was not imported, None otherwise
+    """
+
+    serial_number = row.serial_number
+    # Site Validation
+    site_status, data = _check_site_name(headers=headers, data=row, sites=sites)
+    site_name = data.site_name
+    if site_status and not _check_image(headers=headers, data=data, images=images):
+        logging.debug("[x] Image [%s] is not present!", data.get(image_column))
+        current_session().skip(serial_number)
+        return f"Image [{data.get(image_column)}] is not present"
+    if site_status:
+        template_parameter_status, mod_data = _check_template_parameters(
+            dnac_api_headers=headers, data=data, binders=binders
+        )
+        if template_parameter_status:
+            return acclaim_device(
+                api_headers=headers,
+                data=mod_data,
+                device_map=device_map,
+                claims=claims,
+            )
+        logging.debug("[x] Parameter mismatch!")
+        current_session().skip(serial_number)
+        return f"Template [{data.template_name}] parameters do not match the row"
+    logging.debug("[x] Site name [%s] is not valid!", site_name)
+    logging.debug("[!] Warning: Skipping [%s].....", serial_number)
+    current_session().skip(serial_number)
+    return f"Site [{site_name}] is not valid"
+
+
 # Device import in bulk
-def device_import_in_bulk(configs=None, import_file=None):
+def device_import_in_bulk(
+    configs=None, import_file=None, validate_only=False, workers=None
+):
     """
     This module imports devices in bulk
 
     :param configs: (dict) DNAc configurations
     :param import_file: (path) Full device list file path with extension
+    :param validate_only: (boolean) Only validate the catalog, do not import
+    :param workers: (int) Parallel device claims, defaults to claim_workers
     :returns: (stdout) Output to the screen
     """
 
-    csv_rows = parse_csv(file_to_parse=import_file)
-    if csv_rows:
+    # Malformed rows are reported by the catalog validation
+    csv_rows = stream_csv(file_to_parse=import_file, report_errors=False)
+    first_row = next(csv_rows, None)
+    if first_row is not None:
+        csv_rows = chain([first_row], csv_rows)
         token = generate_token(configs=configs)
         headers = get_headers(auth_token=token)
+        divider("Catalog Validation")
+        references = {}
+        rejected, total_rows = validate_catalog(
+            api_headers=headers, import_file=import_file, references=references
+        )
+        show_validation_report(rejected=rejected, total_rows=total_rows)
+        if validate_only:
+            goodbye()
+            return
         divider("Device Management")
         click.secho(
             f"[*] Starting device management (add + claim) engine.....", fg="cyan"
         )
-        for index, row in enumerate(
-            tqdm(
+        binders = {
+            template_name: template.binder
+            for template_name, template in references["templates"].items()
+        }
+        # Serials resolved by the validation are not looked up again
+        device_map = dict(references["devices"] or {})
+        csv_rows = _prefetch_devices(
+            headers=headers, rows=csv_rows, skip=rejected, device_map=device_map
+        )
+        # Malformed rows are not streamed, duplicate serials are skipped once
+        readable_rows = total_rows - len(references["malformed"])
+        skipped = set()
+        with ClaimScheduler(api_headers=headers, workers=workers) as claims:
+            for row in track_progress(
                 csv_rows,
-                ascii=True,
-                ncols=max_col_length,
+                operation="import",
+                total=readable_rows,
                 unit="device",
                 desc="[*] Device claim progress",
-            )
-        ):
-            air_config = {"deviceInfo": row}
-            logging.debug(json.dumps(air_config, indent=4, sort_keys=True))
-            # Site Validation
-            site_status, data = _check_site_name(headers=headers, data=air_config)
-            site_name = data["deviceInfo"]["siteName"]
-            serial_number = data["deviceInfo"]["serialNumber"]
-            if site_status:
-                template_parameter_status, mod_data = _check_template_parameters(
-                    dnac_api_headers=headers, data=air_config
-                )
-                if template_parameter_status:
-                    acclaim_device(api_headers=headers, data=mod_data)
-                else:
-                    logging.debug(f"[x] Parameter mismatch!")
-                    skip_tracer.append(serial_number)
-            else:
-                logging.debug(f"[x] Site name [{site_name}] is not valid!")
-                logging.debug(f"[!] Warning: Skipping [{serial_number}].....")
-                skip_tracer.append(serial_number)
-        goodbye(before=True, data=skip_tracer)
+            ):
+                serial_number = row.serial_number
+                if serial_number in rejected:
+                    if serial_number not in skipped:
+                        skipped.add(serial_number)
+                        current_session().skip(serial_number)
+                    continue
+                logging.debug("Catalog row: %s", row)
+                with tracer.span(
+                    "catalog-row",
+                    **{
+                        "dnac.serial_number": serial_number,
+                        "dnac.line": row.line_number,
+                    },
+                ):
+                    import_row(
+                        headers=headers,
+                        row=row,
+                        device_map=device_map,
+                        binders=binders,
+                        sites=references["sites"],
+                        images=references["images"],
+                        claims=claims,
+                    )
+        goodbye(before=True, data=current_session().skipped)
@@ -14,33 +14,22 @@ import sys
 import click
 
 # Import custom (local) python packages
+from .api_call_handler import create_client
 from .config_handler import config_files, load_config
-from .device_import_handler import device_import_in_bulk, import_single_device
-from .dnac_info_handler import show_template_info, show_pnp_device_info, show_site_info
-from .device_delete_handler import remove_devices
+from .dnac_session import DnacSession
 from .utils import divider, parse_txt
-from .site_handler import add_site
-
-# Setting global host variable
-all_configs = {}
-dnac_configs = {}
-host = ""
 
 
 # Populate configurations
 def populate_config():
-    """This function loads the configurations for DNA center"""
+    """
+    This function loads the configurations for DNA center
 
-    # Using the defined global variables
-    global all_configs
-    global dnac_configs
-    global host
+    :return: (DnacSession) Session with the loaded configurations
+    """
 
     divider("Configurations")
-    if not all_configs:
-        all_configs = load_config(config_files)
-        dnac_configs = all_configs["dnac"]
-        host = dnac_configs["host"]
+    return DnacSession(configs=load_config(config_files), client=create_client())
 
 
 # Import one or more devices
@@ -54,20 +43,22 @@ def import_manager(inputs=None, import_type=None, **kwargs):
     :returns: (str) import status
     """
 
-    populate_config()
+    session = populate_config()
     # ==================== SINGLE DEVICE IMPORT ========================================
     if import_type == "single":
         click.secho(f"[!] Attention: ", fg="yellow", nl=False)
         click.secho(f"Claiming single device does not support ", nl=False, fg="red")
         click.secho(f"day0 template configurations!", fg="red")
         if click.confirm(text=f"[-] Proceed?", abort=True):
-            import_single_device(configs=dnac_configs, data=inputs)
+            session.warm_up()
+            session.import_device(data=inputs)
     # =================== IMPORT  IN BULK ==============================================
     elif import_type == "bulk":
+        if not session.configs.get("controllers") and kwargs.get("processes", 1) <= 1:
+            # Login while the catalog is located and read
+            session.warm_up()
         if "device_catalog" not in kwargs:
-            device_catalog_dir = os.path.join(
-                all_configs["common"]["base_directory"], "catalog"
-            )
+            device_catalog_dir = os.path.join(session.base_directory, "catalog")
             device_catalog_file = os.path.join(device_catalog_dir, "DeviceImport.csv")
             click.secho(
                 f"[*] Looking for device catalog file in [{device_catalog_file}].....",
@@ -75,12 +66,73 @@ def import_manager(inputs=None, import_type=None, **kwargs):
             )
         else:
             device_catalog_file = kwargs.get("device_catalog")
-        device_import_in_bulk(configs=dnac_configs, import_file=device_catalog_file)
+        if session.configs.get("controllers"):
+            from .fleet_handler import fan_out
+
+            fan_out(
+                all_configs=session.configs,
+                operation="import",
+                catalog_file=device_catalog_file,
+                validate_only=kwargs.get("validate_only", False),
+            )
+            return
+        if kwargs.get("processes", 1) > 1:
+            from .fleet_handler import shard_out
+
+            shard_out(
+                configs=session.dnac_configs,
+                catalog_file=device_catalog_file,
+                processes=kwargs["processes"],
+                validate_only=kwargs.get("validate_only", False),
+            )
+            return
+        session.import_catalog(
+            catalog_file=device_catalog_file,
+            validate_only=kwargs.get("validate_only", False),
+        )
     else:
         click.secho(f"Invalid import type!", fg="red")
         sys.exit(1)
 
 
+# Catalog sync
+def sync_manager(device_catalog=None, plan_only=False, prune=False):
+    """
+    This function syncs DNA center PnP with the device catalog
+
+    :param device_catalog: (str) Full device catalog file path
+    :param plan_only: (boolean) Only print the plan, do not apply it
+    :param prune: (boolean) Delete PnP devices that are not in the catalog
+    :return: (stdout) Sync status on the screen
+    """
+
+    session = populate_config()
+    if device_catalog is None:
+        device_catalog = os.path.join(
+            session.base_directory, "catalog", "DeviceImport.csv"
+        )
+        click.secho(
+            f"[*] Looking for device catalog file in [{device_catalog}].....",
+            fg="cyan",
+        )
+    if prune and not plan_only:
+        click.confirm(
+            text=f"[-] Delete PnP devices that are not in the catalog?", abort=True
+        )
+    if session.configs.get("controllers"):
+        from .fleet_handler import fan_out
+
+        fan_out(
+            all_configs=session.configs,
+            operation="sync",
+            catalog_file=device_catalog,
+            plan_only=plan_only,
+            prune=prune,
+        )
+        return
+    session.sync_catalog(catalog_file=device_catalog, plan_only=plan_only, prune=prune)
+
+
 # DNA center device deletion
 def delete_manager(serials=None, delete_file=None, dry_run=None):
     """
@@ -115,11 +167,11 @@ def delete_manager(serials=None, delete_file=None, dry_run=None):
         if click.confirm(
             text=f"[-] Delete {len(serials_to_delete)} devices?", abort=True
         ):
-            populate_config()
+            session = populate_config()
             logging.debug(
                 f"User confirmed deletion of [{len(serials_to_delete)}]devices"
             )
-            remove_devices(configs=dnac_configs, serials=serials_to_delete)
+            session.remove_devices(serials=serials_to_delete)
     else:
         for serial in serials_to_delete:
             click.secho(
@@ -132,44 +184,141 @@ def delete_manager(serials=None, delete_file=None, dry_run=None):
 def site_manger(site_config_file_path=None):
     """Manages DNA center site creation"""
 
-    populate_config()
-    add_site(dnac_auth_configs=dnac_configs, locations_file_path=site_config_file_path)
+    from .site_handler import add_site
+
+    session = populate_config()
+    # Login while the sites configuration is read
+    session.warm_up()
+    with session:
+        add_site(
+            dnac_auth_configs=session.dnac_configs,
+            locations_file_path=site_config_file_path,
+        )
+
+
+# DNA Center job server
+def serve_manager(bind=None, port=None, socket_path=None, workers=None):
+    """
+    This function runs the job server on a warm DNA center session
+
+    :param bind: (str) Address of the HTTP server
+    :param port: (int) Port of the HTTP server
+    :param socket_path: (str) Unix socket path, used instead of HTTP address/port
+    :param workers: (int) Jobs running at the same time
+    :return: (stdout) Server status on the screen
+    """
+
+    from .server_handler import serve
+
+    session = populate_config()
+    serve(
+        session=session,
+        bind=bind,
+        port=port,
+        socket_path=socket_path,
+        workers=workers,
+    )
+
+
+# DNA Center job store
+def job_manager(action=None, store_file=None, **kwargs):
+    """
+    This function submits catalogs to the job store, runs its workers or shows status
+
+    :param action: (str) submit, run or status
+    :param store_file: (str) Job store file path, defaults to the base directory
+    :param kwargs: (kwargs) Options of the action
+    :return: (stdout) Job status on the screen
+    """
+
+    from .job_handler import get_store_path, run_jobs, show_job_status, submit_catalog
+
+    session = populate_config()
+    store_path = get_store_path(
+        base_directory=session.base_directory, store_file=store_file
+    )
+    if action == "status":
+        show_job_status(
+            store_path=store_path,
+            errors=kwargs.get("errors", False),
+            limit=kwargs.get("limit"),
+        )
+        return
+    with session:
+        if action == "submit":
+            submit_catalog(
+                configs=session.dnac_configs,
+                catalog_file=kwargs["catalog_file"],
+                store_path=store_path,
+            )
+        else:
+            run_jobs(
+                configs=session.dnac_configs,
+                store_path=store_path,
+                processes=kwargs.get("processes"),
+            )
 
 
 # DNA Center information showcase handler
 def info_showcase_manager(**kwargs):
     """This function controls information showcase"""
 
-    populate_config()
-    if kwargs["command"] == "all_locations":
-        do_show_all = True
-        show_site_info(dnac_configs=dnac_configs, show_all=do_show_all)
-    elif kwargs["command"] == "all_templates":
-        do_show_all = True
-        show_template_info(dnac_configs=dnac_configs, show_all=do_show_all)
-    elif kwargs["command"] == "single_template":
-        do_show_all = False
-        dnac_template_name = kwargs["template"]
-        logging.debug(f"Template Name from INPUT: {dnac_template_name}")
-        show_template_info(
-            dnac_configs=dnac_configs,
-            template_name=dnac_template_name,
-            show_all=do_show_all,
-        )
-    elif kwargs["command"] == "all_pnp_devices":
-        do_show_all = True
-        show_pnp_device_info(dnac_configs=dnac_configs, show_all=do_show_all)
-    elif kwargs["command"] == "single_pnp_device":
-        do_show_all = False
-        dnac_device_serial = kwargs["device"]
-        show_pnp_device_info(
-            dnac_configs=dnac_configs,
-            device_serial=dnac_device_serial,
-            show_all=do_show_all,
-        )
-    elif kwargs["command"] == "export_pnp_to_csv":
-        export_file = kwargs["file_path"]
-        click.secho(f"[$] Export file path location: [{export_file}]", fg="blue")
-        show_pnp_device_info(
-            dnac_configs=dnac_configs, show_all=True, export_path=export_file
-        )
+    from .dnac_info_handler import (
+        show_template_info,
+        show_pnp_device_info,
+        show_site_info,
+    )
+
+    session = populate_config()
+    dnac_configs = session.dnac_configs
+    with session:
+        if kwargs["command"] == "all_locations":
+            do_show_all = True
+            show_site_info(
+                dnac_configs=dnac_configs,
+                show_all=do_show_all,
+                limit=kwargs.get("limit"),
+                offset=kwargs.get("offset", 0),
+                pager=kwargs.get("pager", False),
+                site_prefix=kwargs.get("site_prefix"),
+                site_type=kwargs.get("site_type"),
+            )
+        elif kwargs["command"] == "all_templates":
+            do_show_all = True
+            show_template_info(dnac_configs=dnac_configs, show_all=do_show_all)
+        elif kwargs["command"] == "single_template":
+            do_show_all = False
+            dnac_template_name = kwargs["template"]
+            logging.debug(f"Template Name from INPUT: {dnac_template_name}")
+            show_template_info(
+                dnac_configs=dnac_configs,
+                template_name=dnac_template_name,
+                show_all=do_show_all,
+            )
+        elif kwargs["command"] == "all_pnp_devices":
+            do_show_all = True
+            show_pnp_device_info(
+                dnac_configs=dnac_configs,
+                show_all=do_show_all,
+                limit=kwargs.get("limit"),
+                offset=kwargs.get("offset", 0),
+                pager=kwargs.get("pager", False),
+                pnp_filters=kwargs.get("pnp_filters"),
+            )
+        elif kwargs["command"] == "single_pnp_device":
+            do_show_all = False
+            dnac_device_serial = kwargs["device"]
+            show_pnp_device_info(
+                dnac_configs=dnac_configs,
+                device_serial=dnac_device_serial,
+                show_all=do_show_all,
+            )
+        elif kwargs["command"] == "export_pnp_to_csv":
+            export_file = kwargs["file_path"]
+            click.secho(f"[$] Export file path location: [{export_file}]", fg="blue")
+            show_pnp_device_info(
+                dnac_configs=dnac_configs,
+                show_all=True,
+                export_path=export_file,
+                pnp_filters=kwargs.get("pnp_filters"),
+            )
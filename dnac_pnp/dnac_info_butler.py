@@ -4,6 +4,7 @@
 """Information butler functions"""
 
 # Import builtin python libraries
+from itertools import islice, product
 import json
 import logging
 import sys
@@ -15,12 +16,26 @@ import click
 from .api_call_handler import get_response
 from .api_endpoint_handler import generate_api_url
 from .header_handler import get_headers
-from .dnac_params import device_extra_param, device_extra_param_less, pnp_device_limit
+from .dnac_params import (
+    device_extra_param,
+    device_extra_param_less,
+    image_page_size,
+    pnp_device_limit,
+    pnp_page_size,
+    pnp_query_workers,
+    serial_chunk_size,
+)
+from .dnac_records import PnpDevice, Template
+from .dnac_session import SessionExecutor
+from .site_index import SiteIndex
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
+# Device ID, state and extra information of a serial that is not in PnP
+unresolved_device = (False, "Unavailable", {})
+
 
 # Retrieve device ID
 def get_device_id(
@@ -38,10 +53,11 @@ def get_device_id(
     :param serial_number: (str) Device serial number
     :param dnac_tab: (str) Where to look for the device info (PnP or Inventory)
     :param show_all: (boolean) To show whole list or not
-    :returns: (str) device ID from DNA center
+    :returns: (str, str, dict) device ID, state and extra information from DNA center,
+              (True, True, list) of PnpDevice records with show_all
     """
 
-    logging.debug(f"TAB: {dnac_tab}")
+    logging.debug("TAB: %s", dnac_tab)
     if dnac_tab == "pnp":
         dnac_api_type = "get-pnp-device-info"
     elif dnac_tab == "inventory":
@@ -64,22 +80,21 @@ def get_device_id(
     )
     try:
         if not show_all:
-            logging.debug(f"dnac tab: {dnac_tab}")
+            logging.debug("dnac tab: %s", dnac_tab)
             if dnac_tab == "pnp":
-                device_id = response_body[0]["id"]
-                device_state = response_body[0]["deviceInfo"]["state"]
-                logging.debug(f"Device ID: {device_id}")
+                device = PnpDevice.from_response(response_body[0])
+                device_id = device.id
+                device_state = device.state
+                logging.debug("Device ID: %s", device_id)
                 if device_state.casefold() == "Provisioned".casefold():
                     ext_param = device_extra_param
                 else:
                     ext_param = device_extra_param_less
-                device_extra = {}
-                for item in ext_param:
-                    device_extra[item] = response_body[0]["deviceInfo"][item]
+                device_extra = device.as_dict(ext_param)
             elif dnac_tab == "inventory":
                 device_id = response_body["response"][0]["id"]
                 device_state = response_body["response"][0]["collectionStatus"]
-                logging.debug(f"Device ID: {device_id}")
+                logging.debug("Device ID: %s", device_id)
                 device_extra = {}
             else:
                 device_id = False
@@ -88,12 +103,9 @@ def get_device_id(
             return device_id, device_state, device_extra
         else:
             if dnac_tab == "pnp":
-                available_devices = []
-                for item in response_body:
-                    device_extra = {}
-                    for param in device_extra_param_less:
-                        device_extra[param] = item["deviceInfo"][param]
-                    available_devices.append(device_extra)
+                available_devices = [
+                    PnpDevice.from_response(item) for item in response_body
+                ]
                 return True, True, available_devices
             else:
                 available_devices = []
@@ -101,11 +113,11 @@ def get_device_id(
 
     except KeyError as err:
         click.secho(f"[x] Key not found in the response!", fg="red")
-        logging.debug(f"Error: {err}")
+        logging.debug("Error: %s", err)
         sys.exit(1)
     except IndexError as err:
         logging.debug(f"[!] Index error! " f"Device might not be available in PnP")
-        logging.debug(f"Error: {err}")
+        logging.debug("Error: %s", err)
         device_state = "Unavailable"
         device_extra = {}
         return False, device_state, device_extra
@@ -134,35 +146,35 @@ def get_site_id(authentication_token=None, dnac_api_headers=None, site_name=None
         parameters=parameters,
     )
     try:
-        logging.debug(f"Type: {type(response_body)}")
+        logging.debug("Type: %s", type(response_body))
         response_json = json.loads(response_body)
         if response_json:
             site_id = response_json["response"][0]["id"]
-            logging.debug(f"Site ID: {site_id}")
+            logging.debug("Site ID: %s", site_id)
             return site_id
         else:
             err_msg = response_json["message"][0]
-            logging.debug(f"[*] Message: {err_msg}")
+            logging.debug("[*] Message: %s", err_msg)
             return False
     except KeyError as err:
-        logging.debug(f"[x] {err} Key not found in the response!")
-        logging.debug(f"Error: {err}")
+        logging.debug("[x] %s Key not found in the response!", err)
+        logging.debug("Error: %s", err)
         return False
     except IndexError as err:
-        logging.debug(f"[x] {err} The input site is not valid or site is not present")
-        logging.debug(f"Error: {err}")
+        logging.debug("[x] %s The input site is not valid or site is not present", err)
+        logging.debug("Error: %s", err)
         return False
 
 
 # Retrieve image ID
 def get_image_id(authentication_token=None, dnac_api_headers=None, image_name=None):
     """
-    This function retrieves site id based on site name
+    This function retrieves image id based on image name
 
     :param authentication_token: (str) Authentication token
     :param dnac_api_headers: (dict) DNAC api headers
     :param image_name: (str) Full image name with extension
-    :return: (str) Image ID from DNAC
+    :return: (str) Image ID from DNAC, False if the image is not present
     """
 
     if dnac_api_headers is None:
@@ -177,15 +189,63 @@ def get_image_id(authentication_token=None, dnac_api_headers=None, image_name=No
         parameters=parameters,
     )
     try:
-        logging.debug(f"Type: {type(response_body)}")
+        logging.debug("Type: %s", type(response_body))
         image_id = response_body["response"][0]["imageUuid"]
-        logging.debug(f"Image ID: {image_id}")
+        logging.debug("Image ID: %s", image_id)
         click.secho(f"[#] Image ID received!", fg="green")
         return image_id
     except KeyError as err:
-        logging.debug(f"Error: {err}")
+        logging.debug("Error: %s", err)
         click.secho(f"[x] Key not found in the response!", fg="red")
         sys.exit(1)
+    except IndexError as err:
+        logging.debug("[x] %s Image [%s] is not present", err, image_name)
+        return False
+
+
+# Retrieve image index
+def get_image_index(api_headers=None, page_size=image_page_size):
+    """
+    This function retrieves the ID of every imported image page by page
+
+    :param api_headers: (dict) DNA center API headers
+    :param page_size: (int) Number of images per API call
+    :return: (dict) Image name and image ID, False if the image list is not available
+    """
+
+    logging.debug("Getting image index from DNA center")
+    method, api_url, parameters = generate_api_url(api_type="get-image-info")
+    parameters.pop("name", None)
+    image_index = {}
+    offset = 0
+    while True:
+        # API offset is the index of the first record, starting at 1
+        parameters["offset"] = offset + 1
+        parameters["limit"] = page_size
+        response_status, response_body = get_response(
+            method=method,
+            endpoint_url=api_url,
+            headers=api_headers,
+            parameters=parameters,
+        )
+        if not response_status:
+            return False
+        try:
+            images = response_body["response"]
+            image_index.update(
+                (image["name"], image["imageUuid"])
+                for image in images
+                if image.get("name")
+            )
+        except Exception as err:
+            click.secho(f"[x] Exception! Error: [{err}]", fg="red")
+            return False
+        # DNA center may return less than a page, only an empty page is the end
+        if not images:
+            break
+        offset += len(images)
+    logging.debug("Image index: %s images", len(image_index))
+    return image_index
 
 
 def get_template_id(
@@ -200,18 +260,18 @@ def get_template_id(
 
     :param dnac_auth_token: (str) DNA center authentication token
     :param api_headers: (dict) DNA Center API headers
-    :param config_data: (dict) data <- CSV or CLI input
+    :param config_data: (CatalogRow) data <- CSV or CLI input
     :param show_all: (boolean) To show whole list or not
     :param template: (str) Template name
     :return: (string) Config ID (Config ID==Template ID) from DNA Center
     """
 
-    logging.debug(f"Retrieving config ID by template name")
+    logging.debug("Retrieving config ID by template name")
     if config_data:
-        template_name = config_data["deviceInfo"]["template_name"]
+        template_name = config_data.template_name
     else:
         template_name = template
-    logging.debug(f"Template Name: {template_name}")
+    logging.debug("Template Name: %s", template_name)
     if api_headers is None:
         api_headers = get_headers(auth_token=dnac_auth_token)
     method, api_url, parameters = generate_api_url(api_type="get-template-id")
@@ -233,10 +293,11 @@ def get_template_id(
                                 max_version = int(template_version["version"])
                                 template_id = template_version["id"]
                                 logging.debug(
-                                    f"Template ID received from template editor: "
-                                    f"[{template_id}]"
+                                    "Template ID received from template editor: "
+                                    "[%s]",
+                                    template_id,
                                 )
-                        logging.debug(f"ID:{template_id}, Version: {max_version}")
+                        logging.debug("ID:%s, Version: %s", template_id, max_version)
                         return template_id
             else:
                 click.secho(f"[$] Available templates:", fg="blue")
@@ -250,17 +311,53 @@ def get_template_id(
         return False
 
 
-def get_template_parameters(dnac_auth_token=None, api_headers=None, config_id=None):
+# Retrieve config IDs for many templates at once
+def get_template_id_map(dnac_auth_token=None, api_headers=None, template_names=None):
     """
-    This function retrieves parameters from the specified templates
+    This function resolves several template names with a single template listing
+
+    :param dnac_auth_token: (str) DNA center authentication token
+    :param api_headers: (dict) DNA Center API headers
+    :param template_names: (iterable) Template names as [project_name/template_name]
+    :return: (dict) Template name and Template record, False if template is not present
+    """
+
+    if api_headers is None:
+        api_headers = get_headers(auth_token=dnac_auth_token)
+    template_map = {template_name: False for template_name in template_names}
+    method, api_url, parameters = generate_api_url(api_type="get-template-id")
+    response_status, response_body = get_response(
+        method=method, endpoint_url=api_url, headers=api_headers, parameters=parameters
+    )
+    if not response_status:
+        return template_map
+    for template in response_body:
+        template_name = f"{template.get('projectName')}/{template.get('name')}"
+        if template_name not in template_map:
+            continue
+        latest = Template(name=template_name)
+        for template_version in template.get("versionsInfo", []):
+            if int(template_version["version"]) > latest.version:
+                latest.version = int(template_version["version"])
+                latest.id = template_version["id"]
+        if latest.id:
+            template_map[template_name] = latest
+        logging.debug("Template received: %s", latest)
+    return template_map
+
+
+# Get template parameter schema
+def get_template_schema(dnac_auth_token=None, api_headers=None, config_id=None):
+    """
+    This function retrieves the parameter schema of the specified template
 
     :param dnac_auth_token: (str) DNA center authentication token
     :param api_headers: (dict) DNA center API headers
     :param config_id: (str) Template id/config ID (templateId==configId)
-    :return: (str, list) Template content, Template parameters
+    :return: (str, list) Template content, (name, data type, required) per parameter
     """
 
-    logging.debug(f"[$] Template ID [{config_id}]")
+    logging.debug("[$] Template ID [%s]", config_id)
     if api_headers is None:
         api_headers = get_headers(auth_token=dnac_auth_token)
     method, r_api_url, parameters = generate_api_url(api_type="get-template-parameters")
@@ -268,24 +365,44 @@ def get_template_parameters(dnac_auth_token=None, api_headers=None, config_id=No
     response_status, response_body = get_response(
         method=method, endpoint_url=api_url, headers=api_headers
     )
+    template_schema = []
     if response_status:
-        template_parameters = []
         try:
             template_parameters_detailed = response_body["templateParams"]
             template_content = response_body["templateContent"]
             for item in template_parameters_detailed:
-                template_parameters.append(item["parameterName"])
-            logging.debug(
-                f"Parameters received from template " f"editor: {template_parameters}"
-            )
-            return template_content, template_parameters
+                template_schema.append(
+                    (
+                        item["parameterName"],
+                        item.get("dataType"),
+                        bool(item.get("required", False)),
+                    )
+                )
+            logging.debug("Schema received from template editor: %s", template_schema)
+            return template_content, template_schema
         except Exception as err:
             click.secho(f"[x] Exception! Error: {err}")
-            return False, template_parameters
+            return False, template_schema
     else:
-        template_parameters = []
-        logging.debug(f"Parameters received for template editor: {template_parameters}")
-        return False, template_parameters
+        logging.debug("Schema received for template editor: %s", template_schema)
+        return False, template_schema
+
+
+def get_template_parameters(dnac_auth_token=None, api_headers=None, config_id=None):
+    """
+    This function retrieves parameters from the specified templates
+
+    :param dnac_auth_token: (str) DNA center authentication token
+    :param api_headers: (dict) DNA center API headers
+    :param config_id: (str) Template id/config ID (templateId==configId)
+    :return: (str, list) Template content, Template parameters
+    """
+
+    template_content, template_schema = get_template_schema(
+        dnac_auth_token=dnac_auth_token, api_headers=api_headers, config_id=config_id
+    )
+    template_parameters = [name for name, _, _ in template_schema]
+    return template_content, template_parameters
 
 
 # Get PnP device count
@@ -298,7 +415,7 @@ def get_pnp_device_count(dnac_auth_token=None, api_headers=None):
     :return: (int) Total number of pnp devices available in DNA center
     """
 
-    logging.debug(f"Getting dna center pnp device count!")
+    logging.debug("Getting dna center pnp device count!")
     if api_headers is None:
         api_headers = get_headers(auth_token=dnac_auth_token)
     method, api_url, parameters = generate_api_url(api_type="get-pnp-device-count")
@@ -315,40 +432,237 @@ def get_pnp_device_count(dnac_auth_token=None, api_headers=None):
         return pnp_device_limit
 
 
-# Parse site data
-def _parse_site_additional_info(sites=None):
+# Expand multi-value PnP filters
+def _expand_pnp_filters(pnp_filters=None):
+    """
+    This private function splits multi-value filters into single-value queries
+
+    :param pnp_filters: (dict) API query parameter and list of values
+    :return: (list) One dictionary of query parameters per request
+    """
+
+    if not pnp_filters:
+        return [{}]
+    keys = list(pnp_filters)
+    return [
+        dict(zip(keys, values))
+        for values in product(*(pnp_filters[key] for key in keys))
+    ]
+
+
+# Page through PnP devices
+def _page_pnp_devices(
+    api_headers=None, query=None, offset=0, limit=None, page_size=pnp_page_size
+):
+    """
+    This private function retrieves PnP devices of one query page by page
+
+    :param api_headers: (dict) DNA center API headers
+    :param query: (dict) Filter query parameters
+    :param offset: (int) Number of devices to skip
+    :param limit: (int) Maximum number of devices, all if not provided
+    :param page_size: (int) Number of devices per API call
+    :return: (generator) PnpDevice records
+    """
+
+    method, api_url, parameters = generate_api_url(api_type="get-pnp-device-info")
+    parameters.update(query or {})
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_limit = page_size if remaining is None else min(page_size, remaining)
+        # API offset is the index of the first record, starting at 1
+        parameters["offset"] = offset + 1
+        parameters["limit"] = page_limit
+        response_status, response_body = get_response(
+            method=method,
+            endpoint_url=api_url,
+            headers=api_headers,
+            parameters=parameters,
+        )
+        if not response_status or not response_body:
+            return
+        for item in response_body:
+            yield PnpDevice.from_response(item)
+        offset += len(response_body)
+        if remaining is not None:
+            remaining -= len(response_body)
+        if len(response_body) < page_limit:
+            return
+
+
+# Stream PnP devices page by page
+def iter_pnp_devices(
+    api_headers=None, offset=0, limit=None, page_size=pnp_page_size, pnp_filters=None
+):
+    """
+    This function retrieves PnP devices page by page and yields them one by one
+
+    Filters are applied by DNA center. A multi-value filter is split into one
+    query per value and the queries run in parallel.
+
+    :param api_headers: (dict) DNA center API headers
+    :param offset: (int) Number of devices to skip
+    :param limit: (int) Maximum number of devices, all if not provided
+    :param page_size: (int) Number of devices per API call
+    :param pnp_filters: (dict) API query parameter and list of values
+    :return: (generator) PnpDevice records
     """
-    This private function parses additional info of site response
 
-    :param sites: (list) A list of dictionaries containing site information
-    :return: (dict) Site and type
+    queries = _expand_pnp_filters(pnp_filters=pnp_filters)
+    logging.debug("PnP queries: %s", queries)
+    if len(queries) == 1:
+        yield from _page_pnp_devices(
+            api_headers=api_headers,
+            query=queries[0],
+            offset=offset,
+            limit=limit,
+            page_size=page_size,
+        )
+        return
+    stop = None if limit is None else offset + limit
+
+    def run_query(query):
+        return list(
+            _page_pnp_devices(
+                api_headers=api_headers, query=query, limit=stop, page_size=page_size
+            )
+        )
+
+    def merge(results):
+        seen = set()
+        for devices in results:
+            for device in devices:
+                if device.id not in seen:
+                    seen.add(device.id)
+                    yield device
+
+    with SessionExecutor(max_workers=pnp_query_workers) as executor:
+        results = executor.map(run_query, queries)
+        yield from islice(merge(results), offset, stop)
+
+
+# Query serial numbers chunk by chunk
+def _query_in_chunks(serial_numbers=None, chunk_size=serial_chunk_size, query=None):
     """
+    This private function queries serial numbers chunk by chunk, chunks run in parallel
 
-    site_dict = {}
-    for site in sites:
+    :param serial_numbers: (iterable) Serial numbers
+    :param chunk_size: (int) Serial numbers per API call
+    :param query: (function) Takes one chunk and returns a list of results
+    :return: (list) Results of all chunks
+    """
+
+    serials = list(dict.fromkeys(serial_numbers))
+    chunks = [
+        serials[index : index + chunk_size]
+        for index in range(0, len(serials), chunk_size)
+    ]
+    if len(chunks) > 1:
+        with SessionExecutor(max_workers=pnp_query_workers) as executor:
+            results = list(executor.map(query, chunks))
+    else:
+        results = [query(chunk) for chunk in chunks]
+    return [item for result in results for item in result]
+
+
+# Resolve serial numbers in bulk
+def resolve_serials(
+    api_headers=None, serial_numbers=None, chunk_size=serial_chunk_size
+):
+    """
+    This function resolves many serial numbers with multi-value PnP queries
+
+    The serials are split into chunks that keep the URL short enough and the
+    chunks are queried in parallel, so N serials need about N/chunk_size calls.
+
+    :param api_headers: (dict) DNA center API headers
+    :param serial_numbers: (iterable) Serial numbers
+    :param chunk_size: (int) Serial numbers per API call
+    :return: (dict) Serial number and (device ID, state, extra information),
+             serials that are not in PnP are missing, see unresolved_device
+    """
+
+    def run_chunk(chunk):
+        return list(
+            _page_pnp_devices(
+                api_headers=api_headers,
+                query={"serialNumber": chunk},
+                limit=len(chunk),
+                page_size=len(chunk),
+            )
+        )
+
+    device_map = {}
+    for device in _query_in_chunks(
+        serial_numbers=serial_numbers, chunk_size=chunk_size, query=run_chunk
+    ):
+        if device.state == "Provisioned":
+            ext_param = device_extra_param
+        else:
+            ext_param = device_extra_param_less
+        device_map[device.serial_number] = (
+            device.id,
+            device.state,
+            device.as_dict(ext_param),
+        )
+    logging.debug("Resolved %s PnP serials", len(device_map))
+    return device_map
+
+
+# Resolve inventory serial numbers in bulk
+def resolve_inventory_serials(
+    api_headers=None, serial_numbers=None, chunk_size=serial_chunk_size
+):
+    """
+    This function resolves many serial numbers with multi-value inventory queries
+
+    :param api_headers: (dict) DNA center API headers
+    :param serial_numbers: (iterable) Serial numbers
+    :param chunk_size: (int) Serial numbers per API call
+    :return: (dict) Serial number and (inventory device ID, collection status),
+             serials that are not in the inventory are missing
+    """
+
+    method, api_url, parameters = generate_api_url(api_type="get-inventory-device-info")
+
+    def run_chunk(chunk):
+        _, response_body = get_response(
+            method=method,
+            endpoint_url=api_url,
+            headers=api_headers,
+            parameters=dict(parameters, serialNumber=chunk),
+        )
         try:
-            for item in site["additionalInfo"]:
-                if item["nameSpace"].casefold() == "Location".casefold():
-                    site_type = item["attributes"]["type"]
-        except KeyError:
-            click.secho(f"[x] Key error! Error: {KeyError}")
-            return False
-        site_dict[site["groupNameHierarchy"]] = site_type
-    logging.debug(f"Dictionary: {site_dict}")
-    return site_dict
+            return response_body["response"]
+        except (KeyError, TypeError) as err:
+            logging.debug("Inventory response error: %s", err)
+            return []
+
+    inventory_map = {}
+    for device in _query_in_chunks(
+        serial_numbers=serial_numbers, chunk_size=chunk_size, query=run_chunk
+    ):
+        # A stack reports the serials of all members separated by comma
+        for serial_number in device.get("serialNumber", "").split(","):
+            inventory_map[serial_number.strip()] = (
+                device.get("id"),
+                device.get("collectionStatus"),
+            )
+    logging.debug("Resolved %s inventory serials", len(inventory_map))
+    return inventory_map
 
 
-# Get full site list
-def get_full_site_list(dnac_auth_token=None, api_headers=None):
+# Get site index
+def get_site_index(dnac_auth_token=None, api_headers=None):
     """
-    This function retrieves the list of available sites and type form DNA center
+    This function retrieves the whole site hierarchy with one API call
 
     :param dnac_auth_token: (str) DNA center authentication string
     :param api_headers: (dict) DNA center API headers
-    :return: (dict) a dictionary of sites and types
+    :return: (SiteIndex) Site index, False if the site list is not available
     """
 
-    logging.debug(f"Getting full site list from DNA center")
+    logging.debug("Getting site index from DNA center")
     if api_headers is None:
         api_headers = get_headers(auth_token=dnac_auth_token)
     method, api_url, parameters = generate_api_url(api_type="get-all-sites")
@@ -357,9 +671,8 @@ def get_full_site_list(dnac_auth_token=None, api_headers=None):
     )
     if response_status:
         try:
-            raw_sites = response_body["response"]
-            sites_dict = _parse_site_additional_info(sites=raw_sites)
-            return sites_dict
+            return SiteIndex.from_groups(groups=response_body["response"])
         except Exception as err:
             click.secho(f"[x] Exception! Error: [{err}]", fg="red")
             return False
+    return False
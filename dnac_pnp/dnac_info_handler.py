@@ -6,22 +6,24 @@
 # Import builtin python libraries
 from collections import OrderedDict
 import csv
+from itertools import islice
 import logging
 
 # Import external python libraries
 import click
-from tabulate import tabulate
 
 # Import custom (local) python packages
 from .dnac_info_butler import (
     get_template_id,
     get_template_parameters,
     get_device_id,
-    get_full_site_list,
+    get_site_index,
+    iter_pnp_devices,
 )
+from .dnac_params import device_extra_param_less, row_number_length
 from .dnac_token_generator import generate_token
 from .header_handler import get_headers
-from .utils import divider, goodbye
+from .utils import divider, echo_table, goodbye
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
@@ -33,21 +35,20 @@ def _export_to_csv(data=None, output_file=None):
     """
     This private function exports pnp device list into csv
 
-    :param data: (dict) Data to be exported to csv
+    :param data: (iterable) PnpDevice records to be exported to csv
     :param output_file: (str) Full export file location
     :return: (object) File object
     """
 
-    csv_headers = list(data[0].keys())
+    csv_headers = device_extra_param_less
     logging.debug(f"CSV Headers: {csv_headers}")
-    logging.debug(f"CSV Data: {data}")
 
     try:
         with open(output_file, "w", newline="", encoding="utf-8") as csv_file:
             writer = csv.DictWriter(csv_file, fieldnames=csv_headers)
             writer.writeheader()
-            for row in data:
-                writer.writerow(row)
+            for device in data:
+                writer.writerow(device.as_dict(csv_headers))
         return True
     except IOError:
         click.secho(f"[x] IO exception happened!")
@@ -55,13 +56,18 @@ def _export_to_csv(data=None, output_file=None):
 
 
 # Print output based on show_all
-def _print_device_info(device_serial_number=None, show_all=None, data=None):
+def _print_device_info(
+    device_serial_number=None, show_all=None, data=None, offset=0, pager=False
+):
     """
     This private function prints device information
 
     :param device_serial_number: (str) Device serial number
     :param show_all: (boolean) List all or show details of one
-    :param data: (dict) device information from DNAC
+    :param data: (dict) device information from DNAC, (iterable) PnpDevice records
+                 with show_all
+    :param offset: (int) Number of skipped devices, used for numbering
+    :param pager: (boolean) Show the table in the system pager
     :return: (stdOut) Print on screen
     """
 
@@ -74,12 +80,17 @@ def _print_device_info(device_serial_number=None, show_all=None, data=None):
     else:
         logging.debug(f"Showing all devices!")
         click.secho(f"[$] All available devices in PnP", fg="blue")
-        table_rows = []
-        for index, item in enumerate(data):
-            table_header = ["No", *list(item.keys())]
-            tmp_row = [index + 1, *list(item.values())]
-            table_rows.append(tmp_row)
-        print(tabulate(table_rows, table_header, tablefmt="psql"))
+        table_header = ["No", *device_extra_param_less]
+        table_rows = (
+            [index, *device.as_dict(device_extra_param_less).values()]
+            for index, device in enumerate(data, start=offset + 1)
+        )
+        echo_table(
+            rows=table_rows,
+            headers=table_header,
+            widths=[row_number_length] + [None] * len(device_extra_param_less),
+            pager=pager,
+        )
 
 
 # Show template body and the parameters
@@ -131,7 +142,14 @@ def show_template_info(dnac_configs=None, template_name=None, show_all=False):
 
 # Show device information from DNA Center PnP
 def show_pnp_device_info(
-    dnac_configs=None, device_serial=None, show_all=False, export_path=None
+    dnac_configs=None,
+    device_serial=None,
+    show_all=False,
+    export_path=None,
+    limit=None,
+    offset=0,
+    pager=False,
+    pnp_filters=None,
 ):
     """
     This function shows details about device(s)
@@ -140,6 +158,10 @@ def show_pnp_device_info(
     :param device_serial: (str) Device serial number
     :param show_all: (boolean) List all or show details of one
     :param export_path: (str) Export file path
+    :param limit: (int) Maximum number of devices with show_all
+    :param offset: (int) Number of devices to skip with show_all
+    :param pager: (boolean) Show the device table in the system pager
+    :param pnp_filters: (dict) PnP device filters applied by DNA center with show_all
     :return: (stdOut) On screen output
     """
 
@@ -147,12 +169,18 @@ def show_pnp_device_info(
     headers = get_headers(auth_token=token)
 
     divider("Device(s)")
-    device_id, device_status, device_extra = get_device_id(
-        dnac_api_headers=headers,
-        serial_number=device_serial,
-        dnac_tab="pnp",
-        show_all=show_all,
-    )
+    if show_all:
+        device_id = True
+        device_extra = iter_pnp_devices(
+            api_headers=headers, offset=offset, limit=limit, pnp_filters=pnp_filters
+        )
+    else:
+        device_id, device_status, device_extra = get_device_id(
+            dnac_api_headers=headers,
+            serial_number=device_serial,
+            dnac_tab="pnp",
+            show_all=show_all,
+        )
     if device_id:
         if export_path:
             click.secho(f"[$] Trying to export PnP devices into csv.....", fg="blue")
@@ -164,32 +192,71 @@ def show_pnp_device_info(
                 click.secho(f"[x] CSV export failed!", fg="red")
         else:
             _print_device_info(
-                device_serial_number=device_serial, show_all=show_all, data=device_extra
+                device_serial_number=device_serial,
+                show_all=show_all,
+                data=device_extra,
+                offset=offset,
+                pager=pager,
             )
     goodbye()
 
 
-def show_site_info(dnac_configs=None, show_all=True):
+def show_site_info(
+    dnac_configs=None,
+    show_all=True,
+    limit=None,
+    offset=0,
+    pager=False,
+    site_prefix=None,
+    site_type=None,
+):
     """
     This function shows a list of all available sites from DNA center
 
     :param dnac_configs: (dict) DNA Center username/password configurations
     :param show_all: (boolean) List all or show details of one
+    :param limit: (int) Maximum number of sites
+    :param offset: (int) Number of sites to skip
+    :param pager: (boolean) Show the site table in the system pager
+    :param site_prefix: (str) Only sites below this site e.g. Global/DE/MUC
+    :param site_type: (str) Only sites of this type (area, building, floor)
     :return: (stdOut) On screen output
     """
 
     token = generate_token(configs=dnac_configs)
     headers = get_headers(auth_token=token)
     divider("Sites")
-    site_dict = get_full_site_list(api_headers=headers)
-    if site_dict:
-        click.secho("[$] All available sites:", fg="blue")
+    site_index = get_site_index(api_headers=headers)
+    if site_index:
+        if site_prefix:
+            site_prefix = site_prefix.rstrip("/")
+            if site_prefix not in site_index:
+                click.secho(f"[x] Site [{site_prefix}] is not valid!", fg="red")
+                goodbye()
+                return
+            click.secho(f"[$] Sites under [{site_prefix}]:", fg="blue")
+            sites = site_index.under(
+                site_name=site_prefix, site_type=site_type, include_self=True
+            )
+        else:
+            click.secho("[$] All available sites:", fg="blue")
+            sites = (
+                site_index[site_name]
+                for site_name in sorted(site_index)
+                if site_type is None or site_index[site_name].site_type == site_type
+            )
         table_headers = ["Serial", "Site Name", "Site Type"]
-        table_rows = []
-        row_count = 1
-        for key in sorted(site_dict.keys()):
-            row = [row_count, key, site_dict[key]]
-            table_rows.append(row)
-            row_count += 1
-        print(tabulate(table_rows, headers=table_headers, tablefmt="psql"))
+        stop = None if limit is None else offset + limit
+        table_rows = (
+            [row_count, site.hierarchy, site.site_type]
+            for row_count, site in enumerate(
+                islice(sites, offset, stop), start=offset + 1
+            )
+        )
+        echo_table(
+            rows=table_rows,
+            headers=table_headers,
+            widths=[row_number_length, None, None],
+            pager=pager,
+        )
     goodbye()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""API call counters, latency histograms and pipeline progress of one run"""
+
+# Import builtin python libraries
+from collections import Counter
+import json
+import threading
+import time
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Latency histogram bucket upper bounds in seconds
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+# Counters of a single API type
+class EndpointStats(object):
+    """Call count, bytes, status codes and latency histogram of one API type"""
+
+    __slots__ = (
+        "calls",
+        "bytes_sent",
+        "bytes_received",
+        "total_latency",
+        "max_latency",
+        "status_codes",
+        "histogram",
+    )
+
+    def __init__(self):
+        """Constructor method for endpoint stats"""
+
+        self.calls = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.status_codes = Counter()
+        self.histogram = [0] * len(latency_buckets)
+
+    def as_dict(self):
+        """Returns the counters as python dictionary"""
+
+        return {
+            "calls": self.calls,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "total_latency": round(self.total_latency, 6),
+            "max_latency": round(self.max_latency, 6),
+            "status_codes": {
+                str(key): value for key, value in self.status_codes.items()
+            },
+            "histogram": {
+                str(bucket): count
+                for bucket, count in zip(latency_buckets, self.histogram)
+            },
+        }
+
+
+# API call metrics
+class ApiMetrics(object):
+    """Thread-safe API call metrics of one run"""
+
+    def __init__(self):
+        """Constructor method for API metrics"""
+
+        self._lock = threading.Lock()
+        self.export_path = None
+        self.reset()
+
+    def reset(self):
+        """Clears all counters and restarts the wall clock"""
+
+        with self._lock:
+            self.started = time.perf_counter()
+            self.endpoints = {}
+            self.in_flight = 0
+            self._network_time = 0.0
+            self._busy_since = None
+            self.retries = Counter()
+            self.devices_processed = Counter()
+            self.queue_depth = {}
+
+    def request_started(self):
+        """Marks one API call as in flight"""
+
+        with self._lock:
+            if not self.in_flight:
+                self._busy_since = time.perf_counter()
+            self.in_flight += 1
+
+    def request_finished(self):
+        """Marks one in flight API call as finished"""
+
+        with self._lock:
+            self.in_flight -= 1
+            if not self.in_flight and self._busy_since is not None:
+                self._network_time += time.perf_counter() - self._busy_since
+                self._busy_since = None
+
+    def record_retry(self, api_type=None):
+        """
+        Records one retried API call
+
+        :param api_type: (str) API call type (name) e.g. claim-device
+        :return: None
+        """
+
+        with self._lock:
+            self.retries[api_type] += 1
+
+    def device_processed(self, operation=None, remaining=None):
+        """
+        Records one processed device of a pipeline stage
+
+        :param operation: (str) Pipeline stage e.g. import, delete
+        :param remaining: (int) Devices still queued for this stage, if known
+        :return: None
+        """
+
+        with self._lock:
+            self.devices_processed[operation] += 1
+            if remaining is not None:
+                self.queue_depth[operation] = remaining
+
+    def set_queue_depth(self, stage=None, depth=0):
+        """
+        Sets the number of devices waiting in a pipeline stage
+
+        :param stage: (str) Pipeline stage e.g. import, delete
+        :param depth: (int) Devices waiting in the stage
+        :return: None
+        """
+
+        with self._lock:
+            self.queue_depth[stage] = depth
+
+    def record(
+        self,
+        api_type=None,
+        status_code=None,
+        latency=0.0,
+        bytes_sent=0,
+        bytes_received=0,
+    ):
+        """
+        Records one API call
+
+        :param api_type: (str) API call type (name) e.g. import-device
+        :param status_code: (int) HTTP status code or "error" if the call failed
+        :param latency: (float) Call latency in seconds
+        :param bytes_sent: (int) Request body size
+        :param bytes_received: (int) Response body size
+        :return: None
+        """
+
+        for index, bucket in enumerate(latency_buckets):
+            if latency <= bucket:
+                break
+        with self._lock:
+            stats = self.endpoints.get(api_type)
+            if stats is None:
+                stats = self.endpoints[api_type] = EndpointStats()
+            stats.calls += 1
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.total_latency += latency
+            if latency > stats.max_latency:
+                stats.max_latency = latency
+            stats.status_codes[status_code] += 1
+            stats.histogram[index] += 1
+
+    def merge(self, endpoints=None, retries=None, devices_processed=None):
+        """
+        Adds the counters recorded by another process e.g. a catalog shard
+
+        :param endpoints: (dict) API type and EndpointStats
+        :param retries: (dict) API type and retried calls
+        :param devices_processed: (dict) Pipeline stage and processed devices
+        :return: None
+        """
+
+        with self._lock:
+            for api_type, other in (endpoints or {}).items():
+                stats = self.endpoints.get(api_type)
+                if stats is None:
+                    stats = self.endpoints[api_type] = EndpointStats()
+                stats.calls += other.calls
+                stats.bytes_sent += other.bytes_sent
+                stats.bytes_received += other.bytes_received
+                stats.total_latency += other.total_latency
+                stats.max_latency = max(stats.max_latency, other.max_latency)
+                stats.status_codes.update(other.status_codes)
+                stats.histogram = [
+                    count + other_count
+                    for count, other_count in zip(stats.histogram, other.histogram)
+                ]
+            self.retries.update(retries or {})
+            self.devices_processed.update(devices_processed or {})
+
+    def has_calls(self):
+        """Returns True if at least one API call was recorded"""
+
+        return bool(self.endpoints)
+
+    def network_time(self):
+        """
+        Returns the wall time in seconds with at least one API call in flight
+
+        Parallel API calls are counted once, so the network time never exceeds the
+        wall time.
+        """
+
+        with self._lock:
+            network_time = self._network_time
+            if self.in_flight and self._busy_since is not None:
+                network_time += time.perf_counter() - self._busy_since
+            return network_time
+
+    def wall_time(self):
+        """Returns the wall time in seconds since the counters were reset"""
+
+        return time.perf_counter() - self.started
+
+    def snapshot(self):
+        """
+        Returns all counters as python dictionary
+
+        :return: (dict) Wall time and counters per API type
+        """
+
+        with self._lock:
+            snapshot = {
+                "wall_time": round(self.wall_time(), 6),
+                "in_flight": self.in_flight,
+                "devices_processed": dict(self.devices_processed),
+                "queue_depth": dict(self.queue_depth),
+                "retries": dict(self.retries),
+                "endpoints": {
+                    api_type: stats.as_dict()
+                    for api_type, stats in sorted(self.endpoints.items())
+                },
+            }
+        return snapshot
+
+    def summary_rows(self):
+        """
+        Returns one summary row per API type, slowest total latency first
+
+        :return: (list, list) Table headers and table rows
+        """
+
+        wall_time = self.wall_time() or 1.0
+        headers = [
+            "API Type",
+            "Calls",
+            "Status",
+            "Sent",
+            "Received",
+            "Total (s)",
+            "Avg (ms)",
+            "Max (ms)",
+            "Wall %",
+        ]
+        rows = []
+        with self._lock:
+            endpoints = sorted(
+                self.endpoints.items(), key=lambda item: -item[1].total_latency
+            )
+            for api_type, stats in endpoints:
+                status_codes = sorted(stats.status_codes.items(), key=str)
+                status = ", ".join(f"{code}x{count}" for code, count in status_codes)
+                rows.append(
+                    [
+                        api_type,
+                        stats.calls,
+                        status,
+                        stats.bytes_sent,
+                        stats.bytes_received,
+                        f"{stats.total_latency:.2f}",
+                        f"{stats.total_latency / stats.calls * 1000:.1f}",
+                        f"{stats.max_latency * 1000:.1f}",
+                        f"{stats.total_latency / wall_time * 100:.1f}",
+                    ]
+                )
+        return headers, rows
+
+    def export_json(self, file_path=None):
+        """
+        Writes all counters as JSON file
+
+        :param file_path: (str) Full export file path, defaults to export_path
+        :return: (str) Export file path
+        """
+
+        file_path = file_path or self.export_path
+        with open(file_path, "w", encoding="utf-8") as metrics_file:
+            json.dump(self.snapshot(), metrics_file, indent=4)
+        return file_path
+
+
+# Metrics of the running process
+api_metrics = ApiMetrics()
@@ -11,8 +11,67 @@ __email__ = "dalwar.hossain@global.ntt"
 accepted_status_codes = [200, 202]
 # Accepted (MUST have) CSV headers
 accepted_csv_headers = ["serialNumber", "pid", "siteName", "hostname", "template_name"]
+# PnP device states that must not be claimed again
+non_claimable_states = ["Planned", "Onboarding", "Provisioned"]
+# PnP device states that are deleted from the inventory
+inventory_device_states = ["Onboarding", "Provisioned"]
 # PnP device limit
 pnp_device_limit = 100
+# PnP devices per page while streaming the device list
+pnp_page_size = 500
+# Imported images per page while building the image index
+image_page_size = 500
+# PnP device list filters, filter name and API query parameter
+pnp_filter_keys = {
+    "serial": "serialNumber",
+    "state": "state",
+    "onb_state": "onbState",
+    "name": "name",
+    "hostname": "hostname",
+    "pid": "pid",
+    "source": "source",
+    "site": "siteName",
+}
+# Parallel API calls for multi-value PnP queries
+pnp_query_workers = 4
+# Serial numbers per PnP query, keeps the URL short enough
+serial_chunk_size = 50
+# Parallel device changes while applying a sync plan
+sync_workers = 4
+# Catalog column that routes a row to one of the configured controllers
+controller_column = "controller"
+# Catalog column with the image a device is upgraded to while it is claimed
+image_column = "image"
+# Connections the API client keeps open to DNA center
+client_pool_size = 16
+# Parallel device claims while the catalog is being imported
+claim_workers = 8
+# Attempts per device claim, transient failures are retried
+claim_max_attempts = 3
+# Seconds before the first claim retry, doubled with every further retry
+claim_retry_delay = 2
+# HTTP status codes of transient DNA center failures that are worth a retry
+transient_status_codes = [429, 502, 503, 504]
+# Seconds a DNA center token is reused before a new one is generated
+token_lifetime = 3000
+# Seconds the server keeps site, template and PnP caches before refreshing them
+serve_cache_lifetime = 300
+# Jobs the server runs at the same time
+serve_workers = 8
+# Finished jobs the server keeps for status requests
+serve_job_history = 10000
+# Job store file in the "jobs" directory of the base directory
+job_store_name = "jobs.sqlite"
+# Job worker processes pulling catalog rows from the job store
+job_processes = 4
+# Catalog rows a job worker claims at a time
+job_claim_size = 20
+# Seconds a claimed catalog row stays with its worker after its last heartbeat
+job_lease_time = 600
+# Attempts per catalog row before it is marked as failed
+job_max_attempts = 3
+# Seconds between progress lines while job workers are running
+job_progress_interval = 5
 # Device Information extra parameters
 device_extra_param = [
     "serialNumber",
@@ -28,7 +87,15 @@ device_extra_param = [
     "siteClaimType",
 ]
 device_extra_param_less = ["serialNumber", "hostname", "pid", "state", "source"]
+# Parallel site creations per hierarchy level
+site_workers = 4
 area_essentials = ["name", "parentName"]
 building_essentials = ["name", "parentName", "latitude", "longitude"]
 floor_essentials = ["name", "parentName", "rfModel", "length", "width", "height"]
 max_col_length = 120
+# Rows sampled to size the columns of a streamed table
+table_sample_size = 50
+# Widest cell of a streamed table, longer values are cut
+max_cell_length = 60
+# Width of the row number column of a streamed table
+row_number_length = 6
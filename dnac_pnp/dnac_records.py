@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Compact record types for catalog rows, PnP devices, sites and templates"""
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Catalog row record
+class CatalogRow(object):
+    """
+    Single device catalog row
+
+    The column mapping is shared by every row of the same catalog, a row only
+    keeps its own values as a tuple plus the IDs resolved from DNA center.
+    """
+
+    __slots__ = (
+        "columns",
+        "values",
+        "line_number",
+        "site_id",
+        "config_id",
+        "config_parameters",
+        "device_id",
+        "image_id",
+    )
+
+    def __init__(self, columns=None, values=None, line_number=None):
+        """
+        Constructor method for catalog row
+
+        :param columns: (dict) Shared column name and position mapping
+        :param values: (tuple) Row values in column order
+        :param line_number: (int) Line number in the catalog file
+        """
+
+        self.columns = columns
+        self.values = values
+        self.line_number = line_number
+        self.site_id = None
+        self.config_id = None
+        self.config_parameters = None
+        self.device_id = None
+        self.image_id = None
+
+    @classmethod
+    def from_dict(cls, device_info=None):
+        """
+        Creates a catalog row from a python dictionary
+
+        :param device_info: (dict) Device information keyed by column name
+        :return: (CatalogRow) Catalog row record
+        """
+
+        columns = {key: index for index, key in enumerate(device_info)}
+        return cls(columns=columns, values=tuple(device_info.values()))
+
+    def __getitem__(self, key):
+        return self.values[self.columns[key]]
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def __repr__(self):
+        return f"CatalogRow({self.as_dict()})"
+
+    def get(self, key, default=None):
+        """Returns a column value or default if the column does not exist"""
+
+        index = self.columns.get(key)
+        if index is None:
+            return default
+        return self.values[index]
+
+    def keys(self):
+        """Returns the column names"""
+
+        return self.columns.keys()
+
+    @property
+    def serial_number(self):
+        return self.get("serialNumber")
+
+    @property
+    def site_name(self):
+        return self.get("siteName")
+
+    @property
+    def template_name(self):
+        return self.get("template_name")
+
+    def as_dict(self):
+        """Returns the row values as python dictionary"""
+
+        return dict(zip(self.columns, self.values))
+
+    def to_payload(self):
+        """
+        Creates the device import payload, only used at the HTTP boundary
+
+        :return: (dict) Device import payload
+        """
+
+        device_info = self.as_dict()
+        device_info["siteId"] = self.site_id
+        device_info["configId"] = self.config_id
+        device_info["configParameters"] = self.config_parameters
+        if self.device_id is not None:
+            device_info["deviceId"] = self.device_id
+        return {"deviceInfo": device_info}
+
+
+# PnP device record
+class PnpDevice(object):
+    """Single device from DNA center PnP"""
+
+    # API key and attribute name
+    fields = (
+        ("serialNumber", "serial_number"),
+        ("name", "name"),
+        ("agentType", "agent_type"),
+        ("pid", "pid"),
+        ("state", "state"),
+        ("onbState", "onb_state"),
+        ("imageFile", "image_file"),
+        ("imageVersion", "image_version"),
+        ("hostname", "hostname"),
+        ("source", "source"),
+        ("siteClaimType", "site_claim_type"),
+    )
+    field_map = dict(fields)
+
+    __slots__ = ("id", "site_id", "config_id", "config_parameters") + tuple(
+        attribute for _, attribute in fields
+    )
+
+    def __init__(self, device_id=None, **kwargs):
+        """
+        Constructor method for PnP device
+
+        :param device_id: (str) PnP device ID
+        :param kwargs: (kwargs) Device attributes
+        """
+
+        self.id = device_id
+        # Claimed site and day0 configuration, None if not known
+        self.site_id = kwargs.get("site_id")
+        self.config_id = kwargs.get("config_id")
+        self.config_parameters = kwargs.get("config_parameters")
+        for _, attribute in self.fields:
+            setattr(self, attribute, kwargs.get(attribute))
+
+    @classmethod
+    def from_response(cls, item=None):
+        """
+        Creates a PnP device from one item of the PnP device API response
+
+        :param item: (dict) Single device from API response
+        :return: (PnpDevice) PnP device record
+        """
+
+        device_info = item.get("deviceInfo", {})
+        device = cls(device_id=item.get("id"), site_id=device_info.get("siteId"))
+        for key, attribute in cls.fields:
+            setattr(device, attribute, device_info.get(key))
+        config_list = (item.get("workflowParameters") or {}).get("configList")
+        if config_list:
+            device.config_id = config_list[0].get("configId")
+            device.config_parameters = config_list[0].get("configParameters")
+        return device
+
+    def __repr__(self):
+        return f"PnpDevice({self.id}, {self.serial_number}, {self.state})"
+
+    def as_dict(self, params=None):
+        """
+        Returns the requested device attributes as python dictionary
+
+        :param params: (list) API key names to include, all if not provided
+        :return: (dict) Device information
+        """
+
+        if params is None:
+            params = [key for key, _ in self.fields]
+        return {key: getattr(self, self.field_map[key]) for key in params}
+
+
+# Site record
+class Site(object):
+    """Single site from DNA center site hierarchy"""
+
+    __slots__ = ("id", "name", "hierarchy", "site_type", "parent_id")
+
+    def __init__(
+        self, site_id=None, name=None, hierarchy=None, site_type=None, parent_id=None
+    ):
+        """
+        Constructor method for site
+
+        :param site_id: (str) Site ID
+        :param name: (str) Site name
+        :param hierarchy: (str) Site name with full hierarchy
+        :param site_type: (str) Site type (area, building, floor)
+        :param parent_id: (str) Parent site ID
+        """
+
+        self.id = site_id
+        self.name = name
+        self.hierarchy = hierarchy
+        self.site_type = site_type
+        self.parent_id = parent_id
+
+    def __repr__(self):
+        return f"Site({self.hierarchy}, {self.site_type})"
+
+
+# Template record
+class Template(object):
+    """Single template (latest version) from DNA center template programmer"""
+
+    __slots__ = ("id", "name", "version", "parameters", "content", "binder")
+
+    def __init__(self, template_id=None, name=None, version=0):
+        """
+        Constructor method for template
+
+        :param template_id: (str) Template ID (templateId==configId)
+        :param name: (str) Template name as [project_name/template_name]
+        :param version: (int) Template version
+        """
+
+        self.id = template_id
+        self.name = name
+        self.version = version
+        self.parameters = None
+        self.content = None
+        self.binder = None
+
+    def __repr__(self):
+        return f"Template({self.name}, {self.id}, v{self.version})"
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""DNA center session, the engine behind the command line"""
+
+# Import builtin python libraries
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from .dnac_tracing import tracer
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Active sessions of every thread
+_local = threading.local()
+
+
+# Session stack of the calling thread
+def _session_stack():
+    """This private function returns the active sessions of the calling thread"""
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+# Active session
+def current_session():
+    """
+    This function returns the session that is active on the calling thread
+
+    :return: (DnacSession) Active session, None if there is none
+    """
+
+    stack = _session_stack()
+    return stack[-1] if stack else None
+
+
+# DNA center session
+class DnacSession(object):
+    """
+    Configurations, DNA center host, API client and run results of one engine
+
+    Thread-safety and re-entrancy:
+
+    - A session is activated on a thread with ``with session:``, every API call
+      of that thread goes to the host of the session with its client. Sessions
+      can be nested, different threads can have different sessions active at
+      the same time.
+    - Work submitted to a SessionExecutor runs inside the session that was
+      active on the submitting thread.
+    - One session runs one operation (import_catalog, sync_catalog, ...) at a
+      time, an operation started while another one is running is refused. Use
+      one session per job to run jobs in parallel in the same process.
+    - Run results are cleared when an operation starts and stay readable
+      after it returned, until the next operation starts.
+    - API call metrics and tracing are process wide and shared by all sessions.
+    """
+
+    __slots__ = (
+        "configs",
+        "client",
+        "skipped",
+        "_lock",
+        "_run_lock",
+        "_token_request",
+    )
+
+    def __init__(self, configs=None, client=None):
+        """
+        Constructor method for DNA center session
+
+        :param configs: (dict) All configurations as returned by load_config
+        :param client: (object) HTTP client with a requests compatible request
+                       method e.g. requests.Session, defaults to requests itself
+        """
+
+        self.configs = configs or {}
+        self.client = client
+        self.skipped = []
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._token_request = None
+
+    def __repr__(self):
+        return f"DnacSession({self.host})"
+
+    @property
+    def dnac_configs(self):
+        return self.configs.get("dnac") or {}
+
+    @property
+    def host(self):
+        return self.dnac_configs.get("host")
+
+    @property
+    def base_directory(self):
+        return (self.configs.get("common") or {}).get("base_directory")
+
+    def __enter__(self):
+        _session_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        stack = _session_stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        return False
+
+    def skip(self, serial_number=None):
+        """Records one skipped serial number of the running operation"""
+
+        with self._lock:
+            self.skipped.append(serial_number)
+
+    def warm_up(self):
+        """
+        Opens the connection to DNA center and requests a token in the background
+
+        The API client is created if the session has none. The next token of
+        this session is taken from the background request, so the command can
+        read its input while DNS resolution, TCP/TLS setup and login are done.
+        """
+
+        from .api_call_handler import create_client
+        from .dnac_token_generator import request_token
+
+        if self.client is None:
+            self.client = create_client()
+        with self._lock:
+            if self._token_request is not None or not self.dnac_configs:
+                return
+            self._token_request = self.run(request_token, configs=self.dnac_configs)
+
+    def take_token_request(self, configs=None):
+        """
+        Hands over the background token request of warm_up, only once
+
+        :param configs: (dict) DNA center configurations the token is for
+        :return: (Future) Token API call, None if there is none for the configs
+        """
+
+        with self._lock:
+            if self._token_request is None or configs != self.dnac_configs:
+                return None
+            token_request, self._token_request = self._token_request, None
+        return token_request
+
+    def run(self, func, *args, **kwargs):
+        """Calls a function with this session active on the calling thread"""
+
+        with self:
+            return func(*args, **kwargs)
+
+    def _operation(self, func, *args, **kwargs):
+        """
+        Runs one engine operation with fresh run results
+
+        :param func: (function) Handler function of the operation
+        :return: (object) Return value of the handler function
+        """
+
+        if not self._run_lock.acquire(blocking=False):
+            click.secho(f"[x] Session [{self.host}] is already running!", fg="red")
+            sys.exit(1)
+        try:
+            with self._lock:
+                self.skipped = []
+            return self.run(func, *args, **kwargs)
+        finally:
+            self._run_lock.release()
+
+    def import_device(self, data=None):
+        """
+        Adds and claims one device
+
+        :param data: (CatalogRow) Device information
+        :return: (list) Skipped serial numbers
+        """
+
+        from .device_import_handler import import_single_device
+
+        self._operation(import_single_device, configs=self.dnac_configs, data=data)
+        return list(self.skipped)
+
+    def import_catalog(self, catalog_file=None, validate_only=False, workers=None):
+        """
+        Adds and claims all devices of a device catalog
+
+        :param catalog_file: (str) Full path of the device catalog
+        :param validate_only: (boolean) Only validate the catalog, do not import
+        :param workers: (int) Parallel device claims, defaults to claim_workers
+        :return: (list) Skipped serial numbers
+        """
+
+        from .device_import_handler import device_import_in_bulk
+
+        self._operation(
+            device_import_in_bulk,
+            configs=self.dnac_configs,
+            import_file=catalog_file,
+            validate_only=validate_only,
+            workers=workers,
+        )
+        return list(self.skipped)
+
+    def sync_catalog(
+        self, catalog_file=None, plan_only=False, prune=False, workers=None
+    ):
+        """
+        Brings DNA center PnP in line with a device catalog
+
+        :param catalog_file: (str) Full path of the device catalog
+        :param plan_only: (boolean) Only print the plan, do not apply it
+        :param prune: (boolean) Delete PnP devices that are not in the catalog
+        :param workers: (int) Parallel device changes, defaults to sync_workers
+        :return: (list) Serial numbers that could not be changed
+        """
+
+        from .sync_handler import sync_catalog
+
+        failed = self._operation(
+            sync_catalog,
+            configs=self.dnac_configs,
+            catalog_file=catalog_file,
+            plan_only=plan_only,
+            prune=prune,
+            workers=workers,
+        )
+        with self._lock:
+            self.skipped.extend(failed)
+        return list(self.skipped)
+
+    def remove_devices(self, serials=None):
+        """
+        Deletes devices from PnP and the inventory
+
+        :param serials: (list) Serial numbers to delete
+        :return: (list) Skipped serial numbers
+        """
+
+        from .device_delete_handler import remove_devices
+
+        self._operation(remove_devices, configs=self.dnac_configs, serials=serials)
+        return list(self.skipped)
+
+
+# Session aware thread pool
+class SessionExecutor(ThreadPoolExecutor):
+    """Thread pool whose workers run in the session and span of the submitting thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        parent = tracer.current_span()
+        if parent is not None:
+            fn, args = tracer.run, (parent, fn) + args
+        session = current_session()
+        if session is None:
+            return super().submit(fn, *args, **kwargs)
+        return super().submit(session.run, fn, *args, **kwargs)
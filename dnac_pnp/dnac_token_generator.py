@@ -14,6 +14,7 @@ from requests.auth import HTTPBasicAuth
 # Import custom (local) python packages
 from .api_call_handler import call_api_endpoint, get_response
 from .api_endpoint_handler import generate_api_url
+from .dnac_session import SessionExecutor, current_session
 from .header_handler import get_headers
 from .utils import divider
 
@@ -22,34 +23,68 @@ __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
 
+# Token API call
+def _token_response(configs=None):
+    """
+    This private function calls the token API of DNAC
+
+    :param configs: (dict) DNAC configurations
+    :returns: (object) Response object
+    """
+
+    headers = get_headers()
+    method, api_url, parameters = generate_api_url(api_type="generate-token")
+    logging.debug("Method: %s, API:%s, Parameters:%s", method, api_url, parameters)
+    return call_api_endpoint(
+        method=method,
+        api_url=api_url,
+        api_headers=headers,
+        auth=HTTPBasicAuth(configs["username"], configs["password"]),
+    )
+
+
+# Request token in the background
+def request_token(configs=None):
+    """
+    This function starts the token API call in the background
+
+    :param configs: (dict) DNAC configurations
+    :returns: (Future) Response object of the token API call
+    """
+
+    executor = SessionExecutor(max_workers=1)
+    token_request = executor.submit(_token_response, configs)
+    executor.shutdown(wait=False)
+    return token_request
+
+
 # Login to DNAC, generate token and return
 def generate_token(configs=None):
     """
     This function logs into DNAC and generates authentication token
 
+    A token requested in the background by DnacSession.warm_up is used if the
+    session has one for the same configurations.
+
     :param configs: (dict) DNAC configurations
     :returns: (str) Authentication token
     """
 
-    if configs:
-        dnac_username = configs["username"]
-        dnac_password = configs["password"]
-    else:
+    if not configs:
         click.secho(f"[*] Please check DNA center configurations!", fg="blue")
         click.secho(f"[x] Configs not found!", fg="red")
         sys.exit(1)
 
     divider("Authentication")
-    headers = get_headers()
-    method, api_url, parameters = generate_api_url(api_type="generate-token")
-    logging.debug(f"Method: {method}, API:{api_url}, Parameters:{parameters}")
     click.secho(f"[$] Generating authentication token.....", fg="blue")
-    api_response = call_api_endpoint(
-        method=method,
-        api_url=api_url,
-        api_headers=headers,
-        auth=HTTPBasicAuth(dnac_username, dnac_password),
-    )
+    session = current_session()
+    token_request = None
+    if session is not None:
+        token_request = session.take_token_request(configs=configs)
+    if token_request is not None:
+        api_response = token_request.result()
+    else:
+        api_response = _token_response(configs=configs)
     response_status, response_body = get_response(response=api_response)
     if response_status:
         token = response_body["Token"]
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Lightweight tracing spans for the device import pipeline"""
+
+# Import builtin python libraries
+from functools import wraps
+import json
+import logging
+import os
+import threading
+import time
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Number of finished spans kept before they are exported
+span_batch_size = 512
+
+
+# Current time in nanoseconds
+def _now_ns():
+    """This private function returns the current unix time in nanoseconds"""
+
+    return int(time.time() * 1e9)
+
+
+# Span
+class Span(object):
+    """Single timed operation inside a trace"""
+
+    __slots__ = (
+        "tracer",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "name",
+        "attributes",
+        "start_time",
+        "end_time",
+        "error",
+    )
+
+    def __init__(self, tracer=None, name=None, parent=None, attributes=None):
+        """
+        Constructor method for span
+
+        :param tracer: (Tracer) Tracer that exports the span
+        :param name: (str) Span name
+        :param parent: (Span) Parent span, None for a new trace
+        :param attributes: (dict) Span attributes
+        """
+
+        self.tracer = tracer
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = attributes or {}
+        self.start_time = None
+        self.end_time = None
+        self.error = None
+
+    def set_attribute(self, key=None, value=None):
+        """Sets one span attribute"""
+
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start_time = _now_ns()
+        self.tracer._push(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end_time = _now_ns()
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc_value}"
+        self.tracer._pop(self)
+        return False
+
+    def as_dict(self):
+        """Returns the span as python dictionary"""
+
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round((self.end_time - self.start_time) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# No-op span
+class _NoopSpan(object):
+    """Span returned while tracing is disabled, does nothing"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key=None, value=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_noop_span = _NoopSpan()
+
+
+# JSON lines file exporter
+class FileSpanExporter(object):
+    """Appends finished spans as JSON lines to a local file"""
+
+    def __init__(self, file_path=None):
+        """
+        Constructor method for file exporter
+
+        :param file_path: (str) Full path of the trace file
+        """
+
+        self.file_path = file_path
+
+    def export(self, spans=None):
+        """Writes a batch of spans"""
+
+        with open(self.file_path, "a", encoding="utf-8") as trace_file:
+            for span in spans:
+                trace_file.write(json.dumps(span.as_dict()) + "\n")
+
+
+# OTLP/HTTP JSON exporter
+class OtlpHttpSpanExporter(object):
+    """Sends finished spans to an OpenTelemetry collector (OTLP/HTTP, JSON)"""
+
+    def __init__(self, endpoint=None, service_name="dnac_pnp"):
+        """
+        Constructor method for OTLP exporter
+
+        :param endpoint: (str) Collector URL e.g. http://localhost:4318
+        :param service_name: (str) service.name resource attribute
+        """
+
+        endpoint = endpoint.rstrip("/")
+        if not endpoint.endswith("/v1/traces"):
+            endpoint = f"{endpoint}/v1/traces"
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    @staticmethod
+    def _attribute(key=None, value=None):
+        if isinstance(value, bool):
+            typed_value = {"boolValue": value}
+        elif isinstance(value, int):
+            typed_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed_value = {"doubleValue": value}
+        else:
+            typed_value = {"stringValue": str(value)}
+        return {"key": key, "value": typed_value}
+
+    def _otlp_span(self, span=None):
+        otlp_span = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": [
+                self._attribute(key, value) for key, value in span.attributes.items()
+            ],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        }
+        if span.parent_span_id:
+            otlp_span["parentSpanId"] = span.parent_span_id
+        return otlp_span
+
+    def export(self, spans=None):
+        """Posts a batch of spans to the collector"""
+
+        import requests
+
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            self._attribute("service.name", self.service_name)
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "dnac_pnp"},
+                            "spans": [self._otlp_span(span) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        response = requests.post(self.endpoint, json=payload, timeout=10)
+        logging.debug("OTLP export status: %s", response.status_code)
+
+
+# Tracer
+class Tracer(object):
+    """Creates spans and hands finished spans to the configured exporter"""
+
+    def __init__(self):
+        """Constructor method for tracer"""
+
+        self.enabled = False
+        self.exporter = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = []
+
+    def configure(self, exporter=None):
+        """
+        Turns tracing on with an exporter
+
+        :param exporter: (object) FileSpanExporter or OtlpHttpSpanExporter
+        :return: None
+        """
+
+        self.exporter = exporter
+        self.enabled = exporter is not None
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span=None):
+        self._stack().append(span)
+
+    def _pop(self, span=None):
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            self._finished.append(span)
+            if len(self._finished) < span_batch_size:
+                return
+            spans, self._finished = self._finished, []
+        self._export(spans)
+
+    def _export(self, spans=None):
+        try:
+            self.exporter.export(spans=spans)
+        except Exception as err:
+            logging.debug("Span export failed: %s", err)
+
+    def current_span(self):
+        """Returns the active span of the current thread, None if there is none"""
+
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def run(self, parent, func, *args, **kwargs):
+        """
+        Calls a function with a span of another thread active on the calling thread
+
+        :param parent: (Span) Span captured on the submitting thread
+        :param func: (function) Function to call
+        :return: (object) Return value of the function
+        """
+
+        if parent is None:
+            return func(*args, **kwargs)
+        stack = self._stack()
+        stack.append(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if stack and stack[-1] is parent:
+                stack.pop()
+
+    def span(self, name=None, **attributes):
+        """
+        Creates a child span of the active span, or a new trace if there is none
+
+        :param name: (str) Span name
+        :param attributes: (kwargs) Span attributes
+        :return: (Span) Span to be used as context manager
+        """
+
+        if not self.enabled:
+            return _noop_span
+        return Span(
+            tracer=self, name=name, parent=self.current_span(), attributes=attributes
+        )
+
+    def wrap(self, name=None):
+        """
+        Decorator that runs the decorated function inside a span
+
+        :param name: (str) Span name
+        :return: (function) Decorator
+        """
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def shutdown(self):
+        """Exports all remaining spans"""
+
+        with self._lock:
+            spans, self._finished = self._finished, []
+        if spans and self.exporter is not None:
+            self._export(spans)
+
+
+# Tracer of the running process
+tracer = Tracer()
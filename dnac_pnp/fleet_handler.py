@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Fan-out of catalog operations over several processes and controllers"""
+
+# Import builtin python libraries
+from collections import OrderedDict
+import csv
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from . import __package_name__ as package_name
+from .dnac_metrics import api_metrics
+from .dnac_params import accepted_status_codes, controller_column
+from .dnac_session import DnacSession
+from .dnac_tracing import tracer
+from .utils import divider, echo_table, goodbye, stream_csv
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Controllers from configurations
+def get_controllers(all_configs=None):
+    """
+    This function reads the controller list from the configurations
+
+    Every controller inherits the settings of the "dnac" section (e.g. username,
+    password) and overrides them with its own.
+
+    :param all_configs: (dict) All configurations
+    :return: (OrderedDict) Controller name and its DNA center configurations
+    """
+
+    controllers = OrderedDict()
+    for index, controller in enumerate(all_configs.get("controllers") or []):
+        configs = dict(all_configs.get("dnac") or {})
+        configs.update(controller)
+        name = str(configs.get("name") or "")
+        if not name or not configs.get("host"):
+            click.secho(
+                f"[x] Controller #{index + 1} needs a [name] and a [host]!", fg="red"
+            )
+            sys.exit(1)
+        if name in controllers:
+            click.secho(f"[x] Controller [{name}] is defined twice!", fg="red")
+            sys.exit(1)
+        configs["site_prefix"] = str(configs.get("site_prefix") or "").rstrip("/")
+        controllers[name] = configs
+    return controllers
+
+
+# Find the controller of a catalog row
+def _route_row(row=None, controllers=None):
+    """
+    This private function finds the controller of one catalog row
+
+    The controller column wins, otherwise the longest matching site prefix.
+
+    :param row: (CatalogRow) Catalog row
+    :param controllers: (OrderedDict) Controller name and configurations
+    :return: (str, str) Controller name or None, reason if not routed
+    """
+
+    name = row.get(controller_column)
+    if name:
+        if name in controllers:
+            return name, None
+        return None, f"Controller [{name}] is not configured"
+    site_name = row.site_name
+    match, match_length = None, -1
+    for name, configs in controllers.items():
+        site_prefix = configs["site_prefix"]
+        if not site_prefix or len(site_prefix) <= match_length:
+            continue
+        if site_name == site_prefix or site_name.startswith(f"{site_prefix}/"):
+            match, match_length = name, len(site_prefix)
+    if match is None:
+        return None, f"No controller for site [{site_name}]"
+    return match, None
+
+
+# Write catalog shards
+def _write_shards(catalog_file=None, work_dir=None, route=None):
+    """
+    This private function writes every catalog row to the shard chosen by route
+
+    Malformed rows are not written to any shard, they are returned with the rows
+    that could not be routed as "line <number>", like the catalog validation
+    reports them.
+
+    :param catalog_file: (str) Full path of the device catalog
+    :param work_dir: (str) Directory of the catalog shards
+    :param route: (function) Returns (shard name or None, reason) of a row
+    :return: (OrderedDict, dict) Shard name and (shard path, rows),
+             serials that could not be routed with the reason
+    """
+
+    with open(catalog_file, newline="") as csv_import_file:
+        header = next(csv.reader(csv_import_file), [])
+    shards = OrderedDict()
+    writers = {}
+    unrouted = {}
+    malformed = []
+    try:
+        for row in stream_csv(
+            file_to_parse=catalog_file, report_errors=False, malformed=malformed
+        ):
+            name, reason = route(row)
+            if name is None:
+                unrouted[row.serial_number] = reason
+                continue
+            if name not in writers:
+                shard_file = os.path.join(work_dir, f"{name}.csv")
+                shard = open(shard_file, "w", newline="")
+                writers[name] = (shard, csv.writer(shard))
+                writers[name][1].writerow(header)
+                shards[name] = [shard_file, 0]
+            writers[name][1].writerow(row.values)
+            shards[name][1] += 1
+    finally:
+        for shard, _ in writers.values():
+            shard.close()
+    for line_number, reason in malformed:
+        unrouted[f"line {line_number}"] = f"Malformed row, {reason}"
+    return OrderedDict((name, tuple(shard)) for name, shard in shards.items()), unrouted
+
+
+# Split the catalog per controller
+def split_catalog(catalog_file=None, controllers=None, work_dir=None):
+    """
+    This function writes one catalog shard per controller
+
+    :param catalog_file: (str) Full path of the device catalog
+    :param controllers: (OrderedDict) Controller name and configurations
+    :param work_dir: (str) Directory of the catalog shards
+    :return: (OrderedDict, dict) Controller name and (shard path, rows),
+             serials that could not be routed with the reason
+    """
+
+    return _write_shards(
+        catalog_file=catalog_file,
+        work_dir=work_dir,
+        route=lambda row: _route_row(row=row, controllers=controllers),
+    )
+
+
+# Shard of a serial number
+def shard_of(serial_number=None, shards=None):
+    """
+    This function returns the shard of a serial number
+
+    CRC32 is the same in every process and run, unlike the builtin hash.
+
+    :param serial_number: (str) Device serial number
+    :param shards: (int) Number of shards
+    :return: (int) Shard number, 1 to shards
+    """
+
+    return zlib.crc32(serial_number.encode("utf-8")) % shards + 1
+
+
+# Split the catalog by serial number
+def split_catalog_by_serial(catalog_file=None, shards=None, work_dir=None):
+    """
+    This function writes the catalog into shards by serial number hash
+
+    Rows with the same serial number always end up in the same shard, so the
+    duplicate check of the catalog validation still works per shard.
+
+    :param catalog_file: (str) Full path of the device catalog
+    :param shards: (int) Number of shards
+    :param work_dir: (str) Directory of the catalog shards
+    :return: (OrderedDict, dict) Shard name and (shard path, rows), malformed rows
+             as "line <number>" with the reason
+    """
+
+    shard_files, malformed = _write_shards(
+        catalog_file=catalog_file,
+        work_dir=work_dir,
+        route=lambda row: (
+            f"shard-{shard_of(serial_number=row.serial_number, shards=shards)}",
+            None,
+        ),
+    )
+    shards = OrderedDict(
+        sorted(shard_files.items(), key=lambda item: (len(item[0]), item[0]))
+    )
+    return shards, malformed
+
+
+# Run one controller
+def _run_controller(
+    name=None, configs=None, operation=None, shard_file=None, options=None
+):
+    """
+    This private function runs one operation against one controller
+
+    It runs in its own process with its own session, so the controller gets its
+    own token, API client, metrics and workers. Screen output goes to the
+    controller log.
+
+    :param name: (str) Controller or shard name
+    :param configs: (dict) DNA center configurations of the controller
+    :param operation: (str) import or sync
+    :param shard_file: (str) Catalog shard of the controller
+    :param options: (dict) Operation options
+    :return: (dict) Controller result
+    """
+
+    log_file = os.path.join(os.path.dirname(shard_file), f"{name}.log")
+    result = {
+        "name": name,
+        "host": configs["host"],
+        "status": "ok",
+        "skipped": [],
+        "calls": 0,
+        "errors": 0,
+        "wall_time": 0.0,
+        "log_file": log_file,
+    }
+    session = DnacSession(configs={"dnac": configs})
+    api_metrics.reset()
+    session.warm_up()
+    started = time.perf_counter()
+    with open(log_file, "w", encoding="utf-8") as log:
+        sys.stdout = sys.stderr = log
+        try:
+            if operation == "sync":
+                session.sync_catalog(
+                    catalog_file=shard_file,
+                    plan_only=options.get("plan_only", False),
+                    prune=options.get("prune", False),
+                    workers=configs.get("workers"),
+                )
+            else:
+                session.import_catalog(
+                    catalog_file=shard_file,
+                    validate_only=options.get("validate_only", False),
+                    workers=configs.get("workers"),
+                )
+        except SystemExit as err:
+            if err.code:
+                result["status"] = "failed"
+        except Exception as err:
+            click.secho(f"[x] ERROR: {err}", fg="red")
+            logging.debug("Controller [%s] failed", name, exc_info=True)
+            result["status"] = "failed"
+        finally:
+            tracer.shutdown()
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    result["skipped"] = list(session.skipped)
+    result["wall_time"] = time.perf_counter() - started
+    result["endpoints"] = dict(api_metrics.endpoints)
+    result["retries"] = dict(api_metrics.retries)
+    result["devices_processed"] = dict(api_metrics.devices_processed)
+    for stats in api_metrics.endpoints.values():
+        result["calls"] += stats.calls
+        result["errors"] += sum(
+            count
+            for status_code, count in stats.status_codes.items()
+            if status_code not in accepted_status_codes
+        )
+    return result
+
+
+# Run all shards
+def _run_shards(shards=None, configs=None, operation=None, options=None):
+    """
+    This private function runs one process per catalog shard and waits for all
+
+    :param shards: (OrderedDict) Shard name and (shard path, rows)
+    :param configs: (dict) Shard name and its DNA center configurations
+    :param operation: (str) import or sync
+    :param options: (dict) Operation options
+    :return: (list) Shard results
+    """
+
+    # Export spans of this process now, so the workers do not export them again
+    tracer.shutdown()
+    results = []
+    pool = multiprocessing.Pool(processes=len(shards))
+    try:
+        pending = [
+            (
+                rows,
+                pool.apply_async(
+                    _run_controller,
+                    (name, configs[name], operation, shard_file, options),
+                ),
+            )
+            for name, (shard_file, rows) in shards.items()
+        ]
+        for rows, async_result in pending:
+            result = async_result.get()
+            result["rows"] = rows
+            color = "green" if result["status"] == "ok" else "red"
+            click.secho(
+                f"[#] [{result['name']}] finished in {result['wall_time']:.2f}s "
+                f"({result['status']})",
+                fg=color,
+            )
+            results.append(result)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+# Remove the shards and logs of a run
+def _remove_work_dir(work_dir=None, results=None):
+    """
+    This private function removes the catalog shards and logs of a run
+
+    The directory is kept when a controller or shard failed, so its log can be
+    read.
+
+    :param work_dir: (str) Directory of the shards and logs
+    :param results: (list) Controller or shard results
+    :return: None
+    """
+
+    failed = [result for result in results if result["status"] != "ok"]
+    if not failed:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return
+    for result in failed:
+        click.secho(f"[!] [{result['name']}] log: [{result['log_file']}]", fg="yellow")
+
+
+# Show rows that were not routed
+def _show_unrouted(unrouted=None):
+    """
+    This private function prints the serials that could not be routed
+
+    :param unrouted: (dict) Serials that could not be routed with the reason
+    :return: (stdout) On screen output
+    """
+
+    for serial_number in sorted(unrouted):
+        click.secho(
+            f"[x] [{serial_number}] not routed: {unrouted[serial_number]}", fg="red"
+        )
+
+
+# Show fleet report
+def show_fleet_report(results=None, unrouted=None):
+    """
+    This function prints one combined report of all controllers
+
+    :param results: (list) Controller results
+    :param unrouted: (dict) Serials that could not be routed with the reason
+    :return: (stdout) On screen output
+    """
+
+    divider("Fleet Report")
+    echo_table(
+        rows=(
+            [
+                result["name"],
+                result["host"],
+                result["rows"],
+                len(result["skipped"]),
+                result["calls"],
+                result["errors"],
+                f"{result['wall_time']:.2f}",
+                result["status"],
+            ]
+            for result in results
+        ),
+        headers=[
+            "Controller",
+            "Host",
+            "Rows",
+            "Skipped",
+            "API Calls",
+            "API Errors",
+            "Wall (s)",
+            "Status",
+        ],
+    )
+    for result in results:
+        if result["skipped"]:
+            click.secho(
+                f"[*] [{result['name']}] Skipped Serials: ", fg="cyan", nl=False
+            )
+            click.secho(f"{result['skipped']}", fg="yellow")
+    _show_unrouted(unrouted=unrouted)
+    total_rows = sum(result["rows"] for result in results)
+    total_skipped = sum(len(result["skipped"]) for result in results)
+    click.secho(f"[*] Controllers: {len(results)}", fg="cyan")
+    click.secho(f"[*] Total rows: {total_rows + len(unrouted)}", fg="cyan")
+    click.secho(f"[*] Total serial skipped: {total_skipped}", fg="cyan")
+    click.secho(f"[*] Total serial not routed: {len(unrouted)}", fg="cyan")
+
+
+# Fan-out over all controllers
+def fan_out(all_configs=None, operation=None, catalog_file=None, **options):
+    """
+    This function runs a catalog operation on all controllers in parallel
+
+    :param all_configs: (dict) All configurations
+    :param operation: (str) import or sync
+    :param catalog_file: (str) Full path of the device catalog
+    :param options: (kwargs) Operation options
+    :return: (stdout) On screen output
+    """
+
+    controllers = get_controllers(all_configs=all_configs)
+    divider("Fleet")
+    work_dir = tempfile.mkdtemp(prefix=f"{package_name}-fleet-")
+    results = []
+    try:
+        shards, unrouted = split_catalog(
+            catalog_file=catalog_file, controllers=controllers, work_dir=work_dir
+        )
+        if unrouted and options.get("prune") and not options.get("plan_only"):
+            _show_unrouted(unrouted=unrouted)
+            click.secho(f"[x] Can't prune while catalog rows are not routed!", fg="red")
+            sys.exit(1)
+        if not shards:
+            click.secho(
+                f"[x] No catalog row could be routed to a controller!", fg="red"
+            )
+            _show_unrouted(unrouted=unrouted)
+            sys.exit(1)
+        for name, (_, rows) in shards.items():
+            click.secho(
+                f"[$] [{name}] {operation} of [{rows}] rows on "
+                f"[{controllers[name]['host']}].....",
+                fg="blue",
+            )
+        results = _run_shards(
+            shards=shards, configs=controllers, operation=operation, options=options
+        )
+        show_fleet_report(results=results, unrouted=unrouted)
+    finally:
+        _remove_work_dir(work_dir=work_dir, results=results)
+    goodbye()
+    if any(result["status"] != "ok" for result in results):
+        sys.exit(1)
+
+
+# Shard a catalog over several processes
+def shard_out(configs=None, catalog_file=None, processes=None, validate_only=False):
+    """
+    This function imports a catalog with several processes against one controller
+
+    Every shard runs in its own process with its own session, token and API
+    client. Skipped serials and API call metrics of all shards are merged into
+    one summary.
+
+    :param configs: (dict) DNA center configurations
+    :param catalog_file: (str) Full path of the device catalog
+    :param processes: (int) Number of shards and processes
+    :param validate_only: (boolean) Only validate the catalog, do not import
+    :return: (stdout) On screen output
+    """
+
+    divider("Shards")
+    work_dir = tempfile.mkdtemp(prefix=f"{package_name}-shards-")
+    results = []
+    try:
+        shards, malformed = split_catalog_by_serial(
+            catalog_file=catalog_file, shards=processes, work_dir=work_dir
+        )
+        if not shards:
+            click.secho(f"[x] Device catalog has no rows!", fg="red")
+            sys.exit(1)
+        for name, (_, rows) in shards.items():
+            click.secho(f"[$] [{name}] import of [{rows}] rows.....", fg="blue")
+        results = _run_shards(
+            shards=shards,
+            configs={name: configs for name in shards},
+            operation="import",
+            options={"validate_only": validate_only},
+        )
+        divider("Shard Report")
+        echo_table(
+            rows=(
+                [
+                    result["name"],
+                    result["rows"],
+                    len(result["skipped"]),
+                    result["calls"],
+                    result["errors"],
+                    f"{result['wall_time']:.2f}",
+                    result["status"],
+                ]
+                for result in results
+            ),
+            headers=[
+                "Shard",
+                "Rows",
+                "Skipped",
+                "API Calls",
+                "API Errors",
+                "Wall (s)",
+                "Status",
+            ],
+        )
+        skipped = []
+        for result in results:
+            skipped.extend(result["skipped"])
+            api_metrics.merge(
+                endpoints=result["endpoints"],
+                retries=result["retries"],
+                devices_processed=result["devices_processed"],
+            )
+        for line in sorted(malformed, key=lambda line: int(line.split()[-1])):
+            click.secho(f"[x] [{line}] {malformed[line]}", fg="red")
+        total_rows = sum(result["rows"] for result in results)
+        click.secho(f"[*] Shards: {len(results)}", fg="cyan")
+        click.secho(f"[*] Total rows: {total_rows + len(malformed)}", fg="cyan")
+        click.secho(f"[*] Total malformed rows: {len(malformed)}", fg="cyan")
+    finally:
+        _remove_work_dir(work_dir=work_dir, results=results)
+    goodbye(before=True, data=skipped)
+    if any(result["status"] != "ok" for result in results):
+        sys.exit(1)
@@ -27,7 +27,7 @@ def get_headers(auth_token=None):
     if auth_token is None:
         return headers
     else:
-        logging.debug(f"Token in header:{auth_token}")
+        logging.debug("Token in header:%s", auth_token)
         headers["X-Auth-Token"] = auth_token
-        logging.debug(f"Headers: {headers}")
+        logging.debug("Headers: %s", headers)
         return headers
@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Durable job store for large device onboardings"""
+
+# Import builtin python libraries
+from collections import OrderedDict
+from itertools import islice
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import time
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from .api_call_handler import create_client
+from .catalog_handler import show_validation_report, validate_catalog
+from .device_import_handler import import_row
+from .dnac_info_butler import get_image_index, get_site_index, resolve_serials
+from .dnac_params import (
+    job_claim_size,
+    job_lease_time,
+    job_max_attempts,
+    job_processes,
+    job_progress_interval,
+    job_store_name,
+    token_lifetime,
+)
+from .dnac_records import CatalogRow
+from .dnac_session import DnacSession
+from .dnac_token_generator import generate_token
+from .dnac_tracing import tracer
+from .header_handler import get_headers
+from .utils import divider, echo_table, goodbye, stream_csv
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Unit states, in report order
+unit_states = ["pending", "running", "done", "skipped", "rejected", "failed"]
+# Job store tables
+store_schema = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    catalog TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id INTEGER NOT NULL REFERENCES batches (id),
+    line_number INTEGER,
+    serial_number TEXT,
+    row_values TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    worker TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS units_state ON units (state, id);
+"""
+
+
+# Job store
+class JobStore(object):
+    """
+    SQLite store of catalog rows, one unit of work per row
+
+    Every process opens its own store on the same file. Workers claim units
+    with a lease, a unit whose worker died is claimed again once the lease
+    expired, so workers can be restarted without losing progress.
+    """
+
+    __slots__ = ("path", "_db")
+
+    def __init__(self, path=None):
+        """
+        Constructor method for job store
+
+        :param path: (str) Full path of the SQLite file
+        """
+
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(store_schema)
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    def add_batch(self, catalog_file=None, rows=None, rejected=None):
+        """
+        Stores all rows of a catalog, rejected rows are stored as rejected
+
+        :param catalog_file: (str) Full path of the device catalog
+        :param rows: (iterable) Catalog rows
+        :param rejected: (dict) Rejected serials with reasons
+        :return: (int, int) Batch ID, number of stored rows
+        """
+
+        now = time.time()
+        rows = iter(rows)
+        first_row = next(rows, None)
+        if first_row is None:
+            return None, 0
+        db = self._transaction()
+        try:
+            batch_id = db.execute(
+                "INSERT INTO batches (catalog, columns, created) VALUES (?, ?, ?)",
+                (catalog_file, json.dumps(list(first_row.columns)), now),
+            ).lastrowid
+            total = 0
+            chunk = [first_row]
+            while chunk:
+                units = []
+                for row in chunk:
+                    reasons = rejected.get(row.serial_number)
+                    units.append(
+                        (
+                            batch_id,
+                            row.line_number,
+                            row.serial_number,
+                            json.dumps(row.values),
+                            "rejected" if reasons else "pending",
+                            "; ".join(reasons) if reasons else None,
+                            now,
+                        )
+                    )
+                db.executemany(
+                    "INSERT INTO units (batch_id, line_number, serial_number, "
+                    "row_values, state, last_error, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    units,
+                )
+                total += len(units)
+                chunk = list(islice(rows, 1000))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return batch_id, total
+
+    def columns(self, batch_id=None):
+        """Returns the column name and position mapping of a batch"""
+
+        (columns,) = self._db.execute(
+            "SELECT columns FROM batches WHERE id = ?", (batch_id,)
+        ).fetchone()
+        return {column: index for index, column in enumerate(json.loads(columns))}
+
+    def claim(self, worker=None, limit=job_claim_size):
+        """
+        Claims pending units and units whose lease expired
+
+        :param worker: (str) Worker name
+        :param limit: (int) Units to claim
+        :return: (list) (unit ID, batch ID, line number, row values, attempts)
+        """
+
+        now = time.time()
+        db = self._transaction()
+        try:
+            db.execute(
+                "UPDATE units SET state = 'failed', finished = ?, "
+                "last_error = 'Worker lost, lease expired' "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, job_max_attempts),
+            )
+            units = db.execute(
+                "SELECT id, batch_id, line_number, row_values, attempts FROM units "
+                "WHERE state = 'pending' OR (state = 'running' AND lease_until < ?) "
+                "ORDER BY id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE units SET state = 'running', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1, started = ? WHERE id = ?",
+                [(worker, now + job_lease_time, now, unit[0]) for unit in units],
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return [
+            (unit_id, batch_id, line_number, json.loads(values), attempts + 1)
+            for unit_id, batch_id, line_number, values, attempts in units
+        ]
+
+    def renew(self, worker=None):
+        """
+        Extends the lease of the running units of a worker
+
+        :param worker: (str) Worker name
+        :return: (set) IDs of the units the worker still owns
+        """
+
+        db = self._transaction()
+        try:
+            db.execute(
+                "UPDATE units SET lease_until = ? "
+                "WHERE state = 'running' AND worker = ?",
+                (time.time() + job_lease_time, worker),
+            )
+            owned = db.execute(
+                "SELECT id FROM units WHERE state = 'running' AND worker = ?",
+                (worker,),
+            ).fetchall()
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return {unit_id for (unit_id,) in owned}
+
+    def finish(self, unit_id=None, state="done", error=None):
+        """Records the final state of a unit"""
+
+        self._db.execute(
+            "UPDATE units SET state = ?, last_error = ?, finished = ?, "
+            "lease_until = NULL WHERE id = ?",
+            (state, error, time.time(), unit_id),
+        )
+
+    def fail(self, unit_id=None, attempts=None, error=None):
+        """Records a failed attempt, the unit is retried until job_max_attempts"""
+
+        if attempts >= job_max_attempts:
+            self.finish(unit_id=unit_id, state="failed", error=error)
+            return
+        self._db.execute(
+            "UPDATE units SET state = 'pending', last_error = ?, lease_until = NULL "
+            "WHERE id = ?",
+            (error, unit_id),
+        )
+
+    def release(self, worker=None):
+        """Gives the running units of a stopped worker back, attempts not counted"""
+
+        self._db.execute(
+            "UPDATE units SET state = 'pending', attempts = attempts - 1, "
+            "lease_until = NULL WHERE state = 'running' AND worker = ?",
+            (worker,),
+        )
+
+    def counts(self):
+        """
+        Counts the units per batch and state
+
+        :return: (OrderedDict) Batch ID and (catalog, created, state counts)
+        """
+
+        batches = OrderedDict(
+            (batch_id, (catalog, created, dict.fromkeys(unit_states, 0)))
+            for batch_id, catalog, created in self._db.execute(
+                "SELECT id, catalog, created FROM batches ORDER BY id"
+            )
+        )
+        for batch_id, state, count in self._db.execute(
+            "SELECT batch_id, state, COUNT(*) FROM units GROUP BY batch_id, state"
+        ):
+            batches[batch_id][2][state] = count
+        return batches
+
+    def throughput(self):
+        """Returns finished units per second of the last hour, None if unknown"""
+
+        since = time.time() - 3600
+        count, first, last = self._db.execute(
+            "SELECT COUNT(*), MIN(finished), MAX(finished) FROM units "
+            "WHERE finished > ? AND state IN ('done', 'skipped', 'failed')",
+            (since,),
+        ).fetchone()
+        if count < 2 or last <= first:
+            return None
+        return count / (last - first)
+
+    def problems(self, limit=None):
+        """
+        Yields the units that failed, were rejected/skipped or are being retried
+
+        :param limit: (int) Maximum number of units
+        :return: (generator) (batch ID, line, serial, state, attempts, last error)
+        """
+
+        query = (
+            "SELECT batch_id, line_number, serial_number, state, attempts, "
+            "last_error FROM units WHERE last_error IS NOT NULL ORDER BY id"
+        )
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        yield from self._db.execute(query)
+
+
+# Job store path
+def get_store_path(base_directory=None, store_file=None):
+    """
+    This function returns the job store path, by default in the base directory
+
+    :param base_directory: (str) Base directory of the configurations
+    :param store_file: (str) Job store file path given by the user
+    :return: (str) Full path of the job store
+    """
+
+    if store_file:
+        return os.path.abspath(store_file)
+    jobs_directory = os.path.join(base_directory, "jobs")
+    os.makedirs(jobs_directory, exist_ok=True)
+    return os.path.join(jobs_directory, job_store_name)
+
+
+# Submit catalog
+def submit_catalog(configs=None, catalog_file=None, store_path=None):
+    """
+    This function validates a device catalog and stores its rows as units
+
+    :param configs: (dict) DNA center configurations
+    :param catalog_file: (str) Full path of the device catalog
+    :param store_path: (str) Full path of the job store
+    :return: (stdout) On screen output
+    """
+
+    token = generate_token(configs=configs)
+    headers = get_headers(auth_token=token)
+    divider("Catalog Validation")
+    rejected, total_rows = validate_catalog(
+        api_headers=headers, import_file=catalog_file
+    )
+    show_validation_report(rejected=rejected, total_rows=total_rows)
+    divider("Job Store")
+    store = JobStore(path=store_path)
+    try:
+        batch_id, stored = store.add_batch(
+            catalog_file=os.path.abspath(catalog_file),
+            rows=stream_csv(file_to_parse=catalog_file, report_errors=False),
+            rejected=rejected,
+        )
+    finally:
+        store.close()
+    if batch_id is None:
+        click.secho(f"[x] Device catalog has no rows!", fg="red")
+        sys.exit(1)
+    click.secho(
+        f"[#] Batch [{batch_id}] stored with [{stored}] rows in [{store_path}]",
+        fg="green",
+    )
+    click.secho(f"[*] Run [dnac_pnp jobs run] to start the workers", fg="cyan")
+
+
+# Work through units
+def _work_units(store=None, session=None, worker=None):
+    """
+    This private function claims and imports units until none is left
+
+    :param store: (JobStore) Job store of the worker
+    :param session: (DnacSession) Session of the worker
+    :param worker: (str) Worker name
+    :return: (dict) State and number of units
+    """
+
+    counts = dict.fromkeys(unit_states, 0)
+    columns = {}
+    binders = {}
+    headers, token_time = None, 0.0
+    sites = images = None
+    try:
+        while True:
+            units = store.claim(worker=worker)
+            if not units:
+                return counts
+            if headers is None or time.monotonic() - token_time > token_lifetime:
+                headers = get_headers(
+                    auth_token=generate_token(configs=session.dnac_configs)
+                )
+                token_time = time.monotonic()
+                sites = get_site_index(api_headers=headers) or None
+                images = get_image_index(api_headers=headers) or None
+            rows = []
+            for unit_id, batch_id, line_number, values, attempts in units:
+                if batch_id not in columns:
+                    columns[batch_id] = store.columns(batch_id=batch_id)
+                row = CatalogRow(
+                    columns=columns[batch_id],
+                    values=tuple(values),
+                    line_number=line_number,
+                )
+                rows.append((unit_id, attempts, row))
+            device_map = resolve_serials(
+                api_headers=headers,
+                serial_numbers=[row.serial_number for _, _, row in rows],
+            )
+            for unit_id, attempts, row in rows:
+                if unit_id not in store.renew(worker=worker):
+                    click.secho(
+                        f"[!] Lease of row [{row.line_number}] lost, not imported",
+                        fg="yellow",
+                    )
+                    continue
+                skipped = len(session.skipped)
+                error = None
+                try:
+                    with tracer.span(
+                        "catalog-row",
+                        **{
+                            "dnac.serial_number": row.serial_number,
+                            "dnac.line": row.line_number,
+                        },
+                    ):
+                        reason = import_row(
+                            headers=headers,
+                            row=row,
+                            device_map=device_map,
+                            binders=binders,
+                            sites=sites,
+                            images=images,
+                        )
+                except SystemExit:
+                    reason = error = "Device import aborted, see worker log"
+                except Exception as err:
+                    logging.debug("Unit [%s] failed", unit_id, exc_info=True)
+                    reason = error = f"ERROR: {err}"
+                if reason is None:
+                    store.finish(unit_id=unit_id, state="done")
+                    counts["done"] += 1
+                elif error is None and len(session.skipped) > skipped:
+                    store.finish(unit_id=unit_id, state="skipped", error=reason)
+                    counts["skipped"] += 1
+                else:
+                    store.fail(unit_id=unit_id, attempts=attempts, error=reason)
+                    counts["failed" if attempts >= job_max_attempts else "pending"] += 1
+    finally:
+        store.release(worker=worker)
+
+
+# Run one worker
+def _run_worker(configs=None, store_path=None, log_file=None):
+    """
+    This private function runs one worker process, screen output goes to its log
+
+    :param configs: (dict) DNA center configurations
+    :param store_path: (str) Full path of the job store
+    :param log_file: (str) Worker log file
+    :return: (dict) Worker result
+    """
+
+    # A terminated worker gives its running units back like an interrupted one
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    result = {"worker": worker, "status": "ok", "counts": {}}
+    session = DnacSession(configs={"dnac": configs}, client=create_client())
+    store = JobStore(path=store_path)
+    with open(log_file, "a", encoding="utf-8") as log:
+        sys.stdout = sys.stderr = log
+        try:
+            click.secho(f"[$] Worker [{worker}] started", fg="blue")
+            result["counts"] = session.run(
+                _work_units, store=store, session=session, worker=worker
+            )
+        except KeyboardInterrupt:
+            click.secho(f"[!] Worker [{worker}] interrupted", fg="yellow")
+            raise
+        except SystemExit:
+            result["status"] = "failed"
+        except Exception as err:
+            click.secho(f"[x] ERROR: {err}", fg="red")
+            logging.debug("Worker [%s] failed", worker, exc_info=True)
+            result["status"] = "failed"
+        finally:
+            store.close()
+            tracer.shutdown()
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    return result
+
+
+# Show progress line
+def _show_progress(store=None):
+    """
+    This private function prints one progress line over all batches
+
+    :param store: (JobStore) Job store
+    :return: (dict) Total state counts
+    """
+
+    totals = dict.fromkeys(unit_states, 0)
+    for _, _, counts in store.counts().values():
+        for state, count in counts.items():
+            totals[state] += count
+    units = sum(totals.values())
+    finished = units - totals["pending"] - totals["running"]
+    throughput = store.throughput()
+    rate = f", {throughput:.1f} rows/s" if throughput else ""
+    click.secho(
+        f"[*] Progress: [{finished}/{units}] rows finished, "
+        f"[{totals['running']}] running, [{totals['pending']}] pending{rate}",
+        fg="cyan",
+    )
+    return totals
+
+
+# Run workers
+def run_jobs(configs=None, store_path=None, processes=job_processes):
+    """
+    This function runs worker processes until every unit is finished
+
+    :param configs: (dict) DNA center configurations
+    :param store_path: (str) Full path of the job store
+    :param processes: (int) Worker processes
+    :return: (stdout) On screen output
+    """
+
+    store = JobStore(path=store_path)
+    try:
+        divider("Job Workers")
+        totals = _show_progress(store=store)
+        if not totals["pending"] and not totals["running"]:
+            click.secho(f"[!] No rows left to process in [{store_path}]", fg="yellow")
+            return
+        log_directory = os.path.dirname(store_path)
+        click.secho(
+            f"[$] Starting [{processes}] workers, logs in [{log_directory}].....",
+            fg="blue",
+        )
+        # Export spans of this process now, so the workers do not export them again
+        tracer.shutdown()
+        pool = multiprocessing.Pool(processes=processes)
+        try:
+            pending = [
+                pool.apply_async(
+                    _run_worker,
+                    (
+                        configs,
+                        store_path,
+                        os.path.join(log_directory, f"worker-{index + 1}.log"),
+                    ),
+                )
+                for index in range(processes)
+            ]
+            while not all(async_result.ready() for async_result in pending):
+                pending[-1].wait(timeout=job_progress_interval)
+                _show_progress(store=store)
+            results = [async_result.get() for async_result in pending]
+        except KeyboardInterrupt:
+            pool.terminate()
+            pool.join()
+            click.secho(
+                f"[!] Interrupted, running rows are given back to the job store",
+                fg="yellow",
+            )
+            sys.exit(1)
+        pool.close()
+        pool.join()
+    finally:
+        store.close()
+    for result in results:
+        if result["status"] != "ok":
+            click.secho(f"[x] Worker [{result['worker']}] failed!", fg="red")
+    show_job_status(store_path=store_path)
+    goodbye()
+
+
+# Show job status
+def show_job_status(store_path=None, errors=False, limit=None):
+    """
+    This function prints the progress of every batch in the job store
+
+    :param store_path: (str) Full path of the job store
+    :param errors: (boolean) Also list the rows with their last error
+    :param limit: (int) Maximum number of rows with errors to list
+    :return: (stdout) On screen output
+    """
+
+    if not os.path.isfile(store_path):
+        click.secho(f"[x] Job store [{store_path}] does not exist!", fg="red")
+        sys.exit(1)
+
+    def progress(counts):
+        rows = sum(counts.values())
+        finished = rows - counts["pending"] - counts["running"]
+        return f"{100.0 * finished / max(rows, 1):.1f}%"
+
+    store = JobStore(path=store_path)
+    try:
+        divider("Job Status")
+        echo_table(
+            rows=(
+                [
+                    batch_id,
+                    catalog,
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(created)),
+                    sum(counts.values()),
+                    *[counts[state] for state in unit_states],
+                    progress(counts),
+                ]
+                for batch_id, (catalog, created, counts) in store.counts().items()
+            ),
+            headers=[
+                "Batch",
+                "Catalog",
+                "Submitted",
+                "Rows",
+                *[state.capitalize() for state in unit_states],
+                "Progress",
+            ],
+        )
+        totals = _show_progress(store=store)
+        throughput = store.throughput()
+        if throughput and totals["pending"]:
+            remaining = (totals["pending"] + totals["running"]) / throughput
+            click.secho(f"[*] Estimated time left: {remaining / 60:.1f} min", fg="cyan")
+        if errors:
+            divider("Rows with errors")
+            echo_table(
+                rows=store.problems(limit=limit),
+                headers=["Batch", "Line", "Serial", "State", "Attempts", "Last Error"],
+            )
+    finally:
+        store.close()
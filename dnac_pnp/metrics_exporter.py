@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Prometheus text format exporter for long-running operations"""
+
+# Import builtin python libraries
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import logging
+import os
+from socketserver import ThreadingMixIn
+import tempfile
+import threading
+
+# Import custom (local) python packages
+from .dnac_metrics import api_metrics, latency_buckets
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Metric name prefix
+metric_prefix = "dnac_pnp"
+# Prometheus text exposition format content type
+content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# Escape label value
+def _label(value=None):
+    """
+    This private function escapes a label value for the text format
+
+    :param value: (str) Label value
+    :return: (str) Escaped label value
+    """
+
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Render all metrics
+def render_metrics(metrics=None):
+    """
+    This function renders the run metrics in Prometheus text format
+
+    :param metrics: (ApiMetrics) Metrics to render, defaults to the process metrics
+    :return: (str) Metrics in Prometheus text exposition format
+    """
+
+    if metrics is None:
+        metrics = api_metrics
+    snapshot = metrics.snapshot()
+    lines = []
+
+    def family(name=None, metric_type=None, help_text=None):
+        lines.append(f"# HELP {metric_prefix}_{name} {help_text}")
+        lines.append(f"# TYPE {metric_prefix}_{name} {metric_type}")
+
+    def sample(name=None, labels=None, value=0):
+        label_text = ""
+        if labels:
+            label_text = ",".join(
+                f'{key}="{_label(label_value)}"' for key, label_value in labels.items()
+            )
+            label_text = f"{{{label_text}}}"
+        lines.append(f"{metric_prefix}_{name}{label_text} {value}")
+
+    family("devices_processed_total", "counter", "Devices processed per operation.")
+    for operation, count in sorted(snapshot["devices_processed"].items()):
+        sample("devices_processed_total", {"operation": operation}, count)
+
+    family("stage_queue_depth", "gauge", "Devices waiting per pipeline stage.")
+    for stage, depth in sorted(snapshot["queue_depth"].items()):
+        sample("stage_queue_depth", {"stage": stage}, depth)
+
+    family("api_requests_in_flight", "gauge", "API calls currently in flight.")
+    sample("api_requests_in_flight", None, snapshot["in_flight"])
+
+    family("api_retries_total", "counter", "Retried API calls per API type.")
+    for api_type, count in sorted(snapshot["retries"].items()):
+        sample("api_retries_total", {"api_type": api_type}, count)
+
+    endpoints = snapshot["endpoints"]
+    family("api_requests_total", "counter", "API calls per API type and status.")
+    for api_type, stats in endpoints.items():
+        for status_code, count in sorted(stats["status_codes"].items()):
+            sample(
+                "api_requests_total", {"api_type": api_type, "status": status_code}, count
+            )
+
+    family("api_throttled_total", "counter", "API calls rejected with HTTP 429.")
+    for api_type, stats in endpoints.items():
+        sample(
+            "api_throttled_total",
+            {"api_type": api_type},
+            stats["status_codes"].get("429", 0),
+        )
+
+    family("api_bytes_total", "counter", "API payload bytes per API type.")
+    for api_type, stats in endpoints.items():
+        sample(
+            "api_bytes_total",
+            {"api_type": api_type, "direction": "sent"},
+            stats["bytes_sent"],
+        )
+        sample(
+            "api_bytes_total",
+            {"api_type": api_type, "direction": "received"},
+            stats["bytes_received"],
+        )
+
+    family("api_request_duration_seconds", "histogram", "API call latency.")
+    for api_type, stats in endpoints.items():
+        cumulative = 0
+        for bucket in latency_buckets:
+            cumulative += stats["histogram"][str(bucket)]
+            upper_bound = "+Inf" if bucket == float("inf") else str(bucket)
+            sample(
+                "api_request_duration_seconds_bucket",
+                {"api_type": api_type, "le": upper_bound},
+                cumulative,
+            )
+        sample(
+            "api_request_duration_seconds_sum",
+            {"api_type": api_type},
+            stats["total_latency"],
+        )
+        sample(
+            "api_request_duration_seconds_count", {"api_type": api_type}, stats["calls"]
+        )
+
+    return "\n".join(lines) + "\n"
+
+
+# Metrics HTTP request handler
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the run metrics on /metrics"""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("Metrics exporter: " + format, *args)
+
+
+# Threaded HTTP server
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """HTTP server handling every scrape in its own thread"""
+
+    daemon_threads = True
+
+
+# HTTP exporter
+class MetricsHttpExporter(object):
+    """Exposes the run metrics on a local HTTP port"""
+
+    def __init__(self, port=None, address="127.0.0.1"):
+        """
+        Constructor method for HTTP exporter
+
+        :param port: (int) Local TCP port
+        :param address: (str) Local listen address
+        """
+
+        self.server = _ThreadingHTTPServer((address, port), _MetricsRequestHandler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics-http", daemon=True
+        )
+
+    def start(self):
+        """Starts serving in a background thread"""
+
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops serving"""
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Textfile exporter
+class MetricsTextfileExporter(object):
+    """Writes the run metrics periodically for the node_exporter textfile collector"""
+
+    def __init__(self, file_path=None, interval=15.0):
+        """
+        Constructor method for textfile exporter
+
+        :param file_path: (str) Full path of the .prom file
+        :param interval: (float) Seconds between two writes
+        """
+
+        self.file_path = file_path
+        self.interval = interval
+        self._stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run, name="metrics-textfile", daemon=True
+        )
+
+    def write(self):
+        """Writes the metrics atomically so a scrape never sees a partial file"""
+
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as metrics_file:
+                metrics_file.write(render_metrics())
+            # mkstemp creates the file for its owner only, collectors run as others
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.file_path)
+        except OSError as err:
+            logging.debug("Metrics textfile write failed: %s", err)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """Starts writing in a background thread"""
+
+        self.write()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops writing and writes the final state"""
+
+        self._stopped.set()
+        self.write()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Run profiler for the command line sub-commands"""
+
+# Import builtin python libraries
+from collections import Counter
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Import external python libraries
+import click
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Frame label
+def _frame_label(code=None):
+    """
+    This private function creates a readable label for a code object
+
+    :param code: (code) Python code object
+    :return: (str) Function name, file name and line number
+    """
+
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+# Idle pool thread
+def _is_idle_worker(frame=None):
+    """
+    This private function checks if a thread pool worker is waiting for work
+
+    :param frame: (frame) Innermost python frame of a thread
+    :return: (boolean) True if the thread waits in the executor worker loop
+    """
+
+    code = frame.f_code
+    return code.co_name == "_worker" and code.co_filename.endswith(
+        os.path.join("concurrent", "futures", "thread.py")
+    )
+
+
+# Sampling profiler
+class StackSampler(object):
+    """Samples the stacks of all threads periodically and counts collapsed stacks"""
+
+    def __init__(self, interval=0.005):
+        """
+        Constructor method for stack sampler
+
+        :param interval: (float) Seconds between two samples
+        """
+
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profile-sampler", daemon=True
+        )
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id or _is_idle_worker(frame):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        """Starts sampling all threads"""
+
+        self._thread.start()
+
+    def stop(self):
+        """Stops sampling"""
+
+        self._stopped.set()
+        self._thread.join()
+
+    def write(self, file_path=None):
+        """Writes flamegraph compatible collapsed stacks"""
+
+        with open(file_path, "w", encoding="utf-8") as profile_file:
+            for stack, count in self.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+    def top(self, limit=15):
+        """
+        Returns the functions with most samples
+
+        :param limit: (int) Number of functions
+        :return: (list, list) Table headers and table rows
+        """
+
+        total = sum(self.stacks.values()) or 1
+        own_samples = Counter()
+        all_samples = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own_samples[frames[-1]] += count
+            for frame in set(frames):
+                all_samples[frame] += count
+        headers = ["Function", "Own %", "Total %"]
+        rows = [
+            [
+                function,
+                f"{count / total * 100:.1f}",
+                f"{all_samples[function] / total * 100:.1f}",
+            ]
+            for function, count in own_samples.most_common(limit)
+        ]
+        return headers, rows
+
+
+# Deterministic profiler
+class FunctionProfiler(object):
+    """Thin wrapper around cProfile with the same interface as the sampler"""
+
+    def __init__(self):
+        """Constructor method for function profiler"""
+
+        self.profile = cProfile.Profile()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, frame, event, arg):
+        # Called once in every new thread, the thread profile replaces this hook
+        profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    def start(self):
+        """Starts profiling the calling thread and all threads started later"""
+
+        # cProfile follows every thread by itself since python 3.12
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._profile_thread)
+        self.profile.enable()
+
+    def stop(self):
+        """Stops profiling"""
+
+        self.profile.disable()
+        threading.setprofile(None)
+
+    def _stats(self):
+        stats = pstats.Stats(self.profile)
+        with self._lock:
+            thread_profiles = list(self._thread_profiles)
+        for profile in thread_profiles:
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        return stats
+
+    def write(self, file_path=None):
+        """Writes a .pstats file, readable with pstats or snakeviz"""
+
+        self._stats().dump_stats(file_path)
+
+    def top(self, limit=15):
+        """
+        Returns the functions with most own time
+
+        :param limit: (int) Number of functions
+        :return: (list, list) Table headers and table rows
+        """
+
+        stats = self._stats().stats
+        ranked = sorted(stats.items(), key=lambda item: -item[1][2])[:limit]
+        headers = ["Function", "Calls", "Own (s)", "Total (s)"]
+        rows = [
+            [
+                f"{function} ({os.path.basename(file_name)}:{line_number})",
+                total_calls,
+                f"{own_time:.3f}",
+                f"{total_time:.3f}",
+            ]
+            for (file_name, line_number, function), (
+                _,
+                total_calls,
+                own_time,
+                total_time,
+                _,
+            ) in ranked
+        ]
+        return headers, rows
+
+
+# Run profiler
+class RunProfiler(object):
+    """Profiles one sub-command and reports hot functions and the wall time split"""
+
+    def __init__(
+        self, file_path=None, output_format="pstats", limit=15, network_time=None
+    ):
+        """
+        Constructor method for run profiler
+
+        :param file_path: (str) Full path of the profile output
+        :param output_format: (str) pstats or collapsed
+        :param limit: (int) Number of hot functions in the summary
+        :param network_time: (function) Returns seconds spent waiting on the network
+        """
+
+        self.file_path = file_path
+        self.limit = limit
+        self.network_time = network_time
+        if output_format == "collapsed":
+            self.profiler = StackSampler()
+        else:
+            self.profiler = FunctionProfiler()
+        self._wall_started = None
+        self._cpu_started = None
+
+    def start(self):
+        """Starts profiling"""
+
+        self._wall_started = time.perf_counter()
+        self._cpu_started = time.process_time()
+        self.profiler.start()
+        return self
+
+    def stop(self):
+        """Stops profiling, writes the profile and prints the summary"""
+
+        self.profiler.stop()
+        wall_time = time.perf_counter() - self._wall_started
+        cpu_time = time.process_time() - self._cpu_started
+        try:
+            self.profiler.write(file_path=self.file_path)
+            click.secho(f"[#] Profile written to [{self.file_path}]", fg="green")
+        except IOError as err:
+            click.secho(f"[x] Profile export failed! ERROR: {err}", fg="red")
+        self.show_summary(wall_time=wall_time, cpu_time=cpu_time)
+
+    def show_summary(self, wall_time=0.0, cpu_time=0.0):
+        """
+        Prints hot functions and the wall time split between network and CPU
+
+        :param wall_time: (float) Wall time of the run in seconds
+        :param cpu_time: (float) CPU time of the run in seconds
+        :return: (stdout) On screen output
+        """
+
+        from tabulate import tabulate
+
+        table_headers, table_rows = self.profiler.top(limit=self.limit)
+        click.secho(f"[*] Top {self.limit} functions:", fg="cyan")
+        print(
+            tabulate(
+                table_rows,
+                headers=table_headers,
+                tablefmt="psql",
+                disable_numparse=True,
+            )
+        )
+        wall_time = wall_time or 1e-9
+        if self.network_time is not None:
+            network_time = self.network_time()
+            network_label = "Network wait"
+        else:
+            network_time = max(wall_time - cpu_time, 0.0)
+            network_label = "Network/IO wait"
+        other_time = max(wall_time - network_time - cpu_time, 0.0)
+        click.secho(f"[*] Wall time: {wall_time:.2f}s", fg="cyan")
+        for label, seconds in [
+            (network_label, network_time),
+            ("CPU", cpu_time),
+            ("Other", other_time),
+        ]:
+            click.secho(
+                f"[*] {label}: {seconds:.2f}s ({seconds / wall_time * 100:.1f}%)",
+                fg="cyan",
+            )
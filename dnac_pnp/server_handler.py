@@ -0,0 +1,677 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Long running job server on top of a warm DNA center session"""
+
+# Import builtin python libraries
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import logging
+import os
+import socketserver
+import stat
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from .api_call_handler import get_response
+from .device_delete_handler import delete_device
+from .device_import_handler import acclaim_device, compile_binder
+from .dnac_info_butler import (
+    get_image_index,
+    get_site_index,
+    iter_pnp_devices,
+    resolve_inventory_serials,
+    resolve_serials,
+)
+from .dnac_params import (
+    device_extra_param,
+    device_extra_param_less,
+    image_column,
+    inventory_device_states,
+    pnp_filter_keys,
+    serve_cache_lifetime,
+    serve_job_history,
+    serve_workers,
+    token_lifetime,
+)
+from .dnac_records import CatalogRow
+from .dnac_session import DnacSession
+from .dnac_token_generator import generate_token
+from .header_handler import get_headers
+from .utils import check_csv_header, divider
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Warm caches
+class WarmCache(object):
+    """
+    Token, site and image index, template binders and PnP snapshot of all jobs
+
+    DNA center is only called outside the cache lock, one thread per cached
+    value. While a value is renewed the other jobs keep using the old one, only
+    jobs that find no value at all wait for the fetch.
+    """
+
+    __slots__ = ("configs", "_lock", "_values", "_refresh_locks")
+
+    def __init__(self, configs=None):
+        """
+        Constructor method for warm cache
+
+        :param configs: (dict) DNA center configurations
+        """
+
+        self.configs = configs
+        self._lock = threading.Lock()
+        self._values = {}
+        self._refresh_locks = {}
+
+    @staticmethod
+    def _expired(refreshed=None, lifetime=serve_cache_lifetime):
+        return refreshed is None or time.monotonic() - refreshed > lifetime
+
+    def _cached(self, key=None, fetch=None, lifetime=serve_cache_lifetime):
+        """
+        Returns a cached value, fetched again once it is older than its lifetime
+
+        :param key: (object) Cache key
+        :param fetch: (function) Fetches the value from DNA center
+        :param lifetime: (int) Seconds the value is used before it is renewed
+        :return: (object) Cached value
+        """
+
+        with self._lock:
+            value, refreshed = self._values.get(key, (None, None))
+            refresh_lock = self._refresh_locks.setdefault(key, threading.Lock())
+        if value is not None and not self._expired(refreshed, lifetime):
+            return value
+        if not refresh_lock.acquire(blocking=value is None):
+            # Another job renews the value, the old one is still good meanwhile
+            return value
+        try:
+            with self._lock:
+                value, refreshed = self._values.get(key, (None, None))
+            if value is None or self._expired(refreshed, lifetime):
+                value = fetch()
+                with self._lock:
+                    self._values[key] = (value, time.monotonic())
+            return value
+        finally:
+            refresh_lock.release()
+
+    def headers(self):
+        """Returns API headers, a new token is generated once the old one is too old"""
+
+        return self._cached(
+            key="headers",
+            fetch=lambda: get_headers(auth_token=generate_token(configs=self.configs)),
+            lifetime=token_lifetime,
+        )
+
+    def site(self, site_name=None):
+        """
+        Returns the site record of a site name
+
+        :param site_name: (str) Site name with full hierarchy
+        :return: (Site) Site record, None if the site does not exist
+        """
+
+        sites = self._cached(
+            key="sites",
+            fetch=lambda: get_site_index(api_headers=self.headers()) or {},
+        )
+        return sites.get(site_name)
+
+    def image_id(self, image_name=None):
+        """
+        Returns the ID of an image, the image index is fetched on first use
+
+        :param image_name: (str) Full image name with extension
+        :return: (str) Image ID, None if the image is not present
+        """
+
+        images = self._cached(
+            key="images",
+            fetch=lambda: get_image_index(api_headers=self.headers()) or {},
+        )
+        return images.get(image_name)
+
+    def binder(self, template_name=None):
+        """
+        Returns the compiled binder of a template, compiled on first use
+
+        :param template_name: (str) Template name as [project_name/template_name]
+        :return: (TemplateBinder) Template binder, False if the template is not usable
+        """
+
+        return self._cached(
+            key=("binder", template_name),
+            fetch=lambda: compile_binder(
+                dnac_api_headers=self.headers(), template_name=template_name
+            ),
+        )
+
+    def _fetch_devices(self):
+        return {
+            device.serial_number: (
+                device.id,
+                device.state,
+                device.as_dict(
+                    device_extra_param
+                    if device.state == "Provisioned"
+                    else device_extra_param_less
+                ),
+            )
+            for device in iter_pnp_devices(api_headers=self.headers())
+        }
+
+    def devices(self, serial_numbers=None):
+        """
+        Resolves serial numbers from the PnP snapshot, unknown serials from DNA center
+
+        :param serial_numbers: (list) Serial numbers
+        :return: (dict) Serial number and (device ID, state, extra information)
+        """
+
+        snapshot = self._cached(key="devices", fetch=self._fetch_devices)
+        with self._lock:
+            device_map = {
+                serial_number: snapshot[serial_number]
+                for serial_number in serial_numbers
+                if serial_number in snapshot
+            }
+        missing = [
+            serial_number
+            for serial_number in serial_numbers
+            if serial_number not in device_map
+        ]
+        if missing:
+            device_map.update(
+                resolve_serials(api_headers=self.headers(), serial_numbers=missing)
+            )
+        return device_map
+
+    def forget(self, serial_numbers=None):
+        """Drops serial numbers from the PnP snapshot after a job changed them"""
+
+        with self._lock:
+            snapshot, _ = self._values.get("devices", ({}, None))
+            for serial_number in serial_numbers:
+                snapshot.pop(serial_number, None)
+
+
+# Catalog row from a job
+def _device_row(device=None, job_columns=None):
+    """
+    This private function creates a catalog row from one device of an import job
+
+    Devices with the same keys share one column mapping, so template binders
+    compile their parameter plan once per job and not once per device.
+
+    :param device: (dict) Device information keyed by catalog header
+    :param job_columns: (dict) Device keys and column mapping of the job so far
+    :return: (CatalogRow) Catalog row
+    """
+
+    if not isinstance(device, dict) or not device:
+        raise ValueError("Every device must be an object keyed by catalog header")
+    device_keys = tuple(device)
+    columns = job_columns.get(device_keys)
+    if columns is None:
+        try:
+            headers = check_csv_header(file_headers=list(device_keys))
+        except SystemExit:
+            raise ValueError(
+                f"Device keys {list(device_keys)} do not match the catalog headers"
+            )
+        columns = job_columns[device_keys] = {
+            column: index for index, column in enumerate(headers)
+        }
+    return CatalogRow(
+        columns=columns, values=tuple(str(value).strip() for value in device.values())
+    )
+
+
+# Check job payload
+def _prepare_job(job_type=None, payload=None):
+    """
+    This private function checks a job payload and prepares the job arguments
+
+    :param job_type: (str) import, delete or show
+    :param payload: (dict) Job request body
+    :return: (object) Job arguments
+    """
+
+    if job_type == "import":
+        devices = payload.get("devices")
+        if not isinstance(devices, list) or not devices:
+            raise ValueError("Import jobs need a non empty [devices] list")
+        job_columns = {}
+        return [
+            _device_row(device=device, job_columns=job_columns) for device in devices
+        ]
+    if job_type == "delete":
+        serials = payload.get("serials")
+        if not isinstance(serials, list) or not serials:
+            raise ValueError("Delete jobs need a non empty [serials] list")
+        return [str(serial).strip() for serial in serials]
+    if job_type == "show":
+        pnp_filters = {}
+        filters = dict(payload.get("filters") or {})
+        if payload.get("serial"):
+            filters["serial"] = payload["serial"]
+        for name, values in filters.items():
+            if name not in pnp_filter_keys:
+                raise ValueError(
+                    f"Filter [{name}] is not supported, names: {', '.join(pnp_filter_keys)}"
+                )
+            if not isinstance(values, list):
+                values = [values]
+            pnp_filters[pnp_filter_keys[name]] = [str(value) for value in values]
+        try:
+            limit = int(payload["limit"]) if payload.get("limit") else None
+            offset = int(payload.get("offset") or 0)
+        except (TypeError, ValueError):
+            raise ValueError("[limit] and [offset] must be numbers")
+        return pnp_filters, limit, offset
+    raise ValueError(f"Job type [{job_type}] is not supported, use import/delete/show")
+
+
+# Import job
+def _import_job(cache=None, session=None, rows=None):
+    """
+    This private function adds and claims the devices of an import job
+
+    :param cache: (WarmCache) Warm caches of the server
+    :param session: (DnacSession) Session of the job
+    :param rows: (list) Catalog rows
+    :return: (dict) Job result
+    """
+
+    headers = cache.headers()
+    serials = [row.serial_number for row in rows]
+    device_map = cache.devices(serial_numbers=serials)
+    rejected = {}
+    failed = []
+    try:
+        for row in rows:
+            serial_number = row.serial_number
+            site = cache.site(site_name=row.site_name)
+            binder = cache.binder(template_name=row.template_name)
+            if site is None:
+                rejected[serial_number] = f"Site [{row.site_name}] is not valid"
+                continue
+            if not binder:
+                rejected[serial_number] = (
+                    f"Template [{row.template_name}] is not present or has no "
+                    f"parameters"
+                )
+                continue
+            image_name = row.get(image_column)
+            if image_name:
+                row.image_id = cache.image_id(image_name=image_name)
+                if not row.image_id:
+                    rejected[serial_number] = f"Image [{image_name}] is not present"
+                    continue
+            row.site_id = site.id
+            errors = binder.bind(row=row)
+            if errors:
+                rejected[serial_number] = "; ".join(errors)
+                continue
+            skipped = len(session.skipped)
+            try:
+                reason = acclaim_device(
+                    api_headers=headers, data=row, device_map=device_map
+                )
+            except SystemExit:
+                reason = "Device import aborted"
+            # Devices in a state that can not be claimed are already skipped
+            if reason is not None and len(session.skipped) == skipped:
+                logging.debug("[x] [%s] %s", serial_number, reason)
+                failed.append(serial_number)
+    finally:
+        cache.forget(serial_numbers=serials)
+    return {
+        "devices": len(rows),
+        "rejected": rejected,
+        "skipped": list(session.skipped),
+        "failed": failed,
+    }
+
+
+# Delete job
+def _delete_job(cache=None, session=None, serials=None):
+    """
+    This private function deletes the devices of a delete job
+
+    :param cache: (WarmCache) Warm caches of the server
+    :param session: (DnacSession) Session of the job
+    :param serials: (list) Serial numbers
+    :return: (dict) Job result
+    """
+
+    headers = cache.headers()
+    device_map = cache.devices(serial_numbers=serials)
+    inventory_map = resolve_inventory_serials(
+        api_headers=headers,
+        serial_numbers=[
+            serial
+            for serial, (_, device_state, _) in device_map.items()
+            if device_state in inventory_device_states
+        ],
+    )
+    deleted = []
+    failed = []
+    try:
+        for serial in serials:
+            api_response = delete_device(
+                api_headers=headers,
+                device_serial=serial,
+                device_map=device_map,
+                inventory_map=inventory_map,
+            )
+            if not api_response:
+                session.skip(serial)
+                continue
+            response_status, _ = get_response(response=api_response)
+            if response_status:
+                deleted.append(serial)
+            else:
+                failed.append(serial)
+    finally:
+        cache.forget(serial_numbers=serials)
+    return {"deleted": deleted, "skipped": list(session.skipped), "failed": failed}
+
+
+# Show job
+def _show_job(cache=None, session=None, query=None):
+    """
+    This private function lists PnP devices
+
+    :param cache: (WarmCache) Warm caches of the server
+    :param session: (DnacSession) Session of the job
+    :param query: (tuple) PnP filters, limit and offset
+    :return: (dict) Job result
+    """
+
+    pnp_filters, limit, offset = query
+    devices = iter_pnp_devices(
+        api_headers=cache.headers(),
+        offset=offset,
+        limit=limit,
+        pnp_filters=pnp_filters,
+    )
+    return {"devices": [dict(device.as_dict(), id=device.id) for device in devices]}
+
+
+# Job type and handler
+job_handlers = {"import": _import_job, "delete": _delete_job, "show": _show_job}
+
+
+# Job record
+class Job(object):
+    """Single job submitted to the server"""
+
+    __slots__ = (
+        "id",
+        "job_type",
+        "state",
+        "result",
+        "error",
+        "created",
+        "started",
+        "finished",
+        "done",
+    )
+
+    def __init__(self, job_type=None):
+        """
+        Constructor method for job
+
+        :param job_type: (str) import, delete or show
+        """
+
+        self.id = os.urandom(8).hex()
+        self.job_type = job_type
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def as_dict(self):
+        """Returns the job as python dictionary"""
+
+        return {
+            "id": self.id,
+            "type": self.job_type,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+# Job queue
+class JobQueue(object):
+    """Queues jobs and runs them concurrently, each job with its own session"""
+
+    def __init__(self, session=None, workers=serve_workers):
+        """
+        Constructor method for job queue
+
+        :param session: (DnacSession) Session with the server configurations
+        :param workers: (int) Jobs running at the same time
+        """
+
+        self.session = session
+        self.cache = WarmCache(configs=session.dnac_configs)
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def warm_up(self):
+        """Generates the token and loads site index and PnP snapshot"""
+
+        with self.session:
+            self.cache.site()
+            self.cache.devices(serial_numbers=[])
+
+    def submit(self, job_type=None, payload=None):
+        """
+        Checks and queues one job
+
+        :param job_type: (str) import, delete or show
+        :param payload: (dict) Job request body
+        :return: (Job) Queued job
+        """
+
+        arguments = _prepare_job(job_type=job_type, payload=payload)
+        job = Job(job_type=job_type)
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [
+                job_id
+                for job_id, queued_job in self.jobs.items()
+                if queued_job.done.is_set()
+            ]
+            for job_id in finished[: max(len(finished) - serve_job_history, 0)]:
+                del self.jobs[job_id]
+        self._executor.submit(self._run, job, arguments)
+        return job
+
+    def _run(self, job=None, arguments=None):
+        job_session = DnacSession(
+            configs=self.session.configs, client=self.session.client
+        )
+        job.state = "running"
+        job.started = time.time()
+        try:
+            job.result = job_session.run(
+                job_handlers[job.job_type], self.cache, job_session, arguments
+            )
+            job.state = "done"
+        except SystemExit:
+            job.state = "failed"
+            job.error = "Job aborted, see server output"
+        except Exception as err:
+            logging.debug("Job [%s] failed", job.id, exc_info=True)
+            job.state = "failed"
+            job.error = str(err)
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+    def get(self, job_id=None):
+        """Returns a job by ID, None if it is not known"""
+
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def counts(self):
+        """Returns the number of jobs per state"""
+
+        with self._lock:
+            return dict(Counter(job.state for job in self.jobs.values()))
+
+    def shutdown(self):
+        """Waits for running jobs, queued jobs are dropped"""
+
+        self._executor.shutdown(wait=True)
+
+
+# HTTP request handler
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of the job server"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "dnac_pnp"
+
+    def _reply(self, status=200, body=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        job_queue = self.server.job_queue
+        path = urlsplit(self.path).path.rstrip("/")
+        if path == "/health":
+            self._reply(
+                body={
+                    "status": "ok",
+                    "host": job_queue.session.host,
+                    "jobs": job_queue.counts(),
+                }
+            )
+        elif path == "/jobs":
+            self._reply(body={"jobs": job_queue.counts()})
+        elif path.startswith("/jobs/"):
+            job = job_queue.get(job_id=path[len("/jobs/") :])
+            if job is None:
+                self._reply(404, {"error": "Job not found"})
+            else:
+                self._reply(body=job.as_dict())
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._reply(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Job request must be a JSON object")
+            job = self.server.job_queue.submit(
+                job_type=payload.get("type"), payload=payload
+            )
+        except ValueError as err:
+            self._reply(400, {"error": str(err)})
+            return
+        if "wait" in parse_qs(url.query, keep_blank_values=True):
+            job.done.wait()
+            self._reply(200, job.as_dict())
+        else:
+            self._reply(202, job.as_dict())
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return "unix"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+# Serve jobs
+def serve(session=None, bind="127.0.0.1", port=8765, socket_path=None, workers=None):
+    """
+    This function runs the job server until it is interrupted
+
+    :param session: (DnacSession) Session with the server configurations
+    :param bind: (str) Address of the HTTP server
+    :param port: (int) Port of the HTTP server
+    :param socket_path: (str) Unix socket path, used instead of HTTP address/port
+    :param workers: (int) Jobs running at the same time
+    :return: (stdout) On screen output
+    """
+
+    workers = workers or serve_workers
+    job_queue = JobQueue(session=session, workers=workers)
+    divider("Warm-up")
+    click.secho(f"[$] Loading site index and PnP snapshot.....", fg="blue")
+    job_queue.warm_up()
+    if socket_path:
+        if os.path.exists(socket_path):
+            if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                click.secho(
+                    f"[x] [{socket_path}] exists and is not a socket!", fg="red"
+                )
+                return
+            os.unlink(socket_path)
+        server = _ThreadingUnixServer(socket_path, _JobRequestHandler)
+        address = f"unix:{socket_path}"
+    else:
+        server = _ThreadingHTTPServer((bind, port), _JobRequestHandler)
+        address = f"http://{bind}:{server.server_address[1]}"
+    server.job_queue = job_queue
+    divider("Serving")
+    click.secho(
+        f"[#] Accepting jobs on [{address}] with [{workers}] workers", fg="green"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.secho(f"[!] Shutting down.....", fg="yellow")
+    finally:
+        server.server_close()
+        job_queue.shutdown()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
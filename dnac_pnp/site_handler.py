@@ -4,6 +4,8 @@
 """Site handler functions"""
 
 # Import builtin python libraries
+from concurrent.futures import as_completed
+from itertools import groupby
 import json
 import logging
 import sys
@@ -16,7 +18,14 @@ import yaml
 # Import custom (local) python packages
 from .api_call_handler import call_api_endpoint, get_response
 from .api_endpoint_handler import generate_api_url
-from .dnac_params import area_essentials, building_essentials, floor_essentials
+from .dnac_info_butler import get_site_index
+from .dnac_params import (
+    area_essentials,
+    building_essentials,
+    floor_essentials,
+    site_workers,
+)
+from .dnac_session import SessionExecutor
 from .dnac_token_generator import generate_token
 from .header_handler import get_headers
 from .utils import divider, goodbye
@@ -26,93 +35,216 @@ __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
 
-# Check dict keys
-def _check_dict_keys(dict_to_check=None, dnac_site_type=None):
+# Essential keys per site type
+site_essentials = {
+    "area": area_essentials,
+    "building": building_essentials,
+    "floor": floor_essentials,
+}
+# Site types a site of each type may be created under, None is the Global root
+parent_site_types = {
+    "area": ["area", None],
+    "building": ["area", None],
+    "floor": ["building"],
+}
+
+
+# Compiled site
+class SitePayload(object):
+    """Single site of the sites configuration, ready to be submitted"""
+
+    __slots__ = ("name", "site_type", "parent", "payload")
+
+    def __init__(self, name=None, site_type=None, parent=None, payload=None):
+        """
+        Constructor method for compiled site
+
+        :param name: (str) Site name with full hierarchy e.g. Global/DE/MUC
+        :param site_type: (str) Cisco DNA center site type (area, building, floor)
+        :param parent: (str) Parent site name with full hierarchy
+        :param payload: (dict) Payload of the add-site API call
+        """
+
+        self.name = name
+        self.site_type = site_type
+        self.parent = parent
+        self.payload = payload
+
+    @property
+    def depth(self):
+        """Hierarchy level of the site, parents have a lower level"""
+
+        return self.name.count("/")
+
+
+# Compile single site
+def _compile_site(item=None):
     """
-    This private function checks dict keys
+    This private function checks one site configuration and generates its payload
 
-    :param dict_to_check: (dict) Dictionary that is being checked
-    :param dnac_site_type: (str) Cisco DNA center site type (area, building, floor)
-    :returns: (dict) Checked and modified dictionary
+    :param item: (dict) Single site config as python dict
+    :returns: (tuple) SitePayload or None, list of problems
     """
 
-    click.secho(f"[$] Checking config file keys.....", fg="blue")
-    dict_status = False
-    site_type_map = {
-        "area": area_essentials,
-        "building": building_essentials,
-        "floor": floor_essentials,
-    }
-    try:
-        for item in site_type_map[dnac_site_type]:
-            if item in dict_to_check.keys():
-                dict_status = True
-            else:
-                click.secho(
-                    f"[x] [{item}] key is missing for site type: [{dnac_site_type}]!",
-                    fg="red",
-                )
-                sys.exit(1)
-    except KeyError:
-        click.secho(f"[x] Essential key is missing from site configuration!", fg="red")
-        sys.exit(1)
-    return dict_status
+    if not isinstance(item, dict) or len(item) != 1:
+        return None, [f"Site entry [{item}] must be a single named site"]
+    site_key, site_config = list(item.items())[0]
+    if not isinstance(site_config, dict):
+        return None, [f"Site [{site_key}] has no configuration"]
+    site_type = site_config.get("type")
+    if site_type not in site_essentials:
+        return None, [f"Site [{site_key}] has an unknown type [{site_type}]"]
+    problems = [
+        f"Site [{site_key}] is missing the [{key}] key for site type [{site_type}]"
+        for key in site_essentials[site_type]
+        if key not in site_config
+    ]
+    if problems:
+        return None, problems
+
+    if site_type == "area":
+        site_values = {
+            "name": site_config["name"],
+            "parentName": site_config["parentName"],
+        }
+    else:
+        site_values = {
+            key: value
+            for key, value in site_config.items()
+            if not key.startswith("type")
+        }
+    parent = str(site_config["parentName"]).rstrip("/")
+    site = SitePayload(
+        name=f"{parent}/{site_config['name']}",
+        site_type=site_type,
+        parent=parent,
+        payload={"type": site_type, "site": {site_type: site_values}},
+    )
+    logging.debug("Site Name: %s, Site Type: %s", site.name, site_type)
+    return site, []
 
 
-# Generate site payload
-def _generate_site_payload(site=None):
+# Compile sites
+def compile_sites(sites=None, site_index=None):
     """
-    This private function generates site payload
+    This function checks all sites of the sites configuration before any is added
 
-    :param site: (dict) Single site config as python dict
-    :returns: (dict) payload for api call
+    Every site is checked for its essential keys, duplicate names, and a parent
+    of a suitable type in the sites configuration or in DNA center.
+
+    :param sites: (list) Sites of the sites configuration
+    :param site_index: (SiteIndex) Sites that already exist in DNA center
+    :returns: (tuple) SitePayload list in hierarchy order, existing site names,
+        list of problems
     """
 
-    site_name = list(site.keys())[0]
-    site_type = site[site_name]["type"]
-    logging.debug(f"Site Name: {site_name}, Site Type: {site_type}")
-    divider(text=f"Adding {site_type} [{site_name}]", char="-")
+    site_index = site_index or {}
+    problems = []
+    compiled = {}
+    existing = []
+    listed = set()
+    for item in sites:
+        site, site_problems = _compile_site(item=item)
+        problems.extend(site_problems)
+        if site is None:
+            continue
+        if site.name in listed:
+            problems.append(f"Site [{site.name}] is listed more than once")
+            continue
+        listed.add(site.name)
+        if site.name in site_index:
+            existing.append(site.name)
+        else:
+            compiled[site.name] = site
 
-    payload = {"type": site_type}
-    if site_type == "floor":
-        # If any keys are not present leave it blank
-        site_dict_status = _check_dict_keys(
-            dict_to_check=site[site_name], dnac_site_type=site_type
-        )
-        if site_dict_status:
-            payload["site"] = {
-                "floor": {
-                    key: value
-                    for key, value in site[site_name].items()
-                    if not key.startswith("type")
-                }
-            }
-    elif site_type == "building":
-        # If any keys are not present leave it blank
-        site_dict_status = _check_dict_keys(
-            dict_to_check=site[site_name], dnac_site_type=site_type
-        )
-        if site_dict_status:
-            payload["site"] = {
-                "building": {
-                    key: value
-                    for key, value in site[site_name].items()
-                    if not key.startswith("type")
-                }
-            }
-    elif site_type == "area":
-        # If any keys are not present leave it blank
-        site_dict_status = _check_dict_keys(
-            dict_to_check=site[site_name], dnac_site_type=site_type
+    for site in compiled.values():
+        if site.parent in compiled:
+            parent_type = compiled[site.parent].site_type
+        elif site.parent in site_index:
+            parent_type = site_index[site.parent].site_type
+        else:
+            problems.append(
+                f"Parent [{site.parent}] of site [{site.name}] does not exist"
+            )
+            continue
+        if parent_type not in parent_site_types[site.site_type]:
+            problems.append(
+                f"A {site.site_type} can not be added under the "
+                f"{parent_type} [{site.parent}]"
+            )
+    return sorted(compiled.values(), key=lambda site: site.depth), existing, problems
+
+
+# Submit single site
+def _submit_site(method=None, api_url=None, api_headers=None, site=None):
+    """
+    This private function adds one compiled site to DNA center
+
+    :param method: (str) API method
+    :param api_url: (str) API URL
+    :param api_headers: (dict) API headers
+    :param site: (SitePayload) Compiled site
+    :returns: (tuple) SitePayload, status, message
+    """
+
+    try:
+        api_response = call_api_endpoint(
+            method=method,
+            api_url=api_url,
+            data=site.payload,
+            api_headers=api_headers,
+            check_payload=False,
         )
-        if site_dict_status:
-            payload["site"] = {
-                "area": {
-                    "name": site[site_name]["name"],
-                    "parentName": site[site_name]["parentName"],
-                }
-            }
-    return payload
+        response_status, response_body = get_response(response=api_response)
+        # Response header is in plain/text so try to convert it into json
+        json_response_body = json.loads(response_body)
+        if response_status and json_response_body["status"]:
+            return site, True, json_response_body["result"]["result"]["progress"]
+        return site, False, json_response_body["result"]["result"]
+    except SystemExit:
+        return site, False, "API call failed"
+    except Exception as err:
+        return site, False, f"ERROR: {err}"
+
+
+# Submit sites
+def submit_sites(api_headers=None, sites=None, workers=None):
+    """
+    This function adds compiled sites to DNA center, level by level in parallel
+
+    Sites of one hierarchy level are independent of each other, a level is only
+    started when its parents exist. Sites below a failed site are skipped.
+
+    :param api_headers: (dict) API headers
+    :param sites: (list) SitePayload list in hierarchy order
+    :param workers: (int) Parallel site creations, defaults to site_workers
+    :returns: (list) Names of sites that were not added
+    """
+
+    method, api_url, parameters = generate_api_url(api_type="add-site")
+    failed = set()
+    with SessionExecutor(max_workers=workers or site_workers) as executor:
+        for _, level in groupby(sites, key=lambda site: site.depth):
+            futures = []
+            for site in level:
+                if site.parent in failed:
+                    click.secho(
+                        f"[!] Site [{site.name}] skipped, parent was not added",
+                        fg="yellow",
+                    )
+                    failed.add(site.name)
+                    continue
+                futures.append(
+                    executor.submit(_submit_site, method, api_url, api_headers, site)
+                )
+            for future in as_completed(futures):
+                site, status, site_msg = future.result()
+                if status:
+                    click.secho(f"[#] [{site.name}] {site_msg}", fg="green")
+                else:
+                    click.secho(f"[x] [{site.name}] {site_msg}", fg="red")
+                    failed.add(site.name)
+    return sorted(failed)
 
 
 # Read sites configuration
@@ -140,9 +272,10 @@ def add_site(dnac_auth_configs=None, locations_file_path=None):
     """
 
     # Read site configurations
-    logging.debug(f"Location File: {locations_file_path}")
+    logging.debug("Location File: %s", locations_file_path)
     site_configs = _read_site_configs(file_to_read=locations_file_path)
-    logging.debug(f"Site Configurations: {json.dumps(site_configs, indent=4)}")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Site Configurations: %s", json.dumps(site_configs, indent=4))
     if "sites" in site_configs.keys():
         sites = site_configs["sites"]
     else:
@@ -154,36 +287,28 @@ def add_site(dnac_auth_configs=None, locations_file_path=None):
     headers = get_headers(auth_token=token)
     headers["__runsync"] = "true"
     headers["__persistbapioutput"] = "true"
-    method, api_url, parameters = generate_api_url(api_type="add-site")
-    divider("Adding Site(s)")
-    click.secho(f"[$] Attempting to add sites.....", fg="blue")
-    for item in sites:
-        payload = _generate_site_payload(site=item)
-        api_response = call_api_endpoint(
-            method=method,
-            api_url=api_url,
-            data=payload,
-            api_headers=headers,
-            check_payload=False,
-        )
-        response_status, response_body = get_response(response=api_response)
-        # Response header is in plain/text so try to convert it into json
-        try:
-            json_response_body = json.loads(response_body)
-            if response_status:
-                site_status = json_response_body["status"]
-                if site_status:
-                    site_msg = json_response_body["result"]["result"]["progress"]
-                    prefix = "[#] "
-                    color = "green"
-                else:
-                    site_msg = json_response_body["result"]["result"]
-                    prefix = "[x] "
-                    color = "red"
-                click.secho(f"{prefix}{site_msg}", fg=color)
-            else:
-                click.secho(f"[x] {json_response_body['result']['result']}", fg="red")
-        except Exception as err:
-            click.secho(f"[x] ERROR: {err}")
-            sys.exit(1)
+    site_index = get_site_index(api_headers=headers)
+    if site_index is False:
+        click.secho(f"[x] Site hierarchy could not be read from DNA center!", fg="red")
+        sys.exit(1)
+
+    # Compile every site before any is added
+    divider("Site Compilation")
+    click.secho(f"[$] Checking [{len(sites)}] site(s).....", fg="blue")
+    new_sites, existing, problems = compile_sites(sites=sites, site_index=site_index)
+    for site_name in existing:
+        click.secho(f"[!] Site [{site_name}] already exists, skipped", fg="yellow")
+    if problems:
+        for problem in problems:
+            click.secho(f"[x] {problem}", fg="red")
+        click.secho(f"[x] No sites were added, please fix the configuration!", fg="red")
+        sys.exit(1)
+    click.secho(f"[#] [{len(new_sites)}] site(s) ready to be added", fg="green")
+
+    if new_sites:
+        divider("Adding Site(s)")
+        click.secho(f"[$] Attempting to add sites.....", fg="blue")
+        failed = submit_sites(api_headers=headers, sites=new_sites)
+        if failed:
+            click.secho(f"[x] [{len(failed)}] site(s) were not added", fg="red")
     goodbye()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Site hierarchy index built from one site group fetch"""
+
+# Import builtin python libraries
+from collections.abc import Mapping
+import logging
+
+# Import custom (local) python packages
+from .dnac_records import Site
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Site type from additional info
+def _site_type(group=None):
+    """
+    This private function finds the site type in the additional info of a group
+
+    :param group: (dict) Site group from DNA center
+    :return: (str) Site type (area, building, floor), None if not set
+    """
+
+    for item in group.get("additionalInfo") or []:
+        if item.get("nameSpace", "").casefold() == "location":
+            return (item.get("attributes") or {}).get("type")
+    return None
+
+
+# Parent of a site hierarchy
+def parent_name(site_name=None):
+    """
+    This function returns the parent hierarchy of a site hierarchy
+
+    :param site_name: (str) Site name with full hierarchy e.g. Global/DE/MUC
+    :return: (str) Parent site name with full hierarchy, None for the root
+    """
+
+    if "/" not in site_name:
+        return None
+    return site_name.rsplit("/", 1)[0]
+
+
+# Site index
+class SiteIndex(Mapping):
+    """
+    Site hierarchy of DNA center, keyed by site name with full hierarchy
+
+    Name, ID, type, parent and children lookups are dictionary lookups, prefix
+    queries walk only the sub-tree below the prefix. The index behaves like a
+    read only dictionary of site names and Site records.
+    """
+
+    __slots__ = ("_by_name", "_by_id", "_children")
+
+    def __init__(self, sites=None):
+        """
+        Constructor method for site index
+
+        :param sites: (iterable) Site records
+        """
+
+        self._by_name = {}
+        self._by_id = {}
+        self._children = {}
+        for site in sites or []:
+            self.add(site)
+
+    @classmethod
+    def from_groups(cls, groups=None):
+        """
+        Creates the index from the site groups of DNA center
+
+        :param groups: (list) Site groups as returned by the group API
+        :return: (SiteIndex) Site index
+        """
+
+        index = cls(
+            Site(
+                site_id=group.get("id"),
+                name=group.get("name"),
+                hierarchy=group["groupNameHierarchy"],
+                site_type=_site_type(group=group),
+                parent_id=group.get("parentId"),
+            )
+            for group in groups
+        )
+        logging.debug("Site index: %s sites", len(index))
+        return index
+
+    def __getitem__(self, site_name):
+        return self._by_name[site_name]
+
+    def __iter__(self):
+        return iter(self._by_name)
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __repr__(self):
+        return f"SiteIndex({len(self)} sites)"
+
+    def add(self, site=None):
+        """Adds or replaces one site, e.g. after it was created"""
+
+        if site.hierarchy in self._by_name:
+            old_site = self._by_name[site.hierarchy]
+            self._by_id.pop(old_site.id, None)
+        else:
+            parent = parent_name(site_name=site.hierarchy)
+            self._children.setdefault(parent, []).append(site.hierarchy)
+        self._by_name[site.hierarchy] = site
+        if site.id:
+            self._by_id[site.id] = site
+
+    def by_id(self, site_id=None):
+        """Returns the site with this ID, None if it is not known"""
+
+        return self._by_id.get(site_id)
+
+    def site_id(self, site_name=None):
+        """Returns the ID of a site, None if it is not known"""
+
+        site = self._by_name.get(site_name)
+        return site.id if site is not None else None
+
+    def site_type(self, site_name=None):
+        """Returns the type of a site, None if it is not known"""
+
+        site = self._by_name.get(site_name)
+        return site.site_type if site is not None else None
+
+    def parent(self, site_name=None):
+        """Returns the parent site of a site, None for the root or unknown parents"""
+
+        parent = parent_name(site_name=site_name)
+        return self._by_name.get(parent) if parent else None
+
+    def children(self, site_name=None):
+        """Returns the direct child sites of a site"""
+
+        return [self._by_name[name] for name in self._children.get(site_name, [])]
+
+    def under(self, site_name=None, site_type=None, include_self=False):
+        """
+        Yields all sites below a site, parents before their children
+
+        :param site_name: (str) Site name with full hierarchy e.g. Global/DE/MUC
+        :param site_type: (str) Only sites of this type (area, building, floor)
+        :param include_self: (boolean) Also yield the site itself
+        :return: (generator) Site records in hierarchy order
+        """
+
+        if site_name not in self._by_name:
+            return
+        stack = [site_name] if include_self else self._children_of(site_name)
+        while stack:
+            name = stack.pop()
+            site = self._by_name[name]
+            if site_type is None or site.site_type == site_type:
+                yield site
+            stack.extend(self._children_of(name))
+
+    def _children_of(self, site_name=None):
+        return sorted(self._children.get(site_name, []), reverse=True)
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Incremental catalog sync against DNA center PnP"""
+
+# Import builtin python libraries
+from collections import OrderedDict
+from concurrent.futures import as_completed
+import logging
+import sys
+
+# Import external python libraries
+import click
+
+# Import custom (local) python packages
+from .api_call_handler import get_response
+from .catalog_handler import show_validation_report, validate_catalog
+from .device_claim_handler import unclaim
+from .device_delete_handler import delete_device
+from .device_import_handler import acclaim_device, claim_device
+from .dnac_info_butler import iter_pnp_devices, resolve_inventory_serials
+from .dnac_params import image_column, inventory_device_states, sync_workers
+from .dnac_session import SessionExecutor
+from .dnac_token_generator import generate_token
+from .header_handler import get_headers
+from .utils import divider, echo_table, goodbye, stream_csv, track_progress
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Plan actions in display order, and whether they change DNA center
+plan_actions = OrderedDict(
+    [
+        ("add", True),
+        ("claim", True),
+        ("reclaim", True),
+        ("delete", True),
+        ("unchanged", False),
+        ("blocked", False),
+        ("unmanaged", False),
+        ("rejected", False),
+    ]
+)
+
+
+# Plan item
+class PlanItem(object):
+    """Single planned change of one serial number"""
+
+    __slots__ = ("action", "serial_number", "row", "device", "detail")
+
+    def __init__(
+        self, action=None, serial_number=None, row=None, device=None, detail=""
+    ):
+        """
+        Constructor method for plan item
+
+        :param action: (str) Plan action, see plan_actions
+        :param serial_number: (str) Device serial number
+        :param row: (CatalogRow) Catalog row, None for devices only in PnP
+        :param device: (PnpDevice) PnP device, None for devices only in the catalog
+        :param detail: (str) Reason of the action
+        """
+
+        self.action = action
+        self.serial_number = serial_number
+        self.row = row
+        self.device = device
+        self.detail = detail
+
+
+# Bind catalog row
+def _bind_row(row=None, references=None):
+    """
+    This private function sets site ID, image ID and day0 configuration of a row
+
+    :param row: (CatalogRow) Catalog row
+    :param references: (dict) Site snapshot, images and templates from
+                       validate_catalog
+    :return: (list) Image and template parameter problems, empty if the row is bound
+    """
+
+    row.site_id = references["sites"][row.site_name].id
+    image_name = row.get(image_column)
+    if image_name:
+        row.image_id = (references["images"] or {}).get(image_name)
+        if not row.image_id:
+            return [f"Image [{image_name}] is not available"]
+    return references["templates"][row.template_name].binder.bind(row=row)
+
+
+# Compare catalog row and PnP device
+def _diff_row(row=None, device=None):
+    """
+    This private function lists what differs between catalog and DNA center
+
+    Values DNA center does not report are not counted as a difference.
+
+    :param row: (CatalogRow) Bound catalog row
+    :param device: (PnpDevice) PnP device
+    :return: (list) Names of changed settings
+    """
+
+    changes = []
+    if device.site_id and device.site_id != row.site_id:
+        changes.append("site")
+    if device.config_id and device.config_id != row.config_id:
+        changes.append("template")
+    elif device.config_parameters is not None:
+        claimed_parameters = {
+            parameter.get("key"): parameter.get("value")
+            for parameter in device.config_parameters
+        }
+        catalog_parameters = {
+            parameter["key"]: parameter["value"] for parameter in row.config_parameters
+        }
+        if claimed_parameters != catalog_parameters:
+            changes.append("template parameters")
+    return changes
+
+
+# Build sync plan
+def build_sync_plan(
+    catalog_file=None, snapshot=None, references=None, rejected=None, prune=False
+):
+    """
+    This function compares the catalog with the PnP snapshot and plans the changes
+
+    :param catalog_file: (str) Full path of the device catalog
+    :param snapshot: (dict) Serial number and PnpDevice of all PnP devices
+    :param references: (dict) Site snapshot and templates from validate_catalog
+    :param rejected: (dict) Rejected serials with reasons
+    :param prune: (boolean) Delete PnP devices that are not in the catalog, refused
+                  if any catalog row can not be read
+    :return: (OrderedDict) Plan action and list of PlanItem
+    """
+
+    plan = OrderedDict((action, []) for action in plan_actions)
+    catalog_serials = set()
+    malformed = []
+    for row in stream_csv(
+        file_to_parse=catalog_file, report_errors=False, malformed=malformed
+    ):
+        serial_number = row.serial_number
+        catalog_serials.add(serial_number)
+        device = snapshot.get(serial_number)
+        errors = rejected.get(serial_number) or _bind_row(row, references)
+        if errors:
+            item = PlanItem("rejected", serial_number, row, device, "; ".join(errors))
+        elif device is None:
+            item = PlanItem("add", serial_number, row)
+        elif device.state == "Unclaimed":
+            item = PlanItem("claim", serial_number, row, device)
+        else:
+            changes = _diff_row(row=row, device=device)
+            if device.state == "Error":
+                item = PlanItem("reclaim", serial_number, row, device, "state Error")
+            elif not changes:
+                item = PlanItem("unchanged", serial_number, row, device)
+            elif device.state in inventory_device_states:
+                item = PlanItem("blocked", serial_number, row, device)
+                item.detail = f"{', '.join(changes)} changed, state {device.state}"
+            else:
+                item = PlanItem("reclaim", serial_number, row, device)
+                item.detail = f"{', '.join(changes)} changed"
+        plan[item.action].append(item)
+    if prune and malformed:
+        # The serial of a malformed row is unknown, its device must not be deleted
+        click.secho(
+            f"[x] [{len(malformed)}] catalog row(s) can not be read, PnP devices "
+            f"missing in the catalog are NOT deleted!",
+            fg="red",
+        )
+        prune = False
+    for serial_number, device in snapshot.items():
+        if serial_number not in catalog_serials:
+            action = "delete" if prune else "unmanaged"
+            plan[action].append(
+                PlanItem(action, serial_number, None, device, f"state {device.state}")
+            )
+    return plan
+
+
+# Show sync plan
+def show_sync_plan(plan=None):
+    """
+    This function prints the planned changes and a summary per action
+
+    :param plan: (OrderedDict) Plan action and list of PlanItem
+    :return: (stdout) On screen output
+    """
+
+    divider("Sync Plan")
+    echo_table(
+        rows=(
+            [item.action, item.serial_number, item.detail]
+            for action, items in plan.items()
+            if plan_actions[action] or action in ("blocked", "rejected")
+            for item in items
+        ),
+        headers=["Action", "Serial Number", "Detail"],
+    )
+    for action, items in plan.items():
+        click.secho(f"[*] {action.capitalize()}: {len(items)}", fg="cyan")
+    if plan["unmanaged"]:
+        click.secho(
+            f"[!] PnP devices missing in the catalog are kept, use --prune to delete",
+            fg="yellow",
+        )
+
+
+# Apply one plan item
+def _apply_item(api_headers=None, item=None, inventory_map=None):
+    """
+    This private function applies one planned change
+
+    :param api_headers: (dict) API headers
+    :param item: (PlanItem) Planned change
+    :param inventory_map: (dict) Serials already resolved by resolve_inventory_serials
+    :return: (str, boolean) Serial number and True if the change was applied
+    """
+
+    try:
+        if item.action == "add":
+            reason = acclaim_device(
+                api_headers=api_headers, data=item.row, device_map={}
+            )
+            return item.serial_number, reason is None
+        if item.action == "claim":
+            item.row.device_id = item.device.id
+            status = claim_device(dnac_api_headers=api_headers, payload_data=item.row)
+            return item.serial_number, bool(status)
+        if item.action == "reclaim":
+            item.row.device_id = item.device.id
+            if not unclaim(headers=api_headers, device_id=item.device.id):
+                return item.serial_number, False
+            status = claim_device(dnac_api_headers=api_headers, payload_data=item.row)
+            return item.serial_number, bool(status)
+        if item.action == "delete":
+            device_map = {item.serial_number: (item.device.id, item.device.state, {})}
+            api_response = delete_device(
+                api_headers=api_headers,
+                device_serial=item.serial_number,
+                device_map=device_map,
+                inventory_map=inventory_map,
+            )
+            if not api_response:
+                return item.serial_number, False
+            response_status, _ = get_response(response=api_response)
+            return item.serial_number, response_status
+    except SystemExit:
+        # Single device failures end the program in the import engine
+        logging.debug("[x] [%s] %s failed", item.serial_number, item.action)
+    return item.serial_number, False
+
+
+# Apply sync plan
+def apply_sync_plan(api_headers=None, plan=None, workers=None):
+    """
+    This function applies all planned changes in parallel
+
+    :param api_headers: (dict) API headers
+    :param plan: (OrderedDict) Plan action and list of PlanItem
+    :param workers: (int) Parallel device changes, defaults to sync_workers
+    :return: (list) Serial numbers that could not be changed
+    """
+
+    items = [
+        item for action, items in plan.items() if plan_actions[action] for item in items
+    ]
+    if not items:
+        click.secho(f"[#] DNA center is in sync with the catalog!", fg="green")
+        return []
+    inventory_map = resolve_inventory_serials(
+        api_headers=api_headers,
+        serial_numbers=[
+            item.serial_number
+            for item in plan["delete"]
+            if item.device.state in inventory_device_states
+        ],
+    )
+    divider("Applying Sync Plan")
+    failed = []
+    with SessionExecutor(max_workers=workers or sync_workers) as executor:
+        futures = [
+            executor.submit(_apply_item, api_headers, item, inventory_map)
+            for item in items
+        ]
+        for future in track_progress(
+            as_completed(futures),
+            operation="sync",
+            total=len(futures),
+            unit="device",
+            desc="[*] Sync progress",
+        ):
+            serial_number, status = future.result()
+            if not status:
+                failed.append(serial_number)
+    return failed
+
+
+# Sync catalog
+def sync_catalog(
+    configs=None, catalog_file=None, plan_only=False, prune=False, workers=None
+):
+    """
+    This function brings DNA center PnP in line with the device catalog
+
+    :param configs: (dict) DNA center configurations
+    :param catalog_file: (str) Full path of the device catalog
+    :param plan_only: (boolean) Only print the plan, do not apply it
+    :param prune: (boolean) Delete PnP devices that are not in the catalog
+    :param workers: (int) Parallel device changes, defaults to sync_workers
+    :return: (list) Serial numbers that could not be changed
+    """
+
+    token = generate_token(configs=configs)
+    headers = get_headers(auth_token=token)
+    divider("Catalog Validation")
+    references = {}
+    rejected, total_rows = validate_catalog(
+        api_headers=headers,
+        import_file=catalog_file,
+        check_states=False,
+        references=references,
+    )
+    show_validation_report(rejected=rejected, total_rows=total_rows)
+    if not references["sites"]:
+        click.secho(f"[x] Can't sync without the site list!", fg="red")
+        sys.exit(1)
+    click.secho(f"[$] Taking PnP snapshot.....", fg="blue")
+    snapshot = {
+        device.serial_number: device for device in iter_pnp_devices(api_headers=headers)
+    }
+    logging.debug("PnP snapshot: %s devices", len(snapshot))
+    plan = build_sync_plan(
+        catalog_file=catalog_file,
+        snapshot=snapshot,
+        references=references,
+        rejected=rejected,
+        prune=prune,
+    )
+    show_sync_plan(plan=plan)
+    if plan_only:
+        goodbye()
+        return []
+    failed = apply_sync_plan(api_headers=headers, plan=plan, workers=workers)
+    goodbye(before=True, data=failed)
+    return failed
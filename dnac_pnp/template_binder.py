@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Day0 template parameter binding for catalog rows"""
+
+# Import builtin python libraries
+import ipaddress
+import re
+import threading
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# MAC address in colon, dash or dot notation
+mac_address_pattern = re.compile(
+    r"^([0-9A-Fa-f]{2}[:-]){5}[0-9A-Fa-f]{2}$|^([0-9A-Fa-f]{4}\.){2}[0-9A-Fa-f]{4}$"
+)
+
+
+# Integer check
+def _is_integer(value=None):
+    """This private function checks if a catalog value is an integer"""
+
+    return value.lstrip("+-").isdigit()
+
+
+# IP address check
+def _is_ip_address(value=None):
+    """This private function checks if a catalog value is an IPv4/IPv6 address"""
+
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+# MAC address check
+def _is_mac_address(value=None):
+    """This private function checks if a catalog value is a MAC address"""
+
+    return mac_address_pattern.match(value) is not None
+
+
+# DNA center template data type and value check, other types are not checked
+type_checks = {
+    "INTEGER": _is_integer,
+    "IPADDRESS": _is_ip_address,
+    "MACADDRESS": _is_mac_address,
+}
+# Compiled parameter plans a binder keeps, one per catalog column mapping
+binder_plan_cache_size = 64
+
+
+# Template binder
+class TemplateBinder(object):
+    """
+    Binds catalog rows to the parameters of one day0 template
+
+    The template schema is compiled against the catalog columns once, binding a
+    row is a single pass over the prepared parameter list. A binder can be
+    shared by threads, every column mapping gets its own cached plan.
+    """
+
+    __slots__ = ("config_id", "schema", "_plans", "_lock")
+
+    def __init__(self, config_id=None, schema=None):
+        """
+        Constructor method for template binder
+
+        :param config_id: (str) Template id/config ID (templateId==configId)
+        :param schema: (list) (name, data type, required) per template parameter
+        """
+
+        self.config_id = config_id
+        self.schema = schema
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    @property
+    def parameters(self):
+        return [name for name, _, _ in self.schema]
+
+    def _compile(self, columns=None):
+        """
+        Resolves the column position and value check of every parameter
+
+        :param columns: (dict) Shared column name and position mapping of the catalog
+        :return: (tuple) Parameter plan of the column mapping
+        """
+
+        return tuple(
+            (name, columns.get(name), required, type_checks.get(data_type), data_type)
+            for name, data_type, required in self.schema
+        )
+
+    def _plan_for(self, columns=None):
+        """
+        Returns the cached parameter plan of a column mapping, compiled on first use
+
+        :param columns: (dict) Shared column name and position mapping of the catalog
+        :return: (tuple) Parameter plan of the column mapping
+        """
+
+        # The mapping is kept with its plan, so its id can not be reused meanwhile
+        cached = self._plans.get(id(columns))
+        if cached is not None and cached[0] is columns:
+            return cached[1]
+        plan = self._compile(columns=columns)
+        with self._lock:
+            if len(self._plans) >= binder_plan_cache_size:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[id(columns)] = (columns, plan)
+        return plan
+
+    def bind(self, row=None):
+        """
+        Sets config ID and parameters of a catalog row
+
+        :param row: (CatalogRow) Catalog row
+        :return: (list) Problems found, empty if the row fits the template
+        """
+
+        plan = self._plan_for(columns=row.columns)
+        values = row.values
+        config_parameters = []
+        errors = []
+        for name, index, required, type_check, data_type in plan:
+            if index is None:
+                errors.append(f"Parameter [{name}] missing in catalog")
+                continue
+            value = values[index]
+            if not value:
+                if required:
+                    errors.append(f"Parameter [{name}] is required")
+            elif type_check is not None and not type_check(value):
+                errors.append(f"Parameter [{name}] is not {data_type}: [{value}]")
+            config_parameters.append({"key": name, "value": value})
+        row.config_id = self.config_id
+        row.config_parameters = config_parameters
+        return errors
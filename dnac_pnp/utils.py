@@ -5,7 +5,7 @@
 
 # Import builtin python libraries
 import csv
-import collections
+from itertools import chain, islice
 import json
 import logging
 import os
@@ -24,7 +24,15 @@ from . import __version__ as version
 from . import __author__ as author
 from . import __author_email as author_email
 from . import __copyright__ as copy_right
-from .dnac_params import accepted_csv_headers, max_col_length
+from .dnac_metrics import api_metrics
+from .dnac_params import (
+    accepted_csv_headers,
+    max_cell_length,
+    max_col_length,
+    pnp_filter_keys,
+    table_sample_size,
+)
+from .dnac_records import CatalogRow
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
@@ -209,6 +217,37 @@ def validate_delete_input(ctx, param, value):
         return value
 
 
+# Validate PnP filter input
+def validate_pnp_filter(ctx, param, value):
+    """
+    This function parses PnP filters like state=Unclaimed,site=Global/DE
+
+    Repeated names or values separated by | are combined, e.g.
+    state=Unclaimed|Error is the same as state=Unclaimed,state=Error
+
+    :return: (dict) API query parameter and list of values
+    """
+
+    if value is None:
+        return None
+    pnp_filters = {}
+    for item in value.split(","):
+        name, separator, filter_values = item.partition("=")
+        name = name.strip()
+        if not separator or name not in pnp_filter_keys:
+            click.secho(f"[x] Filter [{item}] is not supported!", fg="red")
+            click.secho(
+                f"[*] Use name=value pairs, names: {', '.join(pnp_filter_keys)}",
+                fg="cyan",
+            )
+            ctx.abort()
+        query_values = pnp_filters.setdefault(pnp_filter_keys[name], [])
+        for filter_value in filter_values.split("|"):
+            if filter_value.strip() and filter_value.strip() not in query_values:
+                query_values.append(filter_value.strip())
+    return pnp_filters
+
+
 # Divider function
 def divider(text="", char="="):
     """
@@ -267,10 +306,10 @@ def check_csv_cell_name(cell_name=None):
     product_id = re.match("^[pP]roduct.*$", cell_name)
     device_name = re.match("^[dD]evice.*$", cell_name)
     if product_id:
-        logging.debug(f"Product ID header [{cell_name}] in CSV, converting.....")
+        logging.debug("Product ID header [%s] in CSV, converting.....", cell_name)
         valid_cell_name = "pid"
     elif device_name:
-        logging.debug(f"Device name header [{cell_name}] in CSV, converting.....")
+        logging.debug("Device name header [%s] in CSV, converting.....", cell_name)
         valid_cell_name = "hostname"
     else:
         valid_cell_name = do_camel_case(cell_name)
@@ -296,9 +335,9 @@ def check_csv_header(file_headers=None):
         else:
             valid_cell_name = check_csv_cell_name(cell_name=cell)
             ret_headers.append(valid_cell_name)
-    logging.debug(f"camelCased headers: {ret_headers}")
-    logging.debug(f"Type of input headers: {type(file_headers)}")
-    logging.debug(f"Type of converted headers: {type(ret_headers)}")
+    logging.debug("camelCased headers: %s", ret_headers)
+    logging.debug("Type of input headers: %s", type(file_headers))
+    logging.debug("Type of converted headers: %s", type(ret_headers))
     if all(item in ret_headers for item in accepted_csv_headers):
         return ret_headers
     else:
@@ -322,42 +361,83 @@ def check_csv_header(file_headers=None):
         sys.exit(1)
 
 
-# Parse CSV input
-def parse_csv(file_to_parse=None):
+# Read CSV header
+def read_csv_header(file_to_parse=None):
     """
-    This function parses CSV for device import
+    This function reads and checks the header line of a CSV file
 
     :param file_to_parse: (str) Full path of CSV file
-    :returns: (list) of dictionaries with each row as an item
+    :returns: (list) Checked column names, empty if the file is empty
+    """
+
+    with open(file_to_parse, newline="") as csv_import_file:
+        try:
+            r_title = [item.strip() for item in next(csv.reader(csv_import_file))]
+        except StopIteration:
+            return []
+    return check_csv_header(file_headers=r_title)
+
+
+# Stream CSV input
+def stream_csv(file_to_parse=None, report_errors=True, malformed=None):
     """
+    This function streams CSV rows for device import
 
-    logging.debug(f"Reading csv from [{file_to_parse}]")
-    csv_rows = []
-    with open(file_to_parse) as csv_import_file:
-        reader = csv.DictReader(csv_import_file)
-        r_title = [item.strip() for item in reader.fieldnames]
-        logging.debug(f"CSV file headers: {r_title}")
+    The header mapping is worked out once from the first line, every following
+    row is yielded as soon as it is read. Rows that do not match the header
+    are reported with their line number and skipped.
+
+    :param file_to_parse: (str) Full path of CSV file
+    :param report_errors: (boolean) Whether to report malformed rows on screen
+    :param malformed: (list) If provided, filled with the line number and reason
+                      of every malformed row
+    :returns: (generator) of CatalogRow records with each row as an item
+    """
+
+    logging.debug("Reading csv from [%s]", file_to_parse)
+    with open(file_to_parse, newline="") as csv_import_file:
+        reader = csv.reader(csv_import_file)
+        try:
+            r_title = [item.strip() for item in next(reader)]
+        except StopIteration:
+            return
+        logging.debug("CSV file headers: %s", r_title)
         title = check_csv_header(file_headers=r_title)
+        columns = {column: index for index, column in enumerate(title)}
+        column_count = len(title)
         for r_row in reader:
-            logging.debug(f"Raw input row from file: {r_row}")
-            try:
-                l_row = []
-                template_flag = False
-                for key, value in r_row.items():
-                    if "template" in key.strip():
-                        template_flag = True
-                    if template_flag:
-                        l_row.append((key.strip(), value.strip()))
-                    else:
-                        l_row.append((check_csv_cell_name(key.strip()), value.strip()))
-                row = collections.OrderedDict(l_row)
-            except AttributeError or KeyError:
-                logging.debug(f"AttributeError: An attribute error has occurred!")
-                logging.debug(f"Skipping row: {r_row}")
+            if not r_row:
                 continue
-            logging.debug(f"Stripped row: {row}")
-            csv_rows.extend([{title[i]: row[title[i]] for i in range(len(title))}])
-    return csv_rows
+            if len(r_row) != column_count:
+                reason = f"expected [{column_count}] columns but found [{len(r_row)}]"
+                if malformed is not None:
+                    malformed.append((reader.line_num, reason))
+                if report_errors:
+                    click.secho(
+                        f"[!] Warning: Skipping malformed row at line "
+                        f"[{reader.line_num}], {reason}",
+                        fg="yellow",
+                    )
+                continue
+            row = CatalogRow(
+                columns=columns,
+                values=tuple([value.strip() for value in r_row]),
+                line_number=reader.line_num,
+            )
+            logging.debug("Stripped row: %s", row)
+            yield row
+
+
+# Parse CSV input
+def parse_csv(file_to_parse=None):
+    """
+    This function parses CSV for device import
+
+    :param file_to_parse: (str) Full path of CSV file
+    :returns: (list) of CatalogRow records with each row as an item
+    """
+
+    return list(stream_csv(file_to_parse=file_to_parse))
 
 
 # Parse txt file to delete serials
@@ -377,6 +457,142 @@ def parse_txt(serials_file_path=None):
     return serials_to_delete
 
 
+# Progress tracking
+def track_progress(iterable=None, operation=None, total=None, **kwargs):
+    """
+    This function shows a progress bar and feeds the same count into the run metrics
+
+    :param iterable: (iterable) Devices to process
+    :param operation: (str) Pipeline stage name e.g. import, delete
+    :param total: (int) Total number of devices, if known
+    :param kwargs: (kwargs) Extra progress bar arguments e.g. desc, unit
+    :returns: (generator) Devices, one at a time
+    """
+
+    from tqdm import tqdm
+
+    if total is None:
+        try:
+            total = len(iterable)
+        except TypeError:
+            total = None
+    remaining = total
+    if total is not None:
+        api_metrics.set_queue_depth(stage=operation, depth=total)
+    for item in tqdm(iterable, total=total, ascii=True, ncols=max_col_length, **kwargs):
+        yield item
+        if remaining is not None:
+            remaining = max(remaining - 1, 0)
+        api_metrics.device_processed(operation=operation, remaining=remaining)
+
+
+# API call summary
+def show_api_summary():
+    """
+    This function prints the API call summary and writes it as JSON if requested
+
+    :return: (stdout) On screen output
+    """
+
+    from tabulate import tabulate
+
+    divider("API Call Summary")
+    table_headers, table_rows = api_metrics.summary_rows()
+    print(
+        tabulate(
+            table_rows, headers=table_headers, tablefmt="psql", disable_numparse=True
+        )
+    )
+    click.secho(f"[*] Wall time: {api_metrics.wall_time():.2f}s", fg="cyan")
+    if api_metrics.export_path:
+        try:
+            export_path = api_metrics.export_json()
+            click.secho(f"[#] API call metrics exported to [{export_path}]", fg="green")
+        except IOError as err:
+            click.secho(f"[x] API call metrics export failed! ERROR: {err}", fg="red")
+
+
+# Fit table cell
+def _fit_cell(value=None, width=0):
+    """
+    This private function pads or cuts a table cell to the column width
+
+    :param value: (object) Cell value
+    :param width: (int) Column width
+    :return: (str) Cell text with exactly the column width
+    """
+
+    text = "" if value is None else str(value)
+    if len(text) > width:
+        text = text[: max(width - 2, 0)] + ".."
+    return text.ljust(width)
+
+
+# Table lines
+def _table_lines(rows=None, headers=None, widths=None):
+    """
+    This private function yields the lines of a psql style table row by row
+
+    :param rows: (iterable) Table rows, consumed lazily
+    :param headers: (list) Table headers
+    :param widths: (list) Column widths, None columns are sampled from the first rows
+    :return: (generator) Table lines
+    """
+
+    rows = iter(rows)
+    if widths is None:
+        widths = [None] * len(headers)
+    sample = []
+    if None in widths:
+        sample = list(islice(rows, table_sample_size))
+        sampled_widths = [len(header) for header in headers]
+        for row in sample:
+            for index, value in enumerate(row):
+                sampled_widths[index] = max(sampled_widths[index], len(str(value)))
+        widths = [
+            min(sampled, max_cell_length) if width is None else width
+            for width, sampled in zip(widths, sampled_widths)
+        ]
+
+    def line(cells):
+        return (
+            "| "
+            + " | ".join(_fit_cell(cell, width) for cell, width in zip(cells, widths))
+            + " |"
+        )
+
+    border = "+" + "+".join("-" * (width + 2) for width in widths) + "+"
+    yield border
+    yield line(headers)
+    yield "|" + "+".join("-" * (width + 2) for width in widths) + "|"
+    for row in chain(sample, rows):
+        yield line(row)
+    yield border
+
+
+# Streaming table
+def echo_table(rows=None, headers=None, widths=None, pager=False):
+    """
+    This function prints a table while the rows are still being retrieved
+
+    Column widths are fixed or sampled from the first rows, so the first screen
+    is printed right away and no row has to be kept in memory.
+
+    :param rows: (iterable) Table rows, e.g. a generator
+    :param headers: (list) Table headers
+    :param widths: (list) Column widths, None columns are sampled from the first rows
+    :param pager: (boolean) Show the table in the system pager
+    :return: (stdout) On screen output
+    """
+
+    lines = _table_lines(rows=rows, headers=headers, widths=widths)
+    if pager:
+        click.echo_via_pager(f"{line}\n" for line in lines)
+    else:
+        for line in lines:
+            click.echo(line)
+
+
 # Goodbye
 def goodbye(before=False, data=None):
     """
@@ -393,6 +609,6 @@ def goodbye(before=False, data=None):
             click.secho(f"[*] Total serial skipped: {len(data)}", fg="cyan")
             click.secho(f"[*] Skipped Serials: ", fg="cyan", nl=False)
             click.secho(f"{data}", fg="yellow")
-        divider("Goodbye!")
-    else:
-        divider("Goodbye!")
+    if api_metrics.has_calls():
+        show_api_summary()
+    divider("Goodbye!")
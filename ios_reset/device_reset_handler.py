@@ -9,10 +9,12 @@ import json
 import logging
 import os
 import sys
+import warnings
 
 # Import external python libraries
 import click
 from netmiko import ConnectHandler
+from urllib3.exceptions import DependencyWarning, InsecureRequestWarning
 
 # Import custom (local) python packages
 from .config_handler import load_config
@@ -22,6 +24,10 @@ from .ios_utils import divider, goodbye
 __author__ = "Dalwar Hossain"
 __email__ = "dalwar.hossain@global.ntt"
 
+# urllib3's DependencyWarnings, InsecureRequestWarning should be silenced.
+warnings.simplefilter("ignore", DependencyWarning)
+warnings.simplefilter("ignore", InsecureRequestWarning)
+
 
 def _file_parser(file_path=None):
     """
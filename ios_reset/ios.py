@@ -17,7 +17,6 @@ from .ios_utils import (
     validate_file_extension,
     show_info,
 )
-from .device_reset_handler import device_reset
 
 # Source code meta data
 __author__ = "Dalwar Hossain"
@@ -64,11 +63,33 @@ pass_context = click.make_pass_decorator(Context, ensure=True)
     help="Turns on DEBUG mode.",
     type=str,
 )
+@click.option(
+    "--profile",
+    "profile_file",
+    help="Profiles the sub-command and writes the profile to this file.",
+    type=click.Path(exists=False, dir_okay=False),
+)
+@click.option(
+    "--profile-format",
+    "profile_format",
+    help="Profile output, pstats (cProfile) or collapsed (sampled flamegraph stacks).",
+    type=click.Choice(["pstats", "collapsed"]),
+    default="pstats",
+    show_default=True,
+)
 @click.version_option()
 @pass_context
-def mission_control(context, debug):
+def mission_control(context, debug, profile_file, profile_format):
     """Mission control module"""
 
+    if profile_file:
+        from dnac_pnp.profiler import RunProfiler
+
+        profiler = RunProfiler(
+            file_path=profile_file, output_format=profile_format
+        ).start()
+        click.get_current_context().call_on_close(profiler.stop)
+
     context.debug = debug
     context.initial_msg = True
     context.dry_run = True
@@ -106,6 +127,8 @@ def mission_control(context, debug):
 def reset(context, config_file, reset_file, sub_debug):
     """Add and claim single or multiple devices"""
 
+    from .device_reset_handler import device_reset
+
     if context.initial_msg:
         initial_message()
     if context.debug or sub_debug:
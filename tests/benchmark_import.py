@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Per-row cost of device_import_in_bulk against a mocked DNA center API"""
+
+# Import builtin python libraries
+import contextlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+# Import external python libraries
+import requests
+
+# Import custom (local) python packages
+from dnac_pnp.dnac_session import DnacSession
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# Catalog rows per run
+catalog_rows = 2000
+# Site and template of every catalog row
+site_name = "Global/DE/MUC"
+template_parameters = ["hostname", "vtp_domain"]
+
+
+# Mocked DNA center API
+class CatalogApi(object):
+    """HTTP client answering the API calls of a bulk import from memory"""
+
+    def __init__(self):
+        """Constructor method for the mocked API"""
+
+        self.calls = 0
+        self.claims = 0
+
+    @staticmethod
+    def _response(body=None):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(body).encode()
+        return response
+
+    def request(self, method, url, data=None, params=None, **kwargs):
+        self.calls += 1
+        path = urlparse(url).path
+        if path.endswith("/auth/token"):
+            return self._response({"Token": "token"})
+        if path == "/api/v1/group":
+            sites = ["Global", "Global/DE", site_name]
+            return self._response(
+                {
+                    "response": [
+                        {
+                            "id": f"site-{index}",
+                            "groupNameHierarchy": hierarchy,
+                            "name": hierarchy.rsplit("/", 1)[-1],
+                            "parentId": f"site-{index - 1}" if index else None,
+                            "additionalInfo": [
+                                {
+                                    "nameSpace": "Location",
+                                    "attributes": {"type": "area"},
+                                }
+                            ],
+                        }
+                        for index, hierarchy in enumerate(sites)
+                    ]
+                }
+            )
+        if path.endswith("/template-programmer/template"):
+            return self._response(
+                [
+                    {
+                        "projectName": "Day0",
+                        "name": "Switch",
+                        "versionsInfo": [{"version": "1", "id": "template-1"}],
+                    }
+                ]
+            )
+        if "/template-programmer/template/" in path:
+            return self._response(
+                {
+                    "templateParams": [
+                        {"parameterName": name, "dataType": "STRING", "required": True}
+                        for name in template_parameters
+                    ],
+                    "templateContent": "hostname $hostname",
+                }
+            )
+        if path.endswith("/pnp-device/import"):
+            devices = json.loads(data)
+            if isinstance(devices, str):
+                devices = json.loads(devices)
+            return self._response(
+                {
+                    "successList": [
+                        dict(device, id=f"id-{device['deviceInfo']['serialNumber']}")
+                        for device in devices
+                    ],
+                    "failureList": [],
+                }
+            )
+        if path.endswith("/pnp-device/site-claim"):
+            self.claims += 1
+            return self._response({"response": "Device Claimed"})
+        if path.endswith("/onboarding/pnp-device"):
+            return self._response([])
+        raise ValueError(f"Unexpected API call [{method} {path}]")
+
+
+# Write a catalog
+def write_catalog(file_path=None, rows=catalog_rows):
+    """
+    This function writes a device catalog of new devices
+
+    :param file_path: (str) Full path of the device catalog
+    :param rows: (int) Number of rows
+    :return: None
+    """
+
+    with open(file_path, "w", encoding="utf-8") as catalog_file:
+        catalog_file.write(
+            "serial_number,product_id,site_name,device_name,template_name,vtp_domain\n"
+        )
+        for index in range(rows):
+            catalog_file.write(
+                f"FOC{index:08d},C9300-48P,{site_name},sw-{index},Day0/Switch,vtp\n"
+            )
+
+
+# Run one bulk import
+def run_import(catalog=None, level=logging.WARNING):
+    """
+    This function imports a catalog with the root logger at the given level
+
+    :param catalog: (str) Full path of the device catalog
+    :param level: (int) Root logger level
+    :return: (float, float, CatalogApi) Wall time, CPU time and the mocked API
+    """
+
+    api = CatalogApi()
+    session = DnacSession(
+        configs={"dnac": {"host": "dnac", "username": "admin", "password": "x"}},
+        client=api,
+    )
+    logging.getLogger().setLevel(level)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with contextlib.redirect_stderr(devnull):
+            wall_time, cpu_time = time.perf_counter(), time.process_time()
+            session.import_catalog(catalog_file=catalog)
+            wall_time = time.perf_counter() - wall_time
+            cpu_time = time.process_time() - cpu_time
+    return wall_time, cpu_time, api
+
+
+# Benchmark
+def main(rows=catalog_rows):
+    """
+    This function prints the per-row cost of a bulk import with and without debug
+
+    :param rows: (int) Catalog rows per run
+    :return: (stdout) On screen output
+    """
+
+    logging.getLogger().addHandler(logging.FileHandler(os.devnull))
+    with tempfile.TemporaryDirectory() as work_dir:
+        catalog = os.path.join(work_dir, "DeviceImport.csv")
+        write_catalog(file_path=catalog, rows=rows)
+        # Warm up imports and caches before anything is timed
+        run_import(catalog=catalog)
+        for name, level in (
+            ("debug off", logging.WARNING),
+            ("debug on", logging.DEBUG),
+        ):
+            wall_time, cpu_time, api = run_import(catalog=catalog, level=level)
+            if api.claims != rows:
+                sys.exit(f"[x] Only [{api.claims}] of [{rows}] rows were claimed!")
+            print(
+                f"{name:<10} {rows} rows, {api.calls} API calls: "
+                f"{wall_time / rows * 1e6:8.1f} us wall, "
+                f"{cpu_time / rows * 1e6:8.1f} us CPU per row"
+            )
+
+
+if __name__ == "__main__":
+    main(rows=int(sys.argv[1]) if len(sys.argv) > 1 else catalog_rows)
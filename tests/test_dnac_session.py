@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for the session stack of dnac_session"""
+
+# Import builtin python libraries
+import threading
+import unittest
+
+# Import custom (local) python packages
+from dnac_pnp.api_endpoint_handler import generate_api_url
+from dnac_pnp.dnac_session import DnacSession, SessionExecutor, current_session
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+# Host seen by the session and by the API URLs of the calling thread
+def _seen_host():
+    """This private function returns the session host and the token API URL"""
+
+    _, api_url, _ = generate_api_url(api_type="generate-token")
+    return current_session().host, api_url
+
+
+class TestDnacSession(unittest.TestCase):
+    """Two sessions running at the same time on worker threads"""
+
+    def setUp(self):
+        self.session_a = DnacSession(configs={"dnac": {"host": "dnac-a.example.com"}})
+        self.session_b = DnacSession(configs={"dnac": {"host": "dnac-b.example.com"}})
+        self.session_c = DnacSession(configs={"dnac": {"host": "dnac-c.example.com"}})
+        self.barrier = threading.Barrier(2, timeout=10)
+
+    def _check(self):
+        # Both workers are inside their session before either of them looks
+        self.barrier.wait()
+        seen = [_seen_host()]
+        self.barrier.wait()
+        seen.append(_seen_host())
+        return seen
+
+    def _check_nested(self):
+        self.barrier.wait()
+        seen = [_seen_host()]
+        with self.session_c:
+            self.barrier.wait()
+            seen.append(_seen_host())
+        seen.append(_seen_host())
+        return seen
+
+    def test_concurrent_sessions(self):
+        with SessionExecutor(max_workers=2) as executor:
+            with self.session_a:
+                future_a = executor.submit(self._check_nested)
+            with self.session_b:
+                future_b = executor.submit(self._check)
+            seen_a = future_a.result()
+            seen_b = future_b.result()
+
+        host_a = ("dnac-a.example.com", "https://dnac-a.example.com")
+        host_b = ("dnac-b.example.com", "https://dnac-b.example.com")
+        host_c = ("dnac-c.example.com", "https://dnac-c.example.com")
+        expected_a = [host_a, host_c, host_a]
+        for (host, api_url), (expected_host, expected_url) in zip(seen_a, expected_a):
+            self.assertEqual(host, expected_host)
+            self.assertTrue(api_url.startswith(f"{expected_url}/"))
+        for host, api_url in seen_b:
+            self.assertEqual(host, host_b[0])
+            self.assertTrue(api_url.startswith(f"{host_b[1]}/"))
+
+    def test_no_session_left_behind(self):
+        with SessionExecutor(max_workers=1) as executor:
+            with self.session_a:
+                executor.submit(current_session).result()
+            self.assertIsNone(executor.submit(current_session).result())
+        self.assertIsNone(current_session())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for the start-up import time of the command line entry points"""
+
+# Import builtin python libraries
+import re
+import subprocess
+import sys
+import unittest
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+# CLI entry points and their import budget in microseconds
+entry_points = ("dnac_pnp.app", "ios_reset.ios")
+import_budget = 100000
+# Packages that must only be imported once a command needs them
+heavy_packages = (
+    "requests",
+    "urllib3",
+    "tqdm",
+    "tabulate",
+    "yaml",
+    "netmiko",
+    "paramiko",
+)
+
+
+# Cumulative import time per module
+def _import_times(module=None):
+    """
+    This private function imports a module in a fresh interpreter
+
+    :param module: (str) Module to import
+    :return: (dict) Module name and cumulative import time in microseconds
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$", line)
+        if match:
+            cumulative[match.group(2)] = int(match.group(1))
+    return cumulative
+
+
+class TestImportTime(unittest.TestCase):
+    """Entry points start fast and import heavy packages lazily"""
+
+    def test_entry_points(self):
+        for entry_point in entry_points:
+            with self.subTest(entry_point=entry_point):
+                cumulative = _import_times(module=entry_point)
+                loaded = sorted(
+                    name for name in cumulative if name.split(".")[0] in heavy_packages
+                )
+                self.assertEqual(loaded, [], "heavy modules imported at start-up")
+                self.assertLessEqual(cumulative[entry_point], import_budget)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for applying a sync plan"""
+
+# Import builtin python libraries
+from collections import OrderedDict
+import unittest
+from unittest import mock
+
+# Import custom (local) python packages
+from dnac_pnp.dnac_records import CatalogRow
+from dnac_pnp.sync_handler import PlanItem, apply_sync_plan, plan_actions
+
+# Source code meta data
+__author__ = "Dalwar Hossain"
+__email__ = "dalwar.hossain@global.ntt"
+
+
+class TestApplySyncPlan(unittest.TestCase):
+    """Failed changes end up in the failed serials"""
+
+    def _plan(self, *serial_numbers):
+        plan = OrderedDict((action, []) for action in plan_actions)
+        for serial_number in serial_numbers:
+            row = CatalogRow(
+                columns={"serialNumber": 0, "pid": 1, "hostname": 2},
+                values=(serial_number, "C9300", f"sw-{serial_number}"),
+            )
+            plan["add"].append(PlanItem("add", serial_number, row, None, "new"))
+        return plan
+
+    @mock.patch("dnac_pnp.sync_handler.resolve_inventory_serials", return_value={})
+    @mock.patch("dnac_pnp.device_import_handler.claim_device")
+    @mock.patch("dnac_pnp.device_import_handler.get_response")
+    @mock.patch("dnac_pnp.device_import_handler.add_device")
+    def test_failed_claim_of_added_device(
+        self, add_device, get_response, claim_device, _
+    ):
+        get_response.return_value = (True, {"successList": [{"id": "device-id"}]})
+        claim_device.side_effect = lambda dnac_api_headers, payload_data: (
+            payload_data.serial_number != "FAIL0001"
+        )
+
+        failed = apply_sync_plan(
+            api_headers={}, plan=self._plan("FAIL0001", "OK0001"), workers=2
+        )
+
+        self.assertEqual(failed, ["FAIL0001"])
+        self.assertEqual(add_device.call_count, 2)
+        self.assertEqual(claim_device.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()